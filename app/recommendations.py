@@ -1,8 +1,10 @@
 import pandas as pd
 import sys
 sys.path.append('../src')
-from functions import stock_selection_weight_allocation, adjust_portfolio, generate_and_save_data
-from datetime import datetime
+from functions import stock_selection_weight_allocation, adjust_portfolio
+from price_store import load_price_store, price_store_is_current
+from data_refresher import get_data_refresher
+from risk_free_rate import load_risk_free_rate
 
 def custom_round(number):
     # Separate the number into the integer and decimal parts
@@ -91,49 +93,25 @@ def calculate_investment(portfolio_weights, stock_prices, buying_date, amount_av
 
 def get_govt_bond_data():
 
-    govt_bond_df = pd.read_csv('../data/India 10-Year Bond Yield Historical Data.csv')
-    govt_bond_df = govt_bond_df[['Date','Price']]
-    govt_bond_df.index = govt_bond_df['Date']
-    govt_bond_df = govt_bond_df.drop('Date', axis=1)
-    govt_bond_df.index = pd.to_datetime(govt_bond_df.index)
+    # Parsed once per process into sorted arrays, later calls reuse the same series
+    return load_risk_free_rate('../data/India 10-Year Bond Yield Historical Data.csv')
 
-    return govt_bond_df
+def load_all_stock_data():
 
-def get_all_stock_data(buying_date):
-
-    all_stocks_df = pd.read_csv('../data/all_stock_data.csv', index_col=0)
-    all_stocks_df.index = pd.to_datetime(all_stocks_df.index)
-    all_stocks_df = all_stocks_df.sort_index()
-    
-    latest_date_available = str(all_stocks_df.index[-1])[:10]
+    # The csv is parsed only once, after that the memory mapped price store is used
+    get_data_refresher().ensure_store('../data/all_stock_data.csv')
 
-    start_date = latest_date_available
-    end_date = buying_date
+    return load_price_store()
 
-    end_date_minus_one = end_date[:-2] + str(int(end_date[-2:])-1)
-    end_date_minus_two = end_date[:-2] + str(int(end_date[-2:])-2)
-    end_date_minus_three = end_date[:-2] + str(int(end_date[-2:])-3)
+def get_all_stock_data(buying_date):
 
-    # Convert string to datetime object
-    date_obj = datetime.strptime(end_date, '%Y-%m-%d')
-    day = date_obj.weekday()
-    print(start_date, end_date, day)
+    all_stocks_df = load_all_stock_data()
 
-    if (day == 6) and (start_date == end_date_minus_two):
-        all_stocks_df_final = all_stocks_df
-    elif (day == 0) and (start_date == end_date_minus_three):
-        all_stocks_df_final = all_stocks_df
-    elif (start_date == end_date) or (start_date == end_date_minus_one):
-        all_stocks_df_final = all_stocks_df
-    else:
-        generate_and_save_data(start_date, end_date)
-        all_stocks_df_2 = pd.read_csv('../data/all_stock_data.csv', index_col=0)
-        all_stocks_df_2.index = pd.to_datetime(all_stocks_df_2.index)
-        all_stocks_df_2 = all_stocks_df_2.sort_index()
-        all_stocks_df_2 = all_stocks_df_2.iloc[1:]
-        all_stocks_df_final = pd.concat([all_stocks_df, all_stocks_df_2])
-        all_stocks_df_final = all_stocks_df_final.drop_duplicates()
-        all_stocks_df_final.to_csv('../data/all_stock_data.csv')
+    # Nothing is downloaded if the store already has the last trading session before the buying date
+    if not price_store_is_current(buying_date):
+        # Concurrent requests share a single download, the snapshot loaded above stays valid meanwhile
+        get_data_refresher().refresh(buying_date)
+        all_stocks_df = load_price_store()
 
     return all_stocks_df
 
@@ -0,0 +1,546 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+import math
+import numpy as np
+
+##########################################################################
+##########################################################################
+
+# The batched solvers answer many optimizer problems in one vectorized call, for sweeps over caps, bounds or windows outside the backtest.
+# The strategies keep the per problem solvers of optimization_functions: a backtest solves its problems one rebalance at a time,
+# warm started from the previous one. On problems of 8 to 20 stocks, maximize_sharpe_ratio_batch is about 1.5 times as fast as maximize_sharpe_ratio_qp
+# per problem from a few hundred problems on, and minimize_variance_batch is about 1.3 times as fast as minimize_variance_qp from a thousand problems on
+# and slower below a few hundred. There is no batched maximize_returns, SLSQP solves those problems one by one about twice as fast as the ADMM iterations.
+
+##########################################################################
+##########################################################################
+
+# Function 1: Stack the moments of several problems
+
+def stack_moments(moments):
+    """
+    The function stacks the moments of problems with different numbers of stocks into arrays padded to the largest number of stocks.
+    The padded stocks have no return and no variance and are left out of every problem by the mask.
+
+    Args:
+
+        moments (list of tuples): (average_returns, covariance_matrix) of every problem, for example from window_moments
+
+    Returns:
+
+        average_returns (numpy array): B x n mean daily returns
+
+        covariance_matrices (numpy array): B x n x n covariance matrices
+
+        mask (numpy array): B x n booleans, True for the stocks of every problem
+    """
+    num_problems = len(moments)
+    num_symbs = max(len(average_returns) for average_returns, covariance_matrix in moments)
+
+    average_returns = np.zeros((num_problems, num_symbs))
+    covariance_matrices = np.zeros((num_problems, num_symbs, num_symbs))
+    mask = np.zeros((num_problems, num_symbs), dtype='bool')
+
+    for b, (problem_returns, problem_covariance) in enumerate(moments):
+        size = len(problem_returns)
+        average_returns[b, :size] = problem_returns
+        covariance_matrices[b, :size, :size] = problem_covariance
+        mask[b, :size] = True
+
+    return average_returns, covariance_matrices, mask
+
+##########################################################################
+##########################################################################
+
+# Function 2: Projection of many portfolios on the capped simplex
+
+def project_capped_simplex_batch(weights, weightage_no_more_than, mask, total=1.0, tolerance=1e-12):
+    """
+    The function projects every row of weights on {0 <= w <= cap, sum(w) = total} over the stocks of its mask, min(max(w - t, 0), cap)
+    with the shift t of every row found by one vectorized bisection. The padded stocks get no weight.
+    A row whose caps cannot add up to its total gets the cap on every stock.
+
+    Args:
+
+        weights (numpy array): B x n weights
+
+        weightage_no_more_than (float or numpy array): maximum weight of a stock, one per row or for all
+
+        mask (numpy array): B x n booleans, True for the stocks of every problem
+
+        total (float or numpy array): sum of the projected weights, one per row or for all
+
+        tolerance (float): width of the bisection interval of the shifts
+
+    Returns:
+
+        weights (numpy array): B x n projected weights
+    """
+    num_problems = len(weights)
+
+    upper_bound = np.minimum(1.0, np.broadcast_to(np.asarray(weightage_no_more_than, dtype='float64'), (num_problems,)))[:, None]
+    total = np.broadcast_to(np.asarray(total, dtype='float64'), (num_problems,))
+
+    # The sum of the clipped weights falls from n * cap to 0 as the shift goes from min(w) - cap to max(w)
+    low = np.where(mask, weights, np.inf).min(axis=1) - upper_bound[:, 0]
+    high = np.where(mask, weights, -np.inf).max(axis=1)
+
+    for _ in range(max(1, math.ceil(math.log2(max(np.max(high - low), tolerance) / tolerance)))):
+        shift = (low + high) / 2
+        above = (np.clip(weights - shift[:, None], 0, upper_bound) * mask).sum(axis=1) > total
+        low = np.where(above, shift, low)
+        high = np.where(above, high, shift)
+
+    projected = np.clip(weights - ((low + high) / 2)[:, None], 0, upper_bound) * mask
+
+    return np.where((mask.sum(axis=1) * upper_bound[:, 0] <= total)[:, None], upper_bound * mask, projected)
+
+##########################################################################
+##########################################################################
+
+# Function 3: ADMM solver for many small quadratic programs
+
+def solve_qp_admm_batch(hessians, linear_terms, lower_variable_bounds, upper_variable_bounds, constraint_matrices, lower_bounds, upper_bounds,
+                        initial_x=None, initial_z=None, initial_y=None, rho=0.1, sigma=1e-6, alpha=1.6, adaptive_rho_interval=100, max_iterations=10000, tolerance=1e-7, check_every=10):
+    """
+    The function minimizes 1/2 x'Px + q'x subject to lx <= x <= ux and l <= Ax <= u for B problems at once with the ADMM iterations of OSQP.
+    Every iteration is one batched product with the inverses of the (B, n, n) KKT matrices P + sigma I + diag(rho_x) + A' diag(rho) A,
+    products with A and a projection on the bounds, so the cost is a few NumPy calls for the whole batch. The bounds of the variables are rows of the identity that are applied without products.
+    The rows of A are scaled to unit infinity norm and the objective to unit size before the iterations.
+    A problem stops when its primal and dual residuals meet the absolute and relative tolerance, checked every check_every iterations,
+    and the batch then goes on with the problems that are left. Every adaptive_rho_interval iterations the step of a problem whose residuals are out of balance
+    is adapted as in OSQP.
+
+    Args:
+
+        hessians (numpy array): B x n x n positive semidefinite matrices P
+
+        linear_terms (numpy array): B x n vectors q
+
+        lower_variable_bounds (numpy array): B x n lower bounds lx of the variables (-inf for none)
+
+        upper_variable_bounds (numpy array): B x n upper bounds ux of the variables (inf for none)
+
+        constraint_matrices (numpy array): B x m matrices A
+
+        lower_bounds (numpy array): B x m lower bounds l (-inf for none), equal to the upper bounds for equality constraints
+
+        upper_bounds (numpy array): B x m upper bounds u (inf for none)
+
+        initial_x, initial_z, initial_y (numpy array): optional warm start of the variables, the constraint values and the multipliers (as returned)
+
+        rho (float): initial step size of the constraints, 1000 times larger for the equality constraints
+
+        sigma (float): regularization of the variables
+
+        alpha (float): relaxation
+
+        adaptive_rho_interval (integer): number of iterations between two adaptations of the steps, 0 to keep them fixed
+
+        max_iterations (integer): maximum number of iterations
+
+        tolerance (float): absolute and relative tolerance of the residuals
+
+        check_every (integer): number of iterations between two checks of the residuals
+
+    Returns:
+
+        x (numpy array): B x n solutions
+
+        z (numpy array): B x (n + m) values of the variables and of the constraints
+
+        y (numpy array): B x (n + m) multipliers of the bounds of the variables and of the constraints
+
+        info (dictionary): per problem arrays 'converged', 'iterations', 'primal_residual' and 'dual_residual' (of the scaled problems)
+    """
+    num_problems, num_rows, num_symbs = constraint_matrices.shape
+
+    # Row scaling of the constraints
+    row_norms = np.abs(constraint_matrices).max(axis=2)
+    row_scales = np.concatenate([np.ones((num_problems, num_symbs)), 1 / np.where(row_norms > 0, row_norms, 1.0)], axis=1)
+
+    matrices = constraint_matrices * row_scales[:, num_symbs:, None]
+    lower = np.concatenate([lower_variable_bounds, lower_bounds], axis=1) * row_scales
+    upper = np.concatenate([upper_variable_bounds, upper_bounds], axis=1) * row_scales
+
+    # Objective scaling, which does not move the minimizer
+    objective_norms = np.maximum(np.abs(hessians).max(axis=(1, 2)), np.abs(linear_terms).max(axis=1))
+    objective_scales = 1 / np.where(objective_norms > 0, objective_norms, 1.0)
+
+    hessians = hessians * objective_scales[:, None, None]
+    linear_terms = linear_terms * objective_scales[:, None]
+
+    # Larger steps for the equality constraints, smaller ones for the rows without bounds, times the step of every problem
+    row_steps = np.where(lower == upper, 1e3, np.where(np.isinf(lower) & np.isinf(upper), 1e-6, 1.0))
+    problem_rhos = np.full(num_problems, float(rho))
+
+    def factorize(indices):
+        rhos = problem_rhos[indices, None] * row_steps[indices]
+        kkt_matrices = hessians[indices] + np.eye(num_symbs) * (sigma + rhos[:, None, :num_symbs]) + np.einsum('bmi,bm,bmj->bij', matrices[indices], rhos[:, num_symbs:], matrices[indices])
+        return rhos, np.linalg.inv(kkt_matrices)
+
+    rhos, kkt_inverses = factorize(np.arange(num_problems))
+
+    def multiply(matrices, x):
+        return np.concatenate([x, np.matmul(matrices, x[:, :, None])[:, :, 0]], axis=1)
+
+    def multiply_transposed(matrices, values):
+        return values[:, :num_symbs] + np.matmul(values[:, None, num_symbs:], matrices)[:, 0, :]
+
+    x = np.zeros((num_problems, num_symbs)) if initial_x is None else np.array(initial_x, dtype='float64')
+    z = multiply(matrices, x) if initial_z is None else np.array(initial_z, dtype='float64') * row_scales
+    y = np.zeros((num_problems, num_symbs + num_rows)) if initial_y is None else np.array(initial_y, dtype='float64') / row_scales * objective_scales[:, None]
+
+    converged = np.zeros(num_problems, dtype='bool')
+    iterations = np.full(num_problems, max_iterations, dtype='int64')
+    primal_residual = np.full(num_problems, np.inf)
+    dual_residual = np.full(num_problems, np.inf)
+
+    # The problems that still iterate, their data is sliced again whenever some of them stop
+    work = np.arange(num_problems)
+    work_rhos, work_inverses = rhos, kkt_inverses
+    work_hessians, work_linear, work_matrices, work_lower, work_upper = hessians, linear_terms, matrices, lower, upper
+    work_x, work_z, work_y = x.copy(), z.copy(), y.copy()
+
+    for iteration in range(1, max_iterations + 1):
+
+        if len(work) == 0:
+            break
+
+        right_hand_side = sigma * work_x - work_linear + multiply_transposed(work_matrices, work_rhos * work_z - work_y)
+        x_tilde = np.matmul(work_inverses, right_hand_side[:, :, None])[:, :, 0]
+        z_relaxed = alpha * multiply(work_matrices, x_tilde) + (1 - alpha) * work_z
+
+        work_x = alpha * x_tilde + (1 - alpha) * work_x
+        work_z_next = np.clip(z_relaxed + work_y / work_rhos, work_lower, work_upper)
+        work_y = work_y + work_rhos * (z_relaxed - work_z_next)
+        work_z = work_z_next
+
+        if iteration % check_every != 0 and iteration != max_iterations:
+            continue
+
+        constraint_values = multiply(work_matrices, work_x)
+        hessian_x = np.matmul(work_hessians, work_x[:, :, None])[:, :, 0]
+        transposed_y = multiply_transposed(work_matrices, work_y)
+
+        work_primal_residual = np.abs(constraint_values - work_z).max(axis=1)
+        work_dual_residual = np.abs(hessian_x + work_linear + transposed_y).max(axis=1)
+
+        primal_norm = np.maximum(np.abs(constraint_values).max(axis=1), np.abs(work_z).max(axis=1))
+        dual_norm = np.maximum.reduce([np.abs(hessian_x).max(axis=1), np.abs(transposed_y).max(axis=1), np.abs(work_linear).max(axis=1)])
+
+        done = (work_primal_residual <= tolerance + tolerance * primal_norm) & (work_dual_residual <= tolerance + tolerance * dual_norm)
+        stopped = done | (iteration == max_iterations)
+
+        # Adaptive steps as in OSQP, the step of a problem moves towards the one that balances its relative primal and dual residuals
+        # when they ask for a step more than 5 times larger or smaller, which takes a new inverse for that problem only. The step moves half
+        # of the way (in the logarithm), as the full move of OSQP makes the steps of linear problems swing without converging.
+        if adaptive_rho_interval and iteration % adaptive_rho_interval == 0:
+            ratios = np.sqrt((work_primal_residual / np.maximum(primal_norm, 1e-30)) / np.maximum(work_dual_residual / np.maximum(dual_norm, 1e-30), 1e-30))
+            adapt = ~stopped & ((ratios > 5) | (ratios < 0.2))
+            if adapt.any():
+                problem_rhos[work[adapt]] = np.clip(problem_rhos[work[adapt]] * np.sqrt(ratios[adapt]), 1e-6, 1e6)
+                rhos[work[adapt]], kkt_inverses[work[adapt]] = factorize(work[adapt])
+                work_rhos, work_inverses = rhos[work], kkt_inverses[work]
+
+        if not stopped.any():
+            continue
+
+        finished = work[stopped]
+        x[finished], z[finished], y[finished] = work_x[stopped], work_z[stopped], work_y[stopped]
+        converged[finished] = done[stopped]
+        iterations[finished] = iteration
+        primal_residual[finished] = work_primal_residual[stopped]
+        dual_residual[finished] = work_dual_residual[stopped]
+
+        keep = ~stopped
+        work = work[keep]
+
+        work_rhos, work_inverses = rhos[work], kkt_inverses[work]
+        work_hessians, work_linear, work_matrices = hessians[work], linear_terms[work], matrices[work]
+        work_lower, work_upper = lower[work], upper[work]
+        work_x, work_z, work_y = work_x[keep], work_z[keep], work_y[keep]
+
+    info = {'converged': converged, 'iterations': iterations, 'primal_residual': primal_residual, 'dual_residual': dual_residual}
+
+    return x, z / row_scales, y * row_scales / objective_scales[:, None], info
+
+##########################################################################
+##########################################################################
+
+# Function 4: Highest returns under the caps of many problems
+
+def max_return_batch(average_returns, weightage_no_more_than, mask):
+    """
+    The function returns the highest daily return of every problem under its caps with weights that sum up to 1, like max_return_weights.
+
+    Args:
+
+        average_returns, mask (numpy array): stacked returns, see stack_moments
+
+        weightage_no_more_than (float or numpy array): maximum weight of a stock, one per problem or for all
+
+    Returns:
+
+        highest_returns (numpy array): B daily returns, -inf for the problems whose caps cannot add up to 1
+    """
+    num_problems, num_symbs = average_returns.shape
+    upper_bound = np.minimum(1.0, np.broadcast_to(np.asarray(weightage_no_more_than, dtype='float64'), (num_problems,)))[:, None]
+
+    sorted_returns = -np.sort(np.where(mask, -average_returns, np.inf), axis=1)
+    sorted_weights = np.clip(1 - upper_bound * np.arange(num_symbs), 0, upper_bound) * (sorted_returns > -np.inf)
+
+    highest_returns = (np.where(sorted_weights > 0, sorted_returns, 0.0) * sorted_weights).sum(axis=1)
+
+    return np.where(sorted_weights.sum(axis=1) >= 1 - 1e-12, highest_returns, -np.inf)
+
+##########################################################################
+##########################################################################
+
+# Function 5: Report of a batch in which only some problems were solved
+
+def batch_info(num_problems, solved, solved_info):
+    """
+    The function spreads the per problem arrays of solve_qp_admm_batch for the solved problems over the whole batch,
+    the other problems did not converge, took no iteration and have no residuals.
+
+    Args:
+
+        num_problems (integer): number of problems of the batch
+
+        solved (numpy array): indices of the solved problems
+
+        solved_info (dictionary): info of solve_qp_admm_batch for the solved problems
+
+    Returns:
+
+        info (dictionary): per problem arrays 'converged', 'iterations', 'primal_residual' and 'dual_residual'
+    """
+    info = {'converged': np.zeros(num_problems, dtype='bool'),
+            'iterations': np.zeros(num_problems, dtype='int64'),
+            'primal_residual': np.full(num_problems, np.nan),
+            'dual_residual': np.full(num_problems, np.nan)}
+
+    for key, value in solved_info.items():
+        info[key][solved] = value
+
+    return info
+
+##########################################################################
+##########################################################################
+
+# Function 6: Minimum variance portfolios of many problems
+
+def minimize_variance_batch(average_returns, covariance_matrices, mask, minimum_ann_ret, weightage_no_more_than, sum_tolerance=0.0001, **admm_options):
+    """
+    The function solves the minimize_variance problem of every row of the stacked moments in one call of solve_qp_admm_batch:
+    min w'Cw subject to 0 <= w <= cap, 1 - tol <= sum(w) <= 1 + tol and the return floor w.mu >= (1 + minimum_ann_ret)^(1/365) - 1.
+    The solutions are projected on the capped simplex at their (clipped) sum, so the weights respect the caps and the sum exactly.
+
+    Args:
+
+        average_returns, covariance_matrices, mask (numpy array): stacked moments, see stack_moments
+
+        minimum_ann_ret (float or numpy array): minimum annual return, one per problem or for all
+
+        weightage_no_more_than (float or numpy array): maximum weight of a stock, one per problem or for all
+
+        sum_tolerance (float or numpy array): tolerance of the sum of the weights, one per problem or for all
+
+        admm_options: passed on to solve_qp_admm_batch
+
+    Returns:
+
+        weights (numpy array): B x n weights, NaN for the problems whose caps or return floor cannot be met and for the problems that did not converge
+
+        info (dictionary): per problem arrays of solve_qp_admm_batch and 'feasible'
+    """
+    num_problems, num_symbs = average_returns.shape
+
+    upper_bound = np.minimum(1.0, np.broadcast_to(np.asarray(weightage_no_more_than, dtype='float64'), (num_problems,)))
+    sum_tolerance = np.broadcast_to(np.asarray(sum_tolerance, dtype='float64'), (num_problems,))
+    minimum_daily_return = (1 + np.broadcast_to(np.asarray(minimum_ann_ret, dtype='float64'), (num_problems,)))**(1/365) - 1
+
+    # Rows: the sum of the weights and the return of the portfolio, the padded stocks are fixed at 0 by their bounds
+    constraint_matrices = np.concatenate([mask[:, None, :].astype('float64'), average_returns[:, None, :]], axis=1)
+    lower_bounds = np.stack([1 - sum_tolerance, minimum_daily_return], axis=1)
+    upper_bounds = np.stack([1 + sum_tolerance, np.full(num_problems, np.inf)], axis=1)
+
+    feasible = (mask.sum(axis=1) * upper_bound >= 1 - sum_tolerance) & (max_return_batch(average_returns, upper_bound, mask) >= minimum_daily_return)
+    solved = np.flatnonzero(feasible)
+
+    initial_x = project_capped_simplex_batch(mask / mask.sum(axis=1, keepdims=True), upper_bound, mask)
+
+    x = np.zeros((num_problems, num_symbs))
+    x[solved], z, y, solved_info = solve_qp_admm_batch(2 * covariance_matrices[solved], np.zeros((len(solved), num_symbs)), np.zeros((len(solved), num_symbs)), (upper_bound[:, None] * mask)[solved],
+                                                       constraint_matrices[solved], lower_bounds[solved], upper_bounds[solved], initial_x=initial_x[solved], **admm_options)
+
+    info = batch_info(num_problems, solved, solved_info)
+
+    weights = project_capped_simplex_batch(x, upper_bound, mask, np.clip((x * mask).sum(axis=1), 1 - sum_tolerance, 1 + sum_tolerance))
+
+    info['feasible'] = feasible
+
+    return np.where(info['converged'][:, None], weights, np.nan), info
+
+##########################################################################
+##########################################################################
+
+# Function 7: Maximum Sharpe ratio portfolios of many problems
+
+def maximize_sharpe_ratio_batch(average_returns, covariance_matrices, mask, risk_free_rate, weightage_no_more_than, max_rounds=50, intercept_tolerance=1e-10, **admm_options):
+    """
+    The function solves the maximize_sharpe_ratio problem of every row of the stacked moments like maximize_sharpe_ratio_qp, with every round
+    of the intercepts solved for all the problems in one call of solve_qp_admm_batch: min y'Cy subject to y.(mu - c) = 1, y >= 0 and
+    y_i <= cap * sum(y), then w = y / sum(y), and c moves to the intercept of the tangent of the compounded return at the return of w.
+    Every round starts from the solution of the previous one, and a problem keeps its solution once its intercept does not change.
+
+    Args:
+
+        average_returns, covariance_matrices, mask (numpy array): stacked moments, see stack_moments
+
+        risk_free_rate (float or numpy array): annual risk free rate, one per problem or for all
+
+        weightage_no_more_than (float or numpy array): maximum weight of a stock, one per problem or for all
+
+        max_rounds (integer): maximum number of rounds
+
+        intercept_tolerance (float): change of the intercept below which a problem stops
+
+        admm_options: passed on to solve_qp_admm_batch
+
+    Returns:
+
+        weights (numpy array): B x n weights, NaN for the problems in which no portfolio beats the risk free rate and for the problems that did not converge
+
+        info (dictionary): per problem arrays 'converged' (the last round converged and the intercept did not change), 'iterations' (of all the rounds),
+                           'rounds', 'primal_residual', 'dual_residual' and 'feasible'
+    """
+    num_problems, num_symbs = average_returns.shape
+
+    upper_bound = np.minimum(1.0, np.broadcast_to(np.asarray(weightage_no_more_than, dtype='float64'), (num_problems,)))
+    risk_free_rate = np.broadcast_to(np.asarray(risk_free_rate, dtype='float64'), (num_problems,))
+    intercept = (1 + risk_free_rate)**(1/365) - 1
+
+    highest_returns = max_return_batch(average_returns, upper_bound, mask)
+    feasible = (mask.sum(axis=1) * upper_bound >= 1) & (highest_returns > intercept)
+
+    # y is of the order of 1 / (w.(mu - c)), thousands for daily returns, so the excess returns are divided by the highest one under the caps,
+    # which scales y to the order of the weights without changing w = y / sum(y)
+    excess_scales = np.where(feasible, highest_returns - intercept, 1.0)
+
+    # Bounds y >= 0 (the padded stocks fixed at 0), rows y.(mu - c) = 1 and y_i - cap * sum(y) <= 0 (left out for the padded stocks)
+    cap_rows = (np.eye(num_symbs) - upper_bound[:, None, None] * mask[:, None, :]) * mask[:, :, None]
+
+    lower_variable_bounds = np.zeros((num_problems, num_symbs))
+    upper_variable_bounds = np.where(mask, np.inf, 0.0)
+    lower_bounds = np.concatenate([np.ones((num_problems, 1)), np.full((num_problems, num_symbs), -np.inf)], axis=1)
+    upper_bounds = np.concatenate([np.ones((num_problems, 1)), np.where(mask, 0.0, np.inf)], axis=1)
+
+    weights = np.where(feasible[:, None], project_capped_simplex_batch(mask / mask.sum(axis=1, keepdims=True), upper_bound, mask), np.nan)
+
+    converged = np.zeros(num_problems, dtype='bool')
+    iterations = np.zeros(num_problems, dtype='int64')
+    rounds = np.zeros(num_problems, dtype='int64')
+    primal_residual = np.full(num_problems, np.nan)
+    dual_residual = np.full(num_problems, np.nan)
+
+    # Every round solves the problems whose intercept still moves, from the solution of their previous round
+    x = np.zeros((num_problems, num_symbs))
+    z = np.zeros((num_problems, 2 * num_symbs + 1))
+    y = np.zeros((num_problems, 2 * num_symbs + 1))
+    active = np.flatnonzero(feasible)
+
+    for round_number in range(1, max_rounds + 1):
+
+        if len(active) == 0:
+            break
+
+        excess_returns = (average_returns[active] - intercept[active, None]) * mask[active] / excess_scales[active, None]
+        constraint_matrices = np.concatenate([excess_returns[:, None, :], cap_rows[active]], axis=1)
+
+        warm = round_number > 1
+        x[active], z[active], y[active], info = solve_qp_admm_batch(
+            2 * covariance_matrices[active], np.zeros((len(active), num_symbs)), lower_variable_bounds[active], upper_variable_bounds[active],
+            constraint_matrices, lower_bounds[active], upper_bounds[active],
+            initial_x=x[active] if warm else None, initial_z=z[active] if warm else None, initial_y=y[active] if warm else None, **admm_options)
+
+        scaled = np.maximum(x[active], 0.0) * mask[active]
+        totals = scaled.sum(axis=1)
+        weights[active] = scaled / np.where(totals > 0, totals, 1.0)[:, None]
+
+        portfolio_return = (weights[active] * average_returns[active]).sum(axis=1)
+        next_intercept = portfolio_return - (((1 + portfolio_return)**365 - 1) - risk_free_rate[active]) / (365 * (1 + portfolio_return)**364)
+
+        iterations[active] += info['iterations']
+        rounds[active] = round_number
+        primal_residual[active] = info['primal_residual']
+        dual_residual[active] = info['dual_residual']
+
+        settled = np.abs(next_intercept - intercept[active]) <= intercept_tolerance
+        converged[active] = info['converged'] & settled
+
+        # A round that did not converge ends the problem, as in maximize_sharpe_ratio_qp
+        going_on = ~settled & info['converged']
+        intercept[active[going_on]] = next_intercept[going_on]
+        active = active[going_on]
+
+    info = {'converged': converged, 'iterations': iterations, 'rounds': rounds, 'primal_residual': primal_residual, 'dual_residual': dual_residual, 'feasible': feasible}
+
+    return np.where(info['converged'][:, None], weights, np.nan), info
+
+##########################################################################
+##########################################################################
+
+# Function 8: Solve many optimizer problems at once
+
+def solve_problems_batch(problems, **admm_options):
+    """
+    The function solves many optimizer problems, described by the arguments of optimization_problem
+    (objective, average_returns, covariance_matrix, bound, weightage_no_more_than, sum_tolerance), with one batched call per objective.
+    Only the maximize_sharpe_ratio and minimize_variance problems are batched, see the note at the top of the module.
+
+    Args:
+
+        problems (list of tuples): arguments of optimization_problem of every problem
+
+        admm_options: passed on to solve_qp_admm_batch
+
+    Returns:
+
+        weights (list): weights of every problem as a numpy array of its stocks, NaN if the problem is infeasible or did not converge
+
+        infos (list): dictionary of every problem with its 'converged', 'iterations', 'primal_residual', 'dual_residual' and 'feasible'
+    """
+    weights = [None] * len(problems)
+    infos = [None] * len(problems)
+
+    for objective in ('maximize_sharpe_ratio', 'minimize_variance'):
+
+        positions = [position for position, problem in enumerate(problems) if problem[0] == objective]
+        if len(positions) == 0:
+            continue
+
+        average_returns, covariance_matrices, mask = stack_moments([problems[position][1:3] for position in positions])
+        bounds = np.array([problems[position][3] for position in positions], dtype='float64')
+        caps = np.array([problems[position][4] for position in positions], dtype='float64')
+        sum_tolerances = np.array([problems[position][5] for position in positions], dtype='float64')
+
+        if objective == 'maximize_sharpe_ratio':
+            # The Sharpe ratio problem has no sum tolerance, its weights sum up to 1
+            batch_weights, info = maximize_sharpe_ratio_batch(average_returns, covariance_matrices, mask, bounds, caps, **admm_options)
+        else:
+            batch_weights, info = minimize_variance_batch(average_returns, covariance_matrices, mask, bounds, caps, sum_tolerances, **admm_options)
+
+        for b, position in enumerate(positions):
+            weights[position] = batch_weights[b, mask[b]]
+            infos[position] = {key: value[b].item() for key, value in info.items()}
+
+    for position, problem in enumerate(problems):
+        if weights[position] is None:
+            raise ValueError("Incorrect Argument for 'objective'. Has to be either 'maximize_sharpe_ratio' or 'minimize_variance'")
+
+    return weights, infos
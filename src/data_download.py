@@ -0,0 +1,275 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import zlib
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+##########################################################################
+##########################################################################
+
+# Function 1: Yahoo Finance fetch backend
+
+def yahoo_fetch_backend(symbols, start_date, end_date):
+    """
+    The function downloads the daily adjusted close prices of several symbols with a single yahoo finance request.
+    Every fetch backend has this signature so that the downloader can be pointed at a different provider (for example a local fake one in benchmarks).
+
+    Args:
+
+        symbols (list): list of yahoo finance symbols, for example ['TCS.NS', 'INFY.NS']
+
+        start_date (string): it is the start date in the format 'yyyy-mm-dd'
+
+        end_date (string): it is the end date in the format 'yyyy-mm-dd' (not included in the download)
+
+    Returns:
+
+        adj_close_df (pandas dataframe): dataframe of adjusted close prices with the dates as the index and one column per symbol
+    """
+    data = yf.download(symbols, start_date, end_date, interval="1d", auto_adjust=False, group_by='column', threads=False, progress=False)
+
+    adj_close_df = data['Adj Close']
+
+    # A single symbol download does not come back as a multi level frame in older versions of yfinance
+    if isinstance(adj_close_df, pd.Series):
+        adj_close_df = adj_close_df.to_frame(symbols[0])
+
+    return adj_close_df.reindex(columns=symbols)
+
+##########################################################################
+##########################################################################
+
+# Function 2: Synthetic fetch backend for benchmarks
+
+def make_synthetic_fetch_backend(latency_seconds=0.0, failure_rate=0.0, seed=0):
+    """
+    The function returns a fetch backend that generates random walk prices locally instead of calling yahoo finance.
+    It is meant for benchmarking the downloader without the network, the latency and the failure rate imitate a real provider.
+
+    Args:
+
+        latency_seconds (float): time that every call sleeps for before returning
+
+        failure_rate (float): probability between 0 and 1 that a call raises a ConnectionError
+
+        seed (integer): seed used for the failures so that a benchmark can be repeated
+
+    Returns:
+
+        fetch_backend (function): function with the same signature as yahoo_fetch_backend
+    """
+    failure_generator = np.random.default_rng(seed)
+
+    def synthetic_fetch_backend(symbols, start_date, end_date):
+
+        time.sleep(latency_seconds)
+
+        if failure_generator.random() < failure_rate:
+            raise ConnectionError(f"Synthetic failure while fetching {len(symbols)} symbols")
+
+        dates = pd.bdate_range(start_date, end_date, inclusive='left')
+
+        columns = {}
+        for symbol in symbols:
+            # Every symbol gets its own deterministic price path
+            symbol_generator = np.random.default_rng([zlib.crc32(symbol.encode()), seed])
+            daily_returns = symbol_generator.normal(0.0005, 0.02, len(dates))
+            columns[symbol] = 100 * np.cumprod(1 + daily_returns)
+
+        return pd.DataFrame(columns, index=dates)
+
+    return synthetic_fetch_backend
+
+##########################################################################
+##########################################################################
+
+# Function 3: Fetch one batch with retries
+
+def fetch_batch_with_retries(fetch_backend, symbols, start_date, end_date, max_retries=3, backoff_seconds=1.0):
+    """
+    The function calls the fetch backend for one batch of symbols and retries with an exponential backoff if the call fails.
+
+    Args:
+
+        fetch_backend (function): backend with the same signature as yahoo_fetch_backend
+
+        symbols (list): list of symbols in the batch
+
+        start_date (string): it is the start date in the format 'yyyy-mm-dd'
+
+        end_date (string): it is the end date in the format 'yyyy-mm-dd'
+
+        max_retries (integer): number of retries after the first attempt
+
+        backoff_seconds (float): wait before the first retry, it doubles after every failed attempt
+
+    Returns:
+
+        adj_close_df (pandas dataframe): adjusted close prices of the batch, None if every attempt failed
+
+        batch_report (dictionary): number of symbols, attempts, latency in seconds, rows received, missing symbols and the last error
+    """
+    batch_report = {'symbols': len(symbols), 'attempts': 0, 'latency': 0.0, 'rows': 0, 'missing': [], 'error': None}
+
+    adj_close_df = None
+    batch_start = time.perf_counter()
+
+    for attempt in range(max_retries + 1):
+        batch_report['attempts'] = attempt + 1
+        try:
+            adj_close_df = fetch_backend(symbols, start_date, end_date)
+            batch_report['error'] = None
+            break
+        except Exception as e:
+            batch_report['error'] = repr(e)
+            if attempt < max_retries:
+                time.sleep(backoff_seconds * (2 ** attempt))
+
+    batch_report['latency'] = time.perf_counter() - batch_start
+
+    if adj_close_df is not None:
+        batch_report['rows'] = len(adj_close_df)
+        # Symbols that the provider silently skipped come back as empty columns
+        batch_report['missing'] = [symbol for symbol in symbols if symbol not in adj_close_df.columns or adj_close_df[symbol].isna().all()]
+
+    return adj_close_df, batch_report
+
+##########################################################################
+##########################################################################
+
+# Function 4: Iterate over the downloaded batches as they complete
+
+def iter_downloaded_batches(symbols, start_date, end_date, fetch_backend=yahoo_fetch_backend, batch_size=50, max_workers=8, max_retries=3, backoff_seconds=1.0):
+    """
+    The function splits the symbols into batches and downloads them on a bounded thread pool.
+    Batches are yielded in the order in which they finish so that the caller can consume them without waiting for the whole download.
+
+    Args:
+
+        symbols (list): list of all symbols to download
+
+        start_date (string): it is the start date in the format 'yyyy-mm-dd'
+
+        end_date (string): it is the end date in the format 'yyyy-mm-dd'
+
+        fetch_backend (function): backend with the same signature as yahoo_fetch_backend
+
+        batch_size (integer): number of symbols requested together in one call
+
+        max_workers (integer): maximum number of batches being downloaded at the same time
+
+        max_retries (integer): number of retries for every batch
+
+        backoff_seconds (float): wait before the first retry of a batch
+
+    Yields:
+
+        batch_symbols (list): symbols of the finished batch
+
+        adj_close_df (pandas dataframe): adjusted close prices of the batch, None if the batch failed
+
+        batch_report (dictionary): report of the batch as returned by fetch_batch_with_retries along with its batch number
+    """
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_batch_with_retries, fetch_backend, batch, start_date, end_date, max_retries, backoff_seconds): (batch_number, batch)
+            for batch_number, batch in enumerate(batches)
+        }
+
+        for future in as_completed(futures):
+            # The future is dropped right away so that a consumed batch can be freed
+            batch_number, batch = futures.pop(future)
+            adj_close_df, batch_report = future.result()
+            batch_report['batch'] = batch_number
+            yield batch, adj_close_df, batch_report
+
+##########################################################################
+##########################################################################
+
+# Function 5: Download all symbols and summarize the throughput
+
+def download_in_batches(symbols, start_date, end_date, fetch_backend=yahoo_fetch_backend, batch_size=50, max_workers=8, max_retries=3, backoff_seconds=1.0):
+    """
+    The function downloads the adjusted close prices of all the symbols with iter_downloaded_batches and puts them together in one dataframe.
+
+    Args:
+
+        symbols (list): list of all symbols to download
+
+        start_date (string): it is the start date in the format 'yyyy-mm-dd'
+
+        end_date (string): it is the end date in the format 'yyyy-mm-dd'
+
+        fetch_backend, batch_size, max_workers, max_retries, backoff_seconds: passed on to iter_downloaded_batches
+
+    Returns:
+
+        all_stocks_df (pandas dataframe): adjusted close prices with the dates as the index and the symbols as the columns (in the order they were given)
+
+        download_report (dictionary): per batch reports under 'batches' and the overall 'seconds', 'symbols_per_second', 'failed_symbols' and 'missing_symbols'
+    """
+    download_start = time.perf_counter()
+
+    batch_frames = []
+    batch_reports = []
+    failed_symbols = []
+
+    for batch, adj_close_df, batch_report in iter_downloaded_batches(symbols, start_date, end_date, fetch_backend, batch_size, max_workers, max_retries, backoff_seconds):
+        batch_reports.append(batch_report)
+        if adj_close_df is None:
+            failed_symbols += batch
+        else:
+            batch_frames.append(adj_close_df)
+
+    seconds = time.perf_counter() - download_start
+
+    if len(batch_frames) > 0:
+        all_stocks_df = pd.concat(batch_frames, axis=1)
+    else:
+        all_stocks_df = pd.DataFrame()
+
+    all_stocks_df = all_stocks_df.reindex(columns=[symbol for symbol in symbols if symbol in all_stocks_df.columns])
+
+    batch_reports = sorted(batch_reports, key=lambda x: x['batch'])
+
+    download_report = {
+        'batches': batch_reports,
+        'seconds': seconds,
+        'symbols_per_second': (len(symbols) - len(failed_symbols)) / seconds if seconds > 0 else float('inf'),
+        'failed_symbols': failed_symbols,
+        'missing_symbols': [symbol for batch_report in batch_reports for symbol in batch_report['missing']],
+    }
+
+    return all_stocks_df, download_report
+
+##########################################################################
+##########################################################################
+
+# Function 6: Print the download report
+
+def print_download_report(download_report):
+    """
+    The function prints the latency of every batch and the overall throughput of a download.
+
+    Args:
+
+        download_report (dictionary): report returned by download_in_batches
+
+    Returns:
+
+        The function has no return values
+    """
+    for batch_report in download_report['batches']:
+        status = 'ok' if batch_report['error'] is None else f"failed ({batch_report['error']})"
+        print(f"Batch {batch_report['batch']}: {batch_report['symbols']} symbols, {batch_report['attempts']} attempt(s), {batch_report['latency']:.2f}s, {batch_report['rows']} rows, {status}")
+
+    print(f"Downloaded in {download_report['seconds']:.2f}s ({download_report['symbols_per_second']:.1f} symbols/s), "
+          f"{len(download_report['failed_symbols'])} failed and {len(download_report['missing_symbols'])} missing symbols.")
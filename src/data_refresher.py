@@ -0,0 +1,145 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from data_download import yahoo_fetch_backend
+from price_store import DEFAULT_STORE_PATH, price_store_exists, price_store_is_current, convert_csv_to_price_store, update_price_store
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl, there only the refreshes inside one process are coalesced
+    fcntl = None
+
+##########################################################################
+##########################################################################
+
+LOCK_FILE = '.refresh.lock'
+
+##########################################################################
+##########################################################################
+
+# Function 1: Lock a price store for writing across processes
+
+@contextmanager
+def store_file_lock(store_path=DEFAULT_STORE_PATH):
+    """
+    The function holds an exclusive lock on the lock file of a price store, so that only one process on the host writes to the store at a time.
+    Other processes wait on the lock until the writer is done.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+    Yields:
+
+        Nothing, the lock is held inside the with block
+    """
+    os.makedirs(store_path, exist_ok=True)
+
+    with open(os.path.join(store_path, LOCK_FILE), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+##########################################################################
+##########################################################################
+
+# Class 1: Single writer data refresher
+
+class DataRefresher:
+    """
+    The only writer of a price store within a process. Refreshes run on one background thread and concurrent requests
+    for the same (or an earlier) end date share the download that is already queued or running instead of starting their own.
+    Across processes the writes are serialized with store_file_lock, and the store is checked again after the lock is taken,
+    so a process that waited for another one does not download the same dates again.
+    Readers are never blocked: they keep the snapshot they loaded until the new manifest is published.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+        fetch_backend (function): backend used to fetch a batch of symbols, yahoo finance by default
+    """
+
+    def __init__(self, store_path=DEFAULT_STORE_PATH, fetch_backend=yahoo_fetch_backend):
+
+        self.store_path = store_path
+        self.fetch_backend = fetch_backend
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='data-refresher')
+        self._futures = {}
+
+    def request_refresh(self, end_date):
+        """
+        Queues a refresh of the store up to the end date ('yyyy-mm-dd') unless one that covers it is already queued or running.
+        Returns a Future whose result is the number of appended rows.
+        """
+        with self._lock:
+            self._futures = {queued_end_date: future for queued_end_date, future in self._futures.items() if not future.done()}
+
+            for queued_end_date, future in self._futures.items():
+                if queued_end_date >= end_date:
+                    return future
+
+            future = self._executor.submit(self._refresh, end_date)
+            self._futures[end_date] = future
+
+            return future
+
+    def refresh(self, end_date, timeout=None):
+        """
+        Refreshes the store up to the end date ('yyyy-mm-dd') and waits for it. Returns the number of appended rows.
+        """
+        return self.request_refresh(end_date).result(timeout)
+
+    def ensure_store(self, csv_path='../data/all_stock_data.csv'):
+        """
+        Converts the csv of all stock prices into the price store if there is no store yet.
+        """
+        if price_store_exists(self.store_path):
+            return
+
+        with self._lock, store_file_lock(self.store_path):
+            if not price_store_exists(self.store_path):
+                convert_csv_to_price_store(csv_path, self.store_path)
+
+    def _refresh(self, end_date):
+
+        with store_file_lock(self.store_path):
+            # Another process may have refreshed the store while this one was waiting for the lock
+            if price_store_is_current(end_date, self.store_path):
+                return 0
+
+            return update_price_store(end_date, self.store_path, fetch_backend=self.fetch_backend)
+
+##########################################################################
+##########################################################################
+
+# Function 2: Process wide data refresher
+
+@lru_cache(maxsize=None)
+def get_data_refresher(store_path=DEFAULT_STORE_PATH):
+    """
+    The function returns the data refresher of a price store, the same one for every caller in the process.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+    Returns:
+
+        data_refresher (DataRefresher): the refresher of the store
+    """
+    return DataRefresher(store_path)
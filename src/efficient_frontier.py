@@ -0,0 +1,294 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+from collections import OrderedDict
+from scipy.optimize import brentq, minimize_scalar
+import numpy as np
+import math
+from optimization_functions import window_moments, solve_qp_active_set, max_return_weights, maximize_returns, maximize_sharpe_ratio, minimize_variance
+from risk_free_rate import as_risk_free_rate
+from price_index import price_matrix_key
+
+##########################################################################
+##########################################################################
+
+# Number of frontiers kept in memory by get_efficient_frontier
+EFFICIENT_FRONTIER_CACHE_SIZE = 16
+
+_efficient_frontier_cache = OrderedDict()
+
+##########################################################################
+##########################################################################
+
+# Class 1: Efficient frontier of the selected stocks in a lookback window
+
+class EfficientFrontier:
+    """
+    The minimum variance portfolios of the selected stocks for every daily return between the minimum variance portfolio and the highest return portfolio,
+    with the weights summing up to 1 and no weight above weightage_no_more_than, computed once on a grid of returns and then queried by the strategies.
+
+    Every grid point is the quadratic program min w'Cw subject to w.mu = r, sum(w) = 1 and 0 <= w <= cap, solved with solve_qp_active_set and started from the
+    previous grid point. Between two grid points with the same active constraints the weights are affine in r, so they are interpolated exactly,
+    otherwise the point is solved from the interpolation. The queries of maximize_returns, minimize_variance and maximize_sharpe_ratio are answered
+    by finding the grid interval of the answer and refining it on the frontier. When a query cannot be met on the frontier (for example a return floor
+    above the highest return), the optimizer is called with its SLSQP backend instead, as it would have been without the frontier.
+
+    Args:
+
+        selected_stocks (list): symbols of the selected stocks
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
+
+        buying_date_minus_1_year (string): start of the window in the format 'yyyy-mm-dd'
+
+        buying_date (string): end of the window (excluded) in the format 'yyyy-mm-dd'
+
+        weightage_no_more_than (float): maximum weight of a stock
+
+        grid_size (integer): number of grid points
+    """
+
+    def __init__(self, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than, grid_size=16):
+
+        self.selected_stocks = selected_stocks
+        self.all_stocks_df = all_stocks_df
+        self.returns_type = returns_type
+        self.buying_date_minus_1_year = buying_date_minus_1_year
+        self.buying_date = buying_date
+        self.weightage_no_more_than = weightage_no_more_than
+
+        self.average_returns, self.covariance_matrix = window_moments(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date)
+
+        num_symbs = len(self.average_returns)
+        self.upper_bound = min(1.0, weightage_no_more_than)
+
+        # Constraints in the form G w <= h: w >= 0 and w <= cap
+        self.constraint_matrix = np.vstack([-np.eye(num_symbs), np.eye(num_symbs)])
+        self.constraint_bounds = np.concatenate([np.zeros(num_symbs), np.full(num_symbs, self.upper_bound)])
+
+        # Number of quadratic programs solved and active set iterations, for reporting
+        self.solves = 0
+        self.iterations = 0
+
+        self.feasible = num_symbs > 0 and num_symbs * self.upper_bound >= 1
+
+        if self.feasible:
+            self._build(grid_size)
+
+    def _solve(self, target_return, initial_weights, working_set=None):
+
+        num_symbs = len(self.average_returns)
+
+        weights, multipliers, info = solve_qp_active_set(2 * self.covariance_matrix, np.zeros(num_symbs), self.constraint_matrix, self.constraint_bounds, initial_weights,
+                                                         equality_matrix=np.vstack([np.ones(num_symbs), self.average_returns]),
+                                                         equality_bounds=np.array([1.0, target_return]), working_set=working_set)
+
+        self.solves += 1
+        self.iterations += info['iterations']
+
+        return weights, tuple(sorted(info['working_set']))
+
+    def _build(self, grid_size):
+
+        num_symbs = len(self.average_returns)
+
+        # Minimum variance portfolio without a return target, from the equal weights
+        ones = np.ones((1, num_symbs))
+        minimum_variance_weights, multipliers, info = solve_qp_active_set(2 * self.covariance_matrix, np.zeros(num_symbs), self.constraint_matrix, self.constraint_bounds,
+                                                                          np.full(num_symbs, 1/num_symbs), equality_matrix=ones, equality_bounds=np.ones(1))
+        self.solves += 1
+        self.iterations += info['iterations']
+
+        self.maximum_return_weights = max_return_weights(self.average_returns, self.upper_bound)
+
+        lowest_return = np.dot(minimum_variance_weights, self.average_returns)
+        highest_return = np.dot(self.maximum_return_weights, self.average_returns)
+
+        if highest_return - lowest_return <= 1e-15:
+            grid_size = 1
+
+        self.grid_returns = np.linspace(lowest_return, highest_return, grid_size)
+        self.grid_weights = np.zeros((grid_size, num_symbs))
+        self.grid_working_sets = []
+
+        weights = minimum_variance_weights
+        previous_return = lowest_return
+
+        for k, target_return in enumerate(self.grid_returns):
+
+            # The previous point moved towards the highest return portfolio is a feasible start with the return of this point
+            if k > 0:
+                weights = weights + (target_return - previous_return) / (highest_return - previous_return) * (self.maximum_return_weights - weights)
+
+            working_set = None
+            if k > 0:
+                working_set = [i for i in self.grid_working_sets[-1] if abs(self.constraint_matrix[i] @ weights - self.constraint_bounds[i]) <= 1e-12]
+
+            weights, working_set = self._solve(target_return, weights, working_set)
+
+            self.grid_weights[k] = weights
+            self.grid_working_sets.append(working_set)
+            previous_return = target_return
+
+        self.grid_variances = np.einsum('ki,ij,kj->k', self.grid_weights, self.covariance_matrix, self.grid_weights)
+
+    def weights_at(self, target_return):
+        """
+        Returns the minimum variance weights with the daily return target_return, which has to be between the first and the last grid return.
+        """
+        if len(self.grid_returns) == 1:
+            return self.grid_weights[0]
+
+        k = int(np.clip(np.searchsorted(self.grid_returns, target_return) - 1, 0, len(self.grid_returns) - 2))
+
+        share = (target_return - self.grid_returns[k]) / (self.grid_returns[k + 1] - self.grid_returns[k])
+        weights = self.grid_weights[k] + share * (self.grid_weights[k + 1] - self.grid_weights[k])
+
+        if self.grid_working_sets[k] == self.grid_working_sets[k + 1]:
+            return weights
+
+        # The active constraints change inside the interval, the interpolation is only the start
+        working_set = [i for i in self.grid_working_sets[k] if i in self.grid_working_sets[k + 1]]
+
+        return self._solve(target_return, weights, working_set)[0]
+
+    def _variance_at(self, target_return):
+
+        weights = self.weights_at(target_return)
+
+        return np.dot(np.dot(weights, self.covariance_matrix), weights)
+
+    def _answer(self, problem, weights, race):
+
+        # In a race the frontier portfolio is a candidate against the raced methods, like the quadratic programs of the optimizers
+        if race is not None:
+            raced_weights, best_method = race.run(problem, candidates={'frontier': weights})
+            return [round(weight, 4) for weight in raced_weights], best_method
+
+        return [round(weight, 4) for weight in weights], 'frontier'
+
+    def minimize_variance(self, minimum_ann_ret, race=None):
+        """
+        Returns (weights, 'frontier') like minimize_variance, the minimum variance portfolio with an annual return of at least minimum_ann_ret.
+        With a race (OptimizerRace) the frontier portfolio is raced against the methods of the race and the winner is returned.
+        """
+        minimum_daily_return = (1 + minimum_ann_ret)**(1/365) - 1
+
+        if not self.feasible or minimum_daily_return > self.grid_returns[-1]:
+            return minimize_variance(self.selected_stocks, self.all_stocks_df, self.returns_type, self.buying_date_minus_1_year, self.buying_date,
+                                     minimum_ann_ret, self.weightage_no_more_than, backend='slsqp', race=race)
+
+        # Below the return of the minimum variance portfolio the floor does not bind
+        weights = self.weights_at(max(minimum_daily_return, self.grid_returns[0]))
+
+        problem = ('minimize_variance', self.average_returns, self.covariance_matrix, minimum_ann_ret, self.weightage_no_more_than, 0.0001)
+
+        return self._answer(problem, weights, race)
+
+    def maximize_returns(self, maximum_ann_stdev, race=None):
+        """
+        Returns (weights, 'frontier') like maximize_returns, the highest return portfolio with an annual standard deviation of at most maximum_ann_stdev.
+        The weights sum up to 1, without the 1% tolerance of the SLSQP backend of maximize_returns. With a race the frontier portfolio is raced as in minimize_variance.
+        """
+        maximum_variance = (maximum_ann_stdev / math.sqrt(252))**2
+
+        if not self.feasible or maximum_variance < self.grid_variances[0]:
+            return maximize_returns(self.selected_stocks, self.all_stocks_df, self.returns_type, self.buying_date_minus_1_year, self.buying_date,
+                                    maximum_ann_stdev, self.weightage_no_more_than, race=race)
+
+        if maximum_variance >= self.grid_variances[-1]:
+            weights = self.grid_weights[-1]
+        else:
+            # The variance grows with the return along the frontier, so the answer is the return at which it reaches the maximum
+            k = int(np.searchsorted(self.grid_variances, maximum_variance, side='right') - 1)
+            if maximum_variance == self.grid_variances[k]:
+                weights = self.grid_weights[k]
+            else:
+                target_return = brentq(lambda r: self._variance_at(r) - maximum_variance, self.grid_returns[k], self.grid_returns[k + 1], xtol=1e-15)
+                weights = self.weights_at(target_return)
+
+        problem = ('maximize_returns', self.average_returns, self.covariance_matrix, maximum_ann_stdev, self.weightage_no_more_than, 0.01)
+
+        return self._answer(problem, weights, race)
+
+    def maximize_sharpe_ratio(self, govt_bond_df, race=None):
+        """
+        Returns (weights, 'frontier') like maximize_sharpe_ratio, the portfolio on the frontier with the highest ((1 + r)^365 - 1 - risk free rate) / annual standard deviation.
+        With a race the frontier portfolio is raced as in minimize_variance.
+        """
+        risk_free_rate = as_risk_free_rate(govt_bond_df).rate_asof(self.buying_date)
+
+        if not self.feasible or (1 + self.grid_returns[-1])**365 - 1 <= risk_free_rate:
+            return maximize_sharpe_ratio(self.selected_stocks, self.all_stocks_df, self.returns_type, self.buying_date_minus_1_year, self.buying_date,
+                                         self.weightage_no_more_than, govt_bond_df, backend='slsqp', race=race)
+
+        def sharpe_ratio(target_return):
+            return (((1 + target_return)**365 - 1) - risk_free_rate) / (math.sqrt(max(self._variance_at(target_return), 0.0)) * math.sqrt(252))
+
+        # Best grid point, then the best return on the intervals next to it
+        grid_sharpe_ratios = (((1 + self.grid_returns)**365 - 1) - risk_free_rate) / (np.sqrt(np.maximum(self.grid_variances, 0.0)) * math.sqrt(252))
+        k = int(np.argmax(grid_sharpe_ratios))
+
+        if len(self.grid_returns) == 1:
+            weights = self.grid_weights[0]
+        else:
+            lower, upper = self.grid_returns[max(k - 1, 0)], self.grid_returns[min(k + 1, len(self.grid_returns) - 1)]
+            result = minimize_scalar(lambda r: -sharpe_ratio(r), bounds=(lower, upper), method='bounded', options={'xatol': 1e-13})
+            target_return = result.x if -result.fun >= grid_sharpe_ratios[k] else self.grid_returns[k]
+            weights = self.weights_at(target_return)
+
+        problem = ('maximize_sharpe_ratio', self.average_returns, self.covariance_matrix, risk_free_rate, self.weightage_no_more_than, 0.0001)
+
+        return self._answer(problem, weights, race)
+
+##########################################################################
+##########################################################################
+
+# Function 1: Shared efficient frontier of the selected stocks
+
+def get_efficient_frontier(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than):
+    """
+    The function returns the efficient frontier of the selected stocks in the window under the cap, built on the first call and shared by every later call
+    with the same arguments, so the optimizers of a strategy on the same stocks read one frontier.
+    A price matrix without a key (see price_matrix_key) is computed from on every call.
+
+    Args:
+
+        selected_stocks (list): symbols of the selected stocks
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
+
+        buying_date_minus_1_year (string): start of the window in the format 'yyyy-mm-dd'
+
+        buying_date (string): end of the window (excluded) in the format 'yyyy-mm-dd'
+
+        weightage_no_more_than (float): maximum weight of a stock
+
+    Returns:
+
+        efficient_frontier (EfficientFrontier): the frontier of the selected stocks
+    """
+    data_key = price_matrix_key(all_stocks_df)
+
+    if data_key is None:
+        return EfficientFrontier(list(selected_stocks), all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than)
+
+    key = (data_key, tuple(selected_stocks), returns_type, str(buying_date_minus_1_year), str(buying_date), weightage_no_more_than)
+
+    if key in _efficient_frontier_cache:
+        _efficient_frontier_cache.move_to_end(key)
+        return _efficient_frontier_cache[key]
+
+    efficient_frontier = EfficientFrontier(list(selected_stocks), all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than)
+
+    _efficient_frontier_cache[key] = efficient_frontier
+    if len(_efficient_frontier_cache) > EFFICIENT_FRONTIER_CACHE_SIZE:
+        _efficient_frontier_cache.popitem(last=False)
+
+    return efficient_frontier
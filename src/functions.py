@@ -9,18 +9,22 @@ import pandas as pd
 import math
 from calendar import monthrange
 import numpy as np
-import yfinance as yf
 import weight_allocation_strategies as w_a_s
+from data_download import yahoo_fetch_backend
+from ingestion import ingest_symbols
+from selection_engine import PeriodCalendar, asof_rows, returns_between_rows, stock_analysis_table, filter_cascade, period_return_tensor, pushdown_columns
+from price_index import get_price_index, lookback_start_date
 
 ##########################################################################
 ##########################################################################
 
 # Function 1: Extract and save stock data
 
-def generate_and_save_data(start_date, end_date):
+def generate_and_save_data(start_date, end_date, fetch_backend=yahoo_fetch_backend, batch_size=10, max_workers=4):
     """
     The function uses yahoo finance do download the stock data for all the stock symbols given in the file that's being pointed at using the file_path.
-    It saves all the data as a csv file.
+    The symbols are downloaded in batches on a thread pool and streamed into the price store with a checkpoint per symbol (see ingestion.py),
+    so an interrupted download resumes where it stopped when the function is called again with the same dates.
 
     Args:
 
@@ -28,6 +32,12 @@ def generate_and_save_data(start_date, end_date):
 
         end_date (datetime.datetime): it is the end date after which the historical stock prices need not be saved
 
+        fetch_backend (function): backend used to fetch a batch of symbols, yahoo finance by default
+
+        batch_size (integer): number of symbols downloaded together in one request, it also bounds the memory used by the download
+
+        max_workers (integer): maximum number of batches downloaded at the same time
+
     Returns:
 
         The function has no return values
@@ -53,41 +63,14 @@ def generate_and_save_data(start_date, end_date):
         symbols.remove('WELSPUNIND.NS')
         symbols.append('WELSPUNLIV.NS')
 
-        # Function to fetch and return daily data for a given symbol
-        def get_daily_data(symbol):
-
-            data = yf.download(symbol, start_date, end_date, interval="1d")
-            return data
-
-        # Dictionary to hold data for all symbols
-        all_data = {}
-
-        # Loop through each symbol and fetch its weekly data
-        for symbol in symbols:
-            df = get_daily_data(symbol)
-            all_data[symbol] = df
-
-        close_columns = [df['Adj Close'] for df in all_data.values()]
-
-        all_stocks_df = pd.DataFrame()
-        all_stocks_df = pd.concat(close_columns, axis=1)
-        column_names = []
-        column_names += list(all_data.keys())
-        all_stocks_df.columns = column_names
+        # Every symbol is checkpointed as soon as it arrives and then assembled into the price store
+        manifest = ingest_symbols(symbols, start_date, end_date, fetch_backend=fetch_backend, batch_size=batch_size, max_workers=max_workers)
 
-        all_stocks_df.index = pd.to_datetime(all_stocks_df.index)
-        all_stocks_df = all_stocks_df.sort_index()
-
-        all_stocks_df = all_stocks_df.backfill()
-        all_stocks_df = all_stocks_df.drop_duplicates()
-        all_stocks_df.dropna(axis=1)
-
-        all_stocks_df.to_csv('../data/all_stock_data.csv')
-
-        print(f"Stock data from the date {start_date} to the date {end_date} is succesfully downloaded and saved as 'all_stock_data.csv'.")
+        if manifest is not None:
+            print(f"Stock data from the date {start_date} to the date {end_date} is succesfully downloaded and saved in the price store.")
 
     except Exception as e:
-        print(f"An error occurred: {e}")
+        print(f"An error occurred: {e}. Run the function again with the same dates to resume from the last checkpoint.")
 
 ##########################################################################
 ##########################################################################
@@ -218,368 +201,169 @@ def get_closest_valid_date(date_str):
 ##########################################################################
 ##########################################################################
 
-# Function 5: Stock selection for 3 month holding period strategies
-
-def one_quarter_stock_selection(buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years):
+# Calendars of the analysis periods of the two holding period strategies
 
-    three_month_periods, selling_date = generate_three_month_periods(buying_date, holding_period)
+THREE_MONTH_PERIOD_CALENDAR = PeriodCalendar(generate_three_month_periods, recent_periods={2: 22, 1: 10, 0.5: 4, 0.25: 1}, newest_first=True)
 
-    columns = ['Date Range'] + list(all_stocks_df.columns)
-    returns_3_month_periods_df = pd.DataFrame(columns=columns)
+ONE_MONTH_PERIOD_CALENDAR = PeriodCalendar(generate_one_month_periods, recent_periods={2: 70, 1: 34, 0.5: 16, 0.25: 7}, newest_first=False, max_count_periods=106)
 
-    # Iterate over each date range
-    for start_date, end_date in three_month_periods:
-        # initialize a row with the date range
-        row = {'Date Range': f'{start_date} to {end_date}'}
-
-        # converting date to same type
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
+##########################################################################
+##########################################################################
 
-        nearest_start_date = all_stocks_df.index.asof(start_date)
-        nearest_end_date = all_stocks_df.index.asof(end_date)
-        
-        # calculate return percentage for each stock symbol
-        for stock in all_stocks_df.columns:
-
-            initial_price = all_stocks_df.loc[nearest_start_date, stock]
-            final_price = all_stocks_df.loc[nearest_end_date, stock]
-            
-            if returns_type == 'SR':
-                return_percentage = ((final_price - initial_price) / initial_price) * 100
-            elif returns_type == 'LR':
-                return_percentage = np.log(final_price / initial_price) * 100
-            else:
-                print("Incorrect Argument for 'returns_type'. Has to be either 'SR' or 'LR'")
-                break
-
-            row[stock] = return_percentage
-        
-        # append the row to the new DataFrame
-        returns_3_month_periods_df = returns_3_month_periods_df.append(row, ignore_index=True)
-    
-    if last_x_years == 1:
-        buying_date_minus_1_year = str(int(buying_date[:4])-1)+buying_date[4:]
+# Function 5: Stock selection engine
 
-    elif last_x_years == 2:
-        buying_date_minus_1_year = str(int(buying_date[:4])-2)+buying_date[4:]
-    
-    elif last_x_years == 0.5:
-        year = buying_date[:4]
-        month = buying_date[5:7]
-        day = buying_date[8:10]
-        if int(month) <= 6:
-            year = str(int(year)-1)
-            month = str(12+(int(month)-6))
-        else:
-            month = str(int(month)-6)
-        if len(month) == 1:
-                month = '0'+month
-        buying_date_minus_1_year = year+'-'+month+'-'+day
-    
-    elif last_x_years == 0.25:
-        year = buying_date[:4]
-        month = buying_date[5:7]
-        day = buying_date[8:10]
-        if int(month) <= 3:
-            year = str(int(year)-1)
-            month = str(12+(int(month)-3))
-        else:
-            month = str(int(month)-3)
-        if len(month) == 1:
-                month = '0'+month
-        buying_date_minus_1_year = year+'-'+month+'-'+day
+def select_stocks(period_calendar, buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years, survivor_counts=None):
+    """
+    The function selects the stocks for a buying date. The analysis periods, the last x years of them and the scaling of max_non_positive_returns_count
+    come from the period calendar, everything else is shared by the 3 month and the 1 month strategies.
 
-    try:
-        last_1_year_stock_df = all_stocks_df[(all_stocks_df.index >= buying_date_minus_1_year) & (all_stocks_df.index < buying_date)]
-    except:
-        buying_date_minus_1_year = get_closest_valid_date(buying_date_minus_1_year)[:10]
-        last_1_year_stock_df = all_stocks_df[(all_stocks_df.index >= buying_date_minus_1_year) & (all_stocks_df.index < buying_date)]
-
-    # Initialize a list to store the data for the new DataFrame
-    data = []
-
-    # Iterate through each stock symbol in new_df's columns (except the 'Date Range' column)
-    for stock in returns_3_month_periods_df.columns[1:]:
-        # Get the series of returns for this stock
-        returns = returns_3_month_periods_df[stock]
-
-        # Calculate the number of positive and non-positive returns
-        positive_returns_count = (returns > 0).sum()
-        non_positive_returns_count = (returns <= 0).sum()
-
-        # Calculate the standard deviation and average of the returns
-        std_dev_returns = returns.std()
-        avg_returns = returns.mean()
-
-        # Get the last x years rows for the stock
-        if last_x_years == 2:
-            last_13_returns = returns_3_month_periods_df[stock].head(22)
-        
-        elif last_x_years == 1:
-            last_13_returns = returns_3_month_periods_df[stock].head(10)
+    Args:
 
-        elif last_x_years == 0.5:
-            last_13_returns = returns_3_month_periods_df[stock].head(4)
+        period_calendar (PeriodCalendar): THREE_MONTH_PERIOD_CALENDAR or ONE_MONTH_PERIOD_CALENDAR
 
-        elif last_x_years == 0.25:
-            last_13_returns = returns_3_month_periods_df[stock].head(1)
+        buying_date (string): it is a string of the buying date in the format 'yyyy-mm-dd'
 
-        # Calculate the stats for the last 13 periods
-        positive_last_13_count = (last_13_returns > 0).sum()
-        non_positive_last_13_count = (last_13_returns <= 0).sum()
-        std_dev_last_13 = last_13_returns.std()
-        avg_last_13 = last_13_returns.mean()
+        holding_period (string): it can be either '1q' (1 quarter) or '1m' (1 month)
 
-        daily_avg_ret_all_time = all_stocks_df.pct_change().iloc[1:].mean()[stock]
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
 
-        daily_avg_ret_last_1_year = last_1_year_stock_df.pct_change().iloc[1:].mean()[stock]
+        max_non_positive_returns_count (integer): maximum number of non-positive periods out of 34, used when filters = 4
 
-        # Append the calculated values to the data list
-        data.append([stock, daily_avg_ret_all_time, positive_returns_count, non_positive_returns_count, std_dev_returns, avg_returns, 
-                    daily_avg_ret_last_1_year, positive_last_13_count, non_positive_last_13_count, std_dev_last_13, avg_last_13])
+        all_stocks_df (pandas dataframe): historical stock prices of all the stocks
 
-    # Create a new DataFrame with the calculated data
-    stock_analysis_df = pd.DataFrame(data, columns=['Stock Symbol', 'Daily Average Returns All Time', 'Positive Returns Count', 'Non-Positive Returns Count', 
-                                            'Std Dev Returns', 'Average Returns All 3MP', 'Daily Average Returns Last X Year', 'Positive Last X Years Count', 
-                                            'Non-Positive Last X Years Count', 'Std Dev Last X Years', 'Average Last X Years 3MP'])
+        filters (integer): it can be 2, 3 or 4
 
-    filter_1 = stock_analysis_df[stock_analysis_df['Daily Average Returns All Time'] > 0]
+        last_x_years (float): it can be 2, 1, 0.5 or 0.25
 
-    filter_2 = filter_1[filter_1['Daily Average Returns Last X Year'] > 0]
+        survivor_counts (dictionary): if given, the number of stocks in the universe and left after every stage of the filters is added to it
 
-    # for strategy 1,2,3,4,5,6,7,8
+    Returns:
 
-    if filters == 4:
+        selected_stocks (list): symbols of the selected stocks
 
-        filter_3 = filter_2[(filter_2['Non-Positive Last X Years Count']==0)]
+        selling_date (string): date on which the portfolio should be sold according to the strategy
+    """
+    start_dates, end_dates, selling_date = period_calendar.periods(buying_date, holding_period)
 
-        filter_4 = filter_3[(filter_3['Non-Positive Returns Count'] <= max_non_positive_returns_count)]
+    max_non_positive_returns_count = period_calendar.scale_max_count(max_non_positive_returns_count)
 
-        if len(filter_4) < 5 or len(filter_4) > 30:
+    # Mean daily returns over all the data and over the last x years, read from the prefix sums shared by every call on the same data
+    price_index = get_price_index(all_stocks_df)
 
-            filter_4 = filter_3.sort_values(by='Non-Positive Returns Count').iloc[:30]
+    daily_average_returns = price_index.mean_daily_returns()
+    daily_average_returns_last_x_years = pd.Series(price_index.mean_daily_returns_rows(*price_index.lookback_calendar.rows(buying_date, last_x_years)), index=all_stocks_df.columns)
 
-            if len(filter_4) < 5:
+    # The filters 3 and 4 only keep stocks with positive daily averages, which are cheap to check,
+    # so the period statistics are computed for those stocks only
+    columns = pushdown_columns(daily_average_returns.to_numpy(), daily_average_returns_last_x_years.to_numpy(), filters)
 
-                filter_4 = filter_2.sort_values(by='Non-Positive Last X Years Count').iloc[:30]
-        
-        selected_stocks = list(filter_4['Stock Symbol'])
+    if survivor_counts is not None:
+        survivor_counts['Universe'] = all_stocks_df.shape[1]
 
-    # for strategy 9,10,11,12
-    
-    elif filters == 3:
+    # Return percentage of every remaining stock over every period, gathered in one vectorized step
+    returns_matrix = returns_between_rows(all_stocks_df.to_numpy(), asof_rows(all_stocks_df.index, start_dates), asof_rows(all_stocks_df.index, end_dates), returns_type, columns)
+    returns_periods_df = pd.DataFrame(returns_matrix, columns=all_stocks_df.columns[columns])
 
-        filter_3 = filter_2[(filter_2['Non-Positive Last X Years Count']==0)]
+    last_x_years_returns_df = returns_periods_df.iloc[period_calendar.last_x_years_rows(last_x_years)]
 
-        if len(filter_3) < 5 or len(filter_3) > 30:
+    # Counts, standard deviations and averages of the remaining stocks computed column wise in one pass
+    stock_analysis_df = stock_analysis_table(returns_periods_df, last_x_years_returns_df, daily_average_returns, daily_average_returns_last_x_years)
 
-            filter_3 = filter_2.sort_values(by='Non-Positive Last X Years Count').iloc[:30]
+    selected_rows = filter_cascade(stock_analysis_df, filters, max_non_positive_returns_count, survivor_counts)
 
-        selected_stocks = list(filter_3['Stock Symbol'])
+    selected_stocks = list(stock_analysis_df['Stock Symbol'].to_numpy()[selected_rows])
 
-    # for strategy 13,14,15,16
-        
-    elif filters == 2:
-
-        filtered_stocks = []
-        i = 0
-        while len(filtered_stocks) < 50:
-            filter_1 = stock_analysis_df[stock_analysis_df['Non-Positive Last X Years Count']<=i]
-            filtered_stocks = list(filter_1['Stock Symbol'])
-            i += 1
-        
-        filter_2 = filter_1.sort_values(by='Daily Average Returns Last X Year', ascending=False).iloc[:30]
-
-        selected_stocks = list(filter_2['Stock Symbol'])
-    
     return selected_stocks, selling_date
 
 ##########################################################################
 ##########################################################################
 
-# Function 6: Stock selection for 1 month holding period strategies
+# Function 6: Stock selection engine for many buying dates
 
-def one_month_stock_selection(buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years):
+def select_stocks_batch(period_calendar, buying_dates, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years):
+    """
+    The function selects the stocks for all the rebalance dates of a backtest in one pass. The period returns of all the buying dates are built as one
+    buying dates x periods x stocks tensor over a shared period grid, the counts and the daily averages of all the dates are computed together,
+    and only the filter cascade runs per buying date. The selections are the same as calling select_stocks for every buying date.
 
-    one_month_periods, selling_date = generate_one_month_periods(buying_date, holding_period)
+    Args:
 
-    if max_non_positive_returns_count != None:
-        max_non_positive_returns_count = round((max_non_positive_returns_count/34)*106)
+        period_calendar (PeriodCalendar): THREE_MONTH_PERIOD_CALENDAR or ONE_MONTH_PERIOD_CALENDAR
 
-    columns = ['Date Range'] + list(all_stocks_df.columns)
-    returns_3_month_periods_df = pd.DataFrame(columns=columns)
+        buying_dates (list): buying dates as strings in the format 'yyyy-mm-dd'
 
-    # Iterate over each date range
-    for start_date, end_date in one_month_periods:
-        # initialize a row with the date range
-        row = {'Date Range': f'{start_date} to {end_date}'}
+        holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years: same as for select_stocks
 
-        # converting date to same type
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
+    Returns:
 
-        nearest_start_date = all_stocks_df.index.asof(start_date)
-        nearest_end_date = all_stocks_df.index.asof(end_date)
-        
-        # calculate return percentage for each stock symbol
-        for stock in all_stocks_df.columns:
-
-            initial_price = all_stocks_df.loc[nearest_start_date, stock]
-            final_price = all_stocks_df.loc[nearest_end_date, stock]
-            
-            if returns_type == 'SR':
-                return_percentage = ((final_price - initial_price) / initial_price) * 100
-            elif returns_type == 'LR':
-                return_percentage = np.log(final_price / initial_price) * 100
-            else:
-                print("Incorrect Argument for 'returns_type'. Has to be either 'SR' or 'LR'")
-                break
-
-            row[stock] = return_percentage
-        
-        # append the row to the new DataFrame
-        returns_3_month_periods_df = returns_3_month_periods_df.append(row, ignore_index=True)
-    
-    if last_x_years == 1:
-        buying_date_minus_1_year = str(int(buying_date[:4])-1)+buying_date[4:]
-       
-    elif last_x_years == 2:
-        buying_date_minus_1_year = str(int(buying_date[:4])-2)+buying_date[4:]
-    
-    elif last_x_years == 0.5:
-        year = buying_date[:4]
-        month = buying_date[5:7]
-        day = buying_date[8:10]
-        if int(month) <= 6:
-            year = str(int(year)-1)
-            month = str(12+(int(month)-6))
-        else:
-            month = str(int(month)-6)
-        if len(month) == 1:
-                month = '0'+month
-        buying_date_minus_1_year = year+'-'+month+'-'+day
-    
-    elif last_x_years == 0.25:
-        year = buying_date[:4]
-        month = buying_date[5:7]
-        day = buying_date[8:10]
-        if int(month) <= 3:
-            year = str(int(year)-1)
-            month = str(12+(int(month)-3))
-        else:
-            month = str(int(month)-3)
-        if len(month) == 1:
-                month = '0'+month
-        buying_date_minus_1_year = year+'-'+month+'-'+day
-
-    last_1_year_stock_df = all_stocks_df[(all_stocks_df.index >= buying_date_minus_1_year) & (all_stocks_df.index < buying_date)]
-
-    # Initialize a list to store the data for the new DataFrame
-    data = []
-
-    # Iterate through each stock symbol in new_df's columns (except the 'Date Range' column)
-    for stock in returns_3_month_periods_df.columns[1:]:
-        # Get the series of returns for this stock
-        returns = returns_3_month_periods_df[stock]
-
-        # Calculate the number of positive and non-positive returns
-        positive_returns_count = (returns > 0).sum()
-        non_positive_returns_count = (returns <= 0).sum()
-
-        # Calculate the standard deviation and average of the returns
-        std_dev_returns = returns.std()
-        avg_returns = returns.mean()
-
-        # Get the last x years rows for the stock
-        if last_x_years == 2:
-            last_13_returns = returns_3_month_periods_df[stock].tail(70)
-        
-        elif last_x_years == 1:
-            last_13_returns = returns_3_month_periods_df[stock].tail(34)
+        selections (list of tuples): (selected_stocks, selling_date) of every buying date, in the order of buying_dates
+    """
+    periods = [period_calendar.periods(buying_date, holding_period) for buying_date in buying_dates]
 
-        elif last_x_years == 0.5:
-            last_13_returns = returns_3_month_periods_df[stock].tail(16)
+    max_non_positive_returns_count = period_calendar.scale_max_count(max_non_positive_returns_count)
 
-        elif last_x_years == 0.25:
-            last_13_returns = returns_3_month_periods_df[stock].tail(7)
+    price_index = get_price_index(all_stocks_df)
 
-        # Calculate the stats for the last 13 periods
-        positive_last_13_count = (last_13_returns > 0).sum()
-        non_positive_last_13_count = (last_13_returns <= 0).sum()
-        std_dev_last_13 = last_13_returns.std()
-        avg_last_13 = last_13_returns.mean()
+    daily_average_returns = price_index.mean_daily_returns().to_numpy()
+    daily_average_returns_last_x_years = price_index.mean_daily_returns_rows(*price_index.lookback_calendar.rows_many(buying_dates, last_x_years))
 
-        daily_avg_ret_all_time = all_stocks_df.pct_change().iloc[1:].mean()[stock]
+    # Only the stocks that pass the cheap filters on at least one buying date need the period statistics
+    columns = pushdown_columns(daily_average_returns, daily_average_returns_last_x_years, filters)
 
-        daily_avg_ret_last_1_year = last_1_year_stock_df.pct_change().iloc[1:].mean()[stock]
+    returns_tensor, period_counts = period_return_tensor(all_stocks_df, [start_dates for start_dates, end_dates, selling_date in periods], [end_dates for start_dates, end_dates, selling_date in periods], returns_type, columns)
 
-        # Append the calculated values to the data list
-        data.append([stock, daily_avg_ret_all_time, positive_returns_count, non_positive_returns_count, std_dev_returns, avg_returns, 
-                    daily_avg_ret_last_1_year, positive_last_13_count, non_positive_last_13_count, std_dev_last_13, avg_last_13])
+    # Periods of every buying date that fall in the last x years
+    last_x_years_mask = np.zeros(returns_tensor.shape[:2], dtype=bool)
+    for i, period_count in enumerate(period_counts):
+        last_x_years_mask[i, np.arange(period_count)[period_calendar.last_x_years_rows(last_x_years)]] = True
 
-    # Create a new DataFrame with the calculated data
-    stock_analysis_df = pd.DataFrame(data, columns=['Stock Symbol', 'Daily Average Returns All Time', 'Positive Returns Count', 'Non-Positive Returns Count', 
-                                            'Std Dev Returns', 'Average Returns All 3MP', 'Daily Average Returns Last X Year', 'Positive Last X Years Count', 
-                                            'Non-Positive Last X Years Count', 'Std Dev Last X Years', 'Average Last X Years 3MP'])
+    non_positive_returns = returns_tensor <= 0
 
-    filter_1 = stock_analysis_df[stock_analysis_df['Daily Average Returns All Time'] > 0]
-    
-    filter_2 = filter_1[filter_1['Daily Average Returns Last X Year'] > 0]
+    non_positive_count = non_positive_returns.sum(axis=1)
+    non_positive_last_x_years_count = (non_positive_returns & last_x_years_mask[:, :, None]).sum(axis=1)
 
-    # for strategy 1,2,3,4,5,6,7,8
+    symbols = all_stocks_df.columns.to_numpy()[columns]
 
-    if filters == 4:
+    daily_average_returns = daily_average_returns[columns]
+    daily_average_returns_last_x_years = daily_average_returns_last_x_years[:, columns]
 
-        filter_3 = filter_2[(filter_2['Non-Positive Last X Years Count']==0)]
+    selections = []
 
-        filter_4 = filter_3[(filter_3['Non-Positive Returns Count'] <= max_non_positive_returns_count)]
+    for i in range(len(buying_dates)):
 
-        if len(filter_4) < 5 or len(filter_4) > 30:
+        selected_rows = filter_cascade({'Daily Average Returns All Time': daily_average_returns,
+                                        'Daily Average Returns Last X Year': daily_average_returns_last_x_years[i],
+                                        'Non-Positive Returns Count': non_positive_count[i],
+                                        'Non-Positive Last X Years Count': non_positive_last_x_years_count[i]}, filters, max_non_positive_returns_count)
 
-            filter_4 = filter_3.sort_values(by='Non-Positive Returns Count').iloc[:30]
+        selections.append((list(symbols[selected_rows]), periods[i][2]))
 
-            if len(filter_4) < 5:
+    return selections
 
-                filter_4 = filter_2.sort_values(by='Non-Positive Last X Years Count').iloc[:30]
-        
-        selected_stocks = list(filter_4['Stock Symbol'])
+##########################################################################
+##########################################################################
 
-    # for strategy 9,10,11,12
-    
-    elif filters == 3:
+# Function 7: Stock selection for 3 month holding period strategies
 
-        filter_3 = filter_2[(filter_2['Non-Positive Last X Years Count']==0)]
+def one_quarter_stock_selection(buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years):
 
-        if len(filter_3) < 5 or len(filter_3) > 30:
+    return select_stocks(THREE_MONTH_PERIOD_CALENDAR, buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years)
 
-            filter_3 = filter_2.sort_values(by='Non-Positive Last X Years Count').iloc[:30]
+##########################################################################
+##########################################################################
 
-        selected_stocks = list(filter_3['Stock Symbol'])
+# Function 8: Stock selection for 1 month holding period strategies
 
-    # for strategy 13,14,15,16
-        
-    elif filters == 2:
-
-        filtered_stocks = []
-        i = 0
-        while len(filtered_stocks) < 50:
-            filter_1 = stock_analysis_df[stock_analysis_df['Non-Positive Last X Years Count']<=i]
-            filtered_stocks = list(filter_1['Stock Symbol'])
-            i += 1
-        
-        filter_2 = filter_1.sort_values(by='Daily Average Returns Last X Year', ascending=False).iloc[:30]
+def one_month_stock_selection(buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years):
 
-        selected_stocks = list(filter_2['Stock Symbol'])
-    
-    return selected_stocks, selling_date
+    return select_stocks(ONE_MONTH_PERIOD_CALENDAR, buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years)
 
 ##########################################################################
 ##########################################################################
     
-# Function 7: Filtering the stocks according to the strategy and calling the appropriate weight allocation strategy
+# Function 9: Filtering the stocks according to the strategy and calling the appropriate weight allocation strategy
 
-def stock_selection_weight_allocation(buying_date, holding_period, returns_type, max_non_positive_returns_count, weight_allocation_strategy, all_stocks_df, govt_bond_df, filters, last_x_years, last_x_years_opt):
+def stock_selection_weight_allocation(buying_date, holding_period, returns_type, max_non_positive_returns_count, weight_allocation_strategy, all_stocks_df, govt_bond_df, filters, last_x_years, last_x_years_opt, selection=None, solver_state=None, race=None):
     '''
     The function takes all the below given arguments to filter and select stocks based on the defined rules in strategies.txt and calls the appropriate weight allocation strtegy function and returns the final portfolio.
 
@@ -597,10 +381,16 @@ def stock_selection_weight_allocation(buying_date, holding_period, returns_type,
 
         all_stocks_df (pandas dataframe): it is the pandas dataframe of all the historical stock prices for the dates used while generating the dataframe
 
-        govt_bond_df (pandas dataframe): it is the pandas dataframe of government bond data that will be use further in some of the weight allocation strategies
+        govt_bond_df (RiskFreeRate or pandas dataframe): it is the government bond data (preferably parsed once with load_risk_free_rate) that will be use further in some of the weight allocation strategies
 
         filters (integer): it is the number of filters to be applied and for now it can either be 3 or 4
 
+        selection (tuple): (selected_stocks, selling_date) of the buying date when the stocks were already selected with select_stocks_batch, None to select them here
+
+        solver_state (dictionary): warm starts of the optimizers kept from one buying date to the next, see prep_call_weight_allocation_strategy
+
+        race (OptimizerRace): if given, the optimizers race several methods and starting points in a process pool, see prep_call_weight_allocation_strategy
+
     Returns:
 
         portfolio (dictionary of string:float type): a dictionary of symbols chosen as the keys and their weightages as the values
@@ -609,55 +399,25 @@ def stock_selection_weight_allocation(buying_date, holding_period, returns_type,
 
         best_method (string): it is the best method out of the 3 different optimization algorthims that the weight allocation strategies are using just for analysis
     '''
-    if holding_period == '1q':
+    if selection is not None:
+        selected_stocks, selling_date = selection
+    elif holding_period == '1q':
         selected_stocks, selling_date = one_quarter_stock_selection(buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years)
     elif holding_period == '1m':
         selected_stocks, selling_date = one_month_stock_selection(buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years)
 
-    if last_x_years_opt == 1:
-        buying_date_minus_x_year = str(int(buying_date[:4])-1)+buying_date[4:]
-
-    elif last_x_years_opt == 2:
-        buying_date_minus_x_year = str(int(buying_date[:4])-2)+buying_date[4:]
-
-    elif last_x_years_opt == 0.5:
-        year = buying_date[:4]
-        month = buying_date[5:7]
-        day = buying_date[8:10]
-        if int(month) <= 6:
-            year = str(int(year)-1)
-            month = str(12+(int(month)-6))
-        else:
-            month = str(int(month)-6)
-        if len(month) == 1:
-            month = '0'+month
-        buying_date_minus_x_year = year+'-'+month+'-'+day
-    
-    elif last_x_years_opt == 0.25:
-        year = buying_date[:4]
-        month = buying_date[5:7]
-        day = buying_date[8:10]
-        if int(month) <= 3:
-            year = str(int(year)-1)
-            month = str(12+(int(month)-3))
-        else:
-            month = str(int(month)-3)
-        if len(month) == 1:
-            month = '0'+month
-        buying_date_minus_x_year = year+'-'+month+'-'+day
-
-    buying_date_minus_x_year = get_closest_valid_date(buying_date_minus_x_year)[:10]
-
-    portfolio, best_method = prep_call_weight_allocation_strategy(returns_type, buying_date_minus_x_year, buying_date, selected_stocks, weight_allocation_strategy, all_stocks_df, govt_bond_df)
+    buying_date_minus_x_year = lookback_start_date(buying_date, last_x_years_opt)
+
+    portfolio, best_method = prep_call_weight_allocation_strategy(returns_type, buying_date_minus_x_year, buying_date, selected_stocks, weight_allocation_strategy, all_stocks_df, govt_bond_df, solver_state, race)
 
     return portfolio, selling_date, best_method
 
 ##########################################################################
 ##########################################################################
     
-# Function 8: Preperation for Weight Allocation
+# Function 10: Preperation for Weight Allocation
 
-def prep_call_weight_allocation_strategy(returns_type, buying_date_minus_x_year, buying_date, selected_stocks, strategy_number, all_stocks_df, govt_bond_df):
+def prep_call_weight_allocation_strategy(returns_type, buying_date_minus_x_year, buying_date, selected_stocks, strategy_number, all_stocks_df, govt_bond_df, solver_state=None, race=None):
     '''
     The function takes all the below described arguments and calls the chosen weight allocation strategy function to return the final portfolio and the best algorithm for optimization
 
@@ -675,7 +435,13 @@ def prep_call_weight_allocation_strategy(returns_type, buying_date_minus_x_year,
     
         all_stocks_df (pandas dataframe): it is the pandas dataframe of all the historical stock prices for the dates used while generating the dataframe
 
-        govt_bond_df (pandas dataframe): it is the pandas dataframe of government bond data that will be use further in some of the weight allocation strategies
+        govt_bond_df (RiskFreeRate or pandas dataframe): it is the government bond data (preferably parsed once with load_risk_free_rate) that will be use further in some of the weight allocation strategies
+
+        solver_state (dictionary): if given, the solutions of the optimizers of every strategy are kept in solver_state[strategy_number] and are the starting points
+                                   of the same optimizers on the next call, remapped to the selected stocks by symbol (see warm_start_report for the iterations)
+
+        race (OptimizerRace): if given, the optimizers of strategies 2 to 11 race several methods and starting points in a process pool
+                              against their own backends, and best_method is the winner of every race
     
     Returns:
 
@@ -685,38 +451,41 @@ def prep_call_weight_allocation_strategy(returns_type, buying_date_minus_x_year,
     '''
     if len(selected_stocks) > 0:
 
+        # Warm starts of the optimizers of the strategy, None for cold starts
+        strategy_state = None if solver_state is None else solver_state.setdefault(strategy_number, {})
+
         if strategy_number == 1:
             portfolio, best_method = w_a_s.weight_allocation_1(selected_stocks)
 
         elif strategy_number == 2:
-            portfolio, best_method = w_a_s.weight_allocation_2(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date)
+            portfolio, best_method = w_a_s.weight_allocation_2(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, solver_state=strategy_state, race=race)
         
         elif strategy_number == 3:
-            portfolio, best_method = w_a_s.weight_allocation_3(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date)
+            portfolio, best_method = w_a_s.weight_allocation_3(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, solver_state=strategy_state, race=race)
         
         elif strategy_number == 4:
-            portfolio, best_method = w_a_s.weight_allocation_4(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df)
+            portfolio, best_method = w_a_s.weight_allocation_4(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df, solver_state=strategy_state, race=race)
         
         elif strategy_number == 5:
-            portfolio, best_method = w_a_s.weight_allocation_5(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df)
+            portfolio, best_method = w_a_s.weight_allocation_5(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df, solver_state=strategy_state, race=race)
         
         elif strategy_number == 6:
-            portfolio, best_method = w_a_s.weight_allocation_6(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date)
+            portfolio, best_method = w_a_s.weight_allocation_6(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, solver_state=strategy_state, race=race)
         
         elif strategy_number == 7:
-            portfolio, best_method = w_a_s.weight_allocation_7(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date)
+            portfolio, best_method = w_a_s.weight_allocation_7(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, solver_state=strategy_state, race=race)
         
         elif strategy_number == 8:
-            portfolio, best_method = w_a_s.weight_allocation_8(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df)
+            portfolio, best_method = w_a_s.weight_allocation_8(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df, solver_state=strategy_state, race=race)
         
         elif strategy_number == 9:
-            portfolio, best_method = w_a_s.weight_allocation_9(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df)
+            portfolio, best_method = w_a_s.weight_allocation_9(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df, solver_state=strategy_state, race=race)
 
         elif strategy_number == 10:
-            portfolio, best_method = w_a_s.weight_allocation_10(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df)
+            portfolio, best_method = w_a_s.weight_allocation_10(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df, solver_state=strategy_state, race=race)
 
         elif strategy_number == 11:
-            portfolio, best_method = w_a_s.weight_allocation_11(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df)
+            portfolio, best_method = w_a_s.weight_allocation_11(selected_stocks, all_stocks_df, returns_type, buying_date_minus_x_year, buying_date, govt_bond_df, solver_state=strategy_state, race=race)
 
         return portfolio, best_method
     
@@ -727,7 +496,7 @@ def prep_call_weight_allocation_strategy(returns_type, buying_date_minus_x_year,
 ##########################################################################
 ##########################################################################
     
-# Function 9: Function to adjust weights of a portfolio
+# Function 11: Function to adjust weights of a portfolio
 
 def adjust_portfolio(portfolio):
     """
@@ -0,0 +1,241 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from data_download import yahoo_fetch_backend, iter_downloaded_batches
+from price_store import DEFAULT_STORE_PATH, publish_price_store
+from data_refresher import store_file_lock
+
+##########################################################################
+##########################################################################
+
+# Layout of the staging directory (next to the price store):
+#   run.json         symbols and date range of the ingestion, a different run starts from scratch
+#   <symbol>.npz     checkpoint of one symbol: its dates and adjusted close prices
+#   prices.npy       output buffer that the checkpoints are assembled into
+#   dates.npy        date axis of the output buffer
+
+RUN_FILE = 'run.json'
+
+##########################################################################
+##########################################################################
+
+# Function 1: Path of the checkpoint of a symbol
+
+def symbol_checkpoint_path(staging_path, symbol):
+    """
+    The function returns the path of the checkpoint file of a symbol.
+
+    Args:
+
+        staging_path (string): path of the staging directory
+
+        symbol (string): yahoo finance symbol
+
+    Returns:
+
+        checkpoint_path (string): path of the .npz checkpoint
+    """
+    return os.path.join(staging_path, symbol + '.npz')
+
+##########################################################################
+##########################################################################
+
+# Function 2: Save the checkpoint of a symbol
+
+def save_symbol_checkpoint(staging_path, symbol, adj_close):
+    """
+    The function saves the adjusted close prices of one symbol as its checkpoint. The file is renamed into place once it is complete,
+    so a symbol either has a full checkpoint or none at all.
+
+    Args:
+
+        staging_path (string): path of the staging directory
+
+        symbol (string): yahoo finance symbol
+
+        adj_close (pandas series): adjusted close prices of the symbol with the dates as the index
+
+    Returns:
+
+        The function has no return values
+    """
+    adj_close = adj_close.dropna()
+
+    checkpoint_path = symbol_checkpoint_path(staging_path, symbol)
+    temp_path = checkpoint_path + '.tmp'
+
+    with open(temp_path, 'wb') as f:
+        np.savez(f, dates=pd.to_datetime(adj_close.index).to_numpy(dtype='datetime64[ns]'), prices=adj_close.to_numpy(dtype='float64'))
+
+    os.replace(temp_path, checkpoint_path)
+
+##########################################################################
+##########################################################################
+
+# Function 3: Prepare the staging directory of a run
+
+def prepare_staging(staging_path, symbols, start_date, end_date):
+    """
+    The function keeps the checkpoints of an interrupted run with the same symbols and date range, otherwise it starts a fresh staging directory.
+
+    Args:
+
+        staging_path (string): path of the staging directory
+
+        symbols (list): symbols of the run
+
+        start_date (string): start date of the run in the format 'yyyy-mm-dd'
+
+        end_date (string): end date of the run in the format 'yyyy-mm-dd'
+
+    Returns:
+
+        done_symbols (set): symbols that already have a checkpoint
+    """
+    run = {'symbols': list(symbols), 'start_date': str(start_date), 'end_date': str(end_date)}
+    run_path = os.path.join(staging_path, RUN_FILE)
+
+    if os.path.exists(run_path):
+        with open(run_path) as f:
+            if json.load(f) == run:
+                return {symbol for symbol in symbols if os.path.exists(symbol_checkpoint_path(staging_path, symbol))}
+
+    shutil.rmtree(staging_path, ignore_errors=True)
+    os.makedirs(staging_path)
+
+    with open(run_path, 'w') as f:
+        json.dump(run, f)
+
+    return set()
+
+##########################################################################
+##########################################################################
+
+# Function 4: Assemble the checkpoints into the output buffer
+
+def assemble_checkpoints(staging_path, symbols, dtype='float64'):
+    """
+    The function writes the checkpoints of all symbols column by column into a memory mapped price matrix, so only one symbol is in memory at a time.
+    Missing prices are backfilled in the same way as generate_and_save_data did with the whole dataframe.
+
+    Args:
+
+        staging_path (string): path of the staging directory
+
+        symbols (list): symbols in the order of the columns
+
+        dtype (string): 'float64' or 'float32', the type in which the prices are stored
+
+    Returns:
+
+        prices_path (string): path of the .npy price matrix
+
+        dates_path (string): path of the .npy date axis
+    """
+    # The date axis is the union of the dates of all symbols
+    dates = np.array([], dtype='datetime64[ns]')
+    for symbol in symbols:
+        with np.load(symbol_checkpoint_path(staging_path, symbol)) as checkpoint:
+            dates = np.union1d(dates, checkpoint['dates'])
+
+    prices_path = os.path.join(staging_path, 'prices.npy')
+    dates_path = os.path.join(staging_path, 'dates.npy')
+
+    prices = np.lib.format.open_memmap(prices_path, mode='w+', dtype=dtype, shape=(len(dates), len(symbols)))
+
+    for column, symbol in enumerate(symbols):
+        column_prices = np.full(len(dates), np.nan)
+        with np.load(symbol_checkpoint_path(staging_path, symbol)) as checkpoint:
+            column_prices[np.searchsorted(dates, checkpoint['dates'])] = checkpoint['prices']
+        prices[:, column] = pd.Series(column_prices).bfill().to_numpy()
+
+    prices.flush()
+    del prices
+
+    with open(dates_path, 'wb') as f:
+        np.save(f, dates)
+
+    return prices_path, dates_path
+
+##########################################################################
+##########################################################################
+
+# Function 5: Streaming and resumable ingestion into the price store
+
+def ingest_symbols(symbols, start_date, end_date, store_path=DEFAULT_STORE_PATH, fetch_backend=yahoo_fetch_backend, batch_size=10, max_workers=4, dtype='float64'):
+    """
+    The function downloads the adjusted close prices of all symbols and saves them as a new snapshot of the price store.
+    Every symbol is checkpointed as soon as its batch arrives and the batch is dropped, so memory stays around one batch plus the output buffer (which is memory mapped).
+    If the function is interrupted or some batches fail, calling it again with the same arguments only downloads the symbols without a checkpoint.
+
+    Args:
+
+        symbols (list): list of all symbols to download
+
+        start_date (string): it is the start date in the format 'yyyy-mm-dd'
+
+        end_date (string): it is the end date in the format 'yyyy-mm-dd'
+
+        store_path (string): path of the price store directory, the staging directory is created next to it
+
+        fetch_backend, batch_size, max_workers: passed on to iter_downloaded_batches
+
+        dtype (string): 'float64' or 'float32', the type in which the prices are stored
+
+    Returns:
+
+        manifest (dictionary): manifest of the published store, None if some symbols failed and the ingestion has to be resumed
+    """
+    staging_path = store_path.rstrip('/') + '_staging'
+
+    done_symbols = prepare_staging(staging_path, symbols, start_date, end_date)
+    remaining_symbols = [symbol for symbol in symbols if symbol not in done_symbols]
+
+    if len(done_symbols) > 0:
+        print(f"Resuming the ingestion: {len(done_symbols)} symbols already have a checkpoint, {len(remaining_symbols)} are left.")
+
+    failed_symbols = []
+    missing_symbols = []
+
+    for batch, adj_close_df, batch_report in iter_downloaded_batches(remaining_symbols, start_date, end_date, fetch_backend, batch_size, max_workers):
+
+        if adj_close_df is None:
+            print(f"Batch of {len(batch)} symbols failed after {batch_report['attempts']} attempt(s): {batch_report['error']}")
+            failed_symbols += batch
+            continue
+
+        for symbol in batch:
+            if symbol in adj_close_df.columns:
+                adj_close = adj_close_df[symbol]
+            else:
+                adj_close = pd.Series(dtype='float64')
+            if adj_close.isna().all():
+                missing_symbols.append(symbol)
+            save_symbol_checkpoint(staging_path, symbol, adj_close)
+
+        del adj_close_df
+
+    if len(missing_symbols) > 0:
+        print(f"No prices were found for {len(missing_symbols)} symbols: {missing_symbols}")
+
+    if len(failed_symbols) > 0:
+        print(f"{len(failed_symbols)} symbols failed, run the ingestion again with the same arguments to resume from the checkpoints.")
+        return None
+
+    prices_path, dates_path = assemble_checkpoints(staging_path, symbols, dtype)
+
+    with store_file_lock(store_path):
+        manifest = publish_price_store(prices_path, dates_path, symbols, store_path)
+
+    shutil.rmtree(staging_path, ignore_errors=True)
+
+    print(f"{len(symbols)} symbols with {manifest['rows']} dates are saved in the price store at '{store_path}'.")
+
+    return manifest
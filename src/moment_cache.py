@@ -0,0 +1,138 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+from collections import OrderedDict
+import numpy as np
+from price_index import price_matrix_key
+
+##########################################################################
+##########################################################################
+
+# Number of lookback windows whose returns and moments are kept in memory by get_window_moments
+WINDOW_MOMENTS_CACHE_SIZE = 8
+
+_window_moments_cache = OrderedDict()
+
+##########################################################################
+##########################################################################
+
+# Class 1: Daily returns and moments of every stock in a lookback window
+
+class WindowMoments:
+    """
+    The daily returns of every stock of the price matrix on the dates on or after buying_date_minus_1_year and strictly before buying_date, computed once per window,
+    with the mean returns and the covariance matrix of the stocks that have a return on every date of the window.
+
+    The optimizers drop the dates on which any of their stocks has no return. For a set of stocks with a return on every date nothing is dropped,
+    so their moments are the rows and columns of the moments of all those stocks, read by position without computing anything again.
+    The moments of a set with a missing return are computed from its own rows of the returns, as before.
+
+    Args:
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
+
+        buying_date_minus_1_year (string): start of the window in the format 'yyyy-mm-dd'
+
+        buying_date (string): end of the window (excluded) in the format 'yyyy-mm-dd'
+    """
+
+    def __init__(self, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
+
+        first = all_stocks_df.index.searchsorted(buying_date_minus_1_year, side='left')
+        last = max(first, all_stocks_df.index.searchsorted(buying_date, side='left'))
+
+        # The row before the window is only needed for the first return, the first row of the returns has no return and is left out
+        prices_df = all_stocks_df.iloc[max(first - 1, 0):last]
+
+        if returns_type == 'LR':
+            returns_df = np.log(prices_df / prices_df.shift(1))
+        elif returns_type == 'SR':
+            returns_df = prices_df.pct_change()
+        else:
+            raise ValueError("Incorrect Argument for 'returns_type'. Has to be either 'LR' or 'SR'")
+
+        self.returns_df = returns_df.iloc[1:]
+
+        complete = self.returns_df.notna().all().to_numpy()
+        complete_returns_df = self.returns_df.loc[:, complete]
+
+        self.average_returns = complete_returns_df.mean().to_numpy()
+        self.covariance_matrix = complete_returns_df.cov().to_numpy()
+        self.positions = {symbol: position for position, symbol in enumerate(complete_returns_df.columns)}
+
+        # Number of sets read from the shared moments and computed on their own, for reporting
+        self.slices = 0
+        self.recomputes = 0
+
+    def returns(self, selected_stocks):
+        """
+        Returns the daily returns of the selected stocks without the dates on which any of them has no return, like window_returns.
+        """
+        return self.returns_df[list(selected_stocks)].dropna()
+
+    def moments(self, selected_stocks):
+        """
+        Returns (average_returns, covariance_matrix) of the selected stocks as contiguous numpy arrays, like window_moments.
+        """
+        selected_stocks = list(selected_stocks)
+
+        if all(stock in self.positions for stock in selected_stocks):
+            self.slices += 1
+
+            positions = [self.positions[stock] for stock in selected_stocks]
+
+            return np.ascontiguousarray(self.average_returns[positions]), np.ascontiguousarray(self.covariance_matrix[np.ix_(positions, positions)])
+
+        self.recomputes += 1
+
+        returns_df = self.returns(selected_stocks)
+
+        return np.ascontiguousarray(returns_df.mean().to_numpy()), np.ascontiguousarray(returns_df.cov().to_numpy())
+
+##########################################################################
+##########################################################################
+
+# Function 1: Shared returns and moments of a lookback window
+
+def get_window_moments(all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
+    """
+    The function returns the returns and moments of every stock in the lookback window, built on the first call and shared by every later call
+    on the same price matrix, returns type and window, so all the optimizer calls of the strategies on a buying date use one covariance matrix.
+    A price matrix without a key (see price_matrix_key) is computed from on every call.
+
+    Args:
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
+
+        buying_date_minus_1_year (string): start of the window in the format 'yyyy-mm-dd'
+
+        buying_date (string): end of the window (excluded) in the format 'yyyy-mm-dd'
+
+    Returns:
+
+        window_moments (WindowMoments): returns and moments of the window
+    """
+    data_key = price_matrix_key(all_stocks_df)
+
+    if data_key is None:
+        return WindowMoments(all_stocks_df, returns_type, buying_date_minus_1_year, buying_date)
+
+    key = (data_key, returns_type, str(buying_date_minus_1_year), str(buying_date))
+
+    if key in _window_moments_cache:
+        _window_moments_cache.move_to_end(key)
+        return _window_moments_cache[key]
+
+    window_moments = WindowMoments(all_stocks_df, returns_type, buying_date_minus_1_year, buying_date)
+
+    _window_moments_cache[key] = window_moments
+    if len(_window_moments_cache) > WINDOW_MOMENTS_CACHE_SIZE:
+        _window_moments_cache.popitem(last=False)
+
+    return window_moments
@@ -6,64 +6,225 @@
 from scipy.optimize import minimize
 import numpy as np
 import math
+import time
+from risk_free_rate import as_risk_free_rate
+from moment_cache import get_window_moments
 
 ##########################################################################
 ##########################################################################
 
-# Function 1: Maximize Returns
+# Names of the constraints of minimize_variance_qp after w >= 0 and w <= cap, in the order of its constraint matrix
+MINIMUM_VARIANCE_CONSTRAINTS = ('sum_upper', 'sum_lower', 'return_floor')
 
-def maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, maximum_ann_stdev, weightage_no_more_than):
+##########################################################################
+##########################################################################
 
-    num_symbs = len(selected_stocks)
+# Function 1: Daily returns of the selected stocks in the lookback window
 
-    selected_stocks_df = all_stocks_df[selected_stocks]
+def window_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
+    """
+    The function returns the daily returns of the selected stocks on the dates on or after buying_date_minus_1_year and strictly before buying_date,
+    without the dates on which any of the stocks has no return.
+    The returns of every stock in the window are computed once per window by get_window_moments and the selected stocks are read from them.
 
-    if returns_type == 'LR':
-        selected_stocks_returns_df = np.log(selected_stocks_df / selected_stocks_df.shift(1))
-        selected_stocks_returns_df = selected_stocks_returns_df.dropna()
-    elif returns_type == 'SR':
-        selected_stocks_returns_df = selected_stocks_df.pct_change().dropna()
+    Args:
 
-    returns_df_date_filter = selected_stocks_returns_df[(selected_stocks_returns_df.index >= buying_date_minus_1_year) & (selected_stocks_returns_df.index < buying_date)]
+        selected_stocks (list): symbols of the selected stocks (a set is taken in its iteration order, as zipped with the weights by strategies 8 and 9)
 
-    covariance_matrix = returns_df_date_filter.cov()
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
 
-    average_returns = returns_df_date_filter.mean()
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
 
-    def daily_return(weights, average_returns):
-        return np.dot(weights, average_returns)
-    
-    def annual_return(weights, average_returns):
-        return ((daily_return(weights, average_returns)+1)**365)-1
+        buying_date_minus_1_year (string): start of the window in the format 'yyyy-mm-dd'
 
-    def daily_variance(weights, covariance_matrix):
-        return np.dot(np.dot(weights, covariance_matrix), weights)
-    
-    def daily_standard_deviation(weights, covariance_matrix):
-        return math.sqrt(daily_variance(weights, covariance_matrix))
-    
-    def annual_standard_deviation(weights, covariance_matrix):
-        return daily_standard_deviation(weights, covariance_matrix) * math.sqrt(252)
+        buying_date (string): end of the window (excluded) in the format 'yyyy-mm-dd'
 
-    def objective_function(weights):
-        return -annual_return(weights, average_returns)
+    Returns:
 
-    # Initial Guess
-    initial_weights = [1/num_symbs]*num_symbs
+        returns_df (pandas dataframe): daily returns of the selected stocks in the window
+    """
+    return get_window_moments(all_stocks_df, returns_type, buying_date_minus_1_year, buying_date).returns(selected_stocks)
 
-    # Constraints and bounds remain the same as before
-    constraints = (
-        {'type': 'ineq', 'fun': lambda x: np.sum(x) - 1 + 0.01},  # Sum of weights >= 1 - tolerance
-        {'type': 'ineq', 'fun': lambda x: 1 - np.sum(x) + 0.01},  # Sum of weights <= 1 + tolerance
-        {'type': 'ineq', 'fun': lambda x: maximum_ann_stdev - annual_standard_deviation(x, covariance_matrix)},
-        *({'type': 'ineq', 'fun': lambda x, i=i: weightage_no_more_than - x[i]} for i in range(num_symbs))
-    )
+##########################################################################
+##########################################################################
 
-    bounds = [(0, 1)] * len(initial_weights)
+# Function 2: Mean and covariance of the daily returns in the lookback window
 
-    # List of optimization methods to try
-    # methods = ['cobyla', 'slsqp', 'trust-constr']
-    methods = ['slsqp']
+def window_moments(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
+    """
+    The function returns the mean daily returns and the covariance matrix of the daily returns of the selected stocks in the lookback window
+    as plain contiguous numpy arrays, so that the objective and constraint functions do not go through pandas on every call of the optimizer.
+    When the selected stocks have a return on every date of the window they are sliced from the moments of all the stocks, see WindowMoments.
+
+    Args:
+
+        selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date: same as for window_returns
+
+    Returns:
+
+        average_returns (numpy array): mean daily return of every selected stock
+
+        covariance_matrix (numpy array): covariance matrix of the daily returns
+    """
+    return get_window_moments(all_stocks_df, returns_type, buying_date_minus_1_year, buying_date).moments(selected_stocks)
+
+##########################################################################
+##########################################################################
+
+# Function 3: Annual return of a portfolio and its gradient
+
+def annual_return(weights, average_returns):
+    """
+    The function returns the annual return ((1 + daily return)^365 - 1) of the portfolio.
+    """
+    return ((np.dot(weights, average_returns)+1)**365)-1
+
+def annual_return_gradient(weights, average_returns):
+    """
+    The function returns the gradient of annual_return with respect to the weights.
+    """
+    return 365*((np.dot(weights, average_returns)+1)**364)*average_returns
+
+##########################################################################
+##########################################################################
+
+# Function 4: Annual standard deviation of a portfolio and its gradient
+
+def daily_variance(weights, covariance_matrix):
+    """
+    The function returns the daily variance of the portfolio.
+    """
+    return np.dot(np.dot(weights, covariance_matrix), weights)
+
+def annual_standard_deviation(weights, covariance_matrix):
+    """
+    The function returns the annual standard deviation (daily standard deviation * sqrt(252)) of the portfolio.
+    """
+    return math.sqrt(daily_variance(weights, covariance_matrix)) * math.sqrt(252)
+
+def annual_standard_deviation_gradient(weights, covariance_matrix):
+    """
+    The function returns the gradient of annual_standard_deviation with respect to the weights.
+    """
+    covariance_weights = np.dot(covariance_matrix, weights)
+
+    return covariance_weights * (math.sqrt(252) / math.sqrt(np.dot(weights, covariance_weights)))
+
+##########################################################################
+##########################################################################
+
+# Function 5: Constraints of the weights
+
+def weight_constraints(num_symbs, sum_tolerance, weightage_no_more_than, portfolio_constraint=None, portfolio_constraint_gradient=None, use_gradients=True):
+    """
+    The function builds the SLSQP constraints shared by the optimizers: the weights sum up to 1 within the tolerance, no weight is above weightage_no_more_than
+    and optionally one more constraint on the whole portfolio (for example on its standard deviation or its return).
+    With use_gradients all of them are one vectorized constraint function with its analytic Jacobian, otherwise they are separate functions
+    whose gradients SLSQP estimates by finite differences (the way the optimizers worked before).
+
+    Args:
+
+        num_symbs (integer): number of stocks
+
+        sum_tolerance (float): tolerance of the sum of the weights
+
+        weightage_no_more_than (float): maximum weight of a stock
+
+        portfolio_constraint (function): optional constraint on the weights that has to be >= 0
+
+        portfolio_constraint_gradient (function): gradient of portfolio_constraint
+
+        use_gradients (boolean): True for the vectorized constraint with its Jacobian
+
+    Returns:
+
+        constraints (tuple of dictionaries): constraints in the format of scipy.optimize.minimize
+    """
+    if not use_gradients:
+        return (
+            {'type': 'ineq', 'fun': lambda x: np.sum(x) - 1 + sum_tolerance},  # Sum of weights >= 1 - tolerance
+            {'type': 'ineq', 'fun': lambda x: 1 - np.sum(x) + sum_tolerance},  # Sum of weights <= 1 + tolerance
+            *(({'type': 'ineq', 'fun': portfolio_constraint},) if portfolio_constraint is not None else ()),
+            *({'type': 'ineq', 'fun': lambda x, i=i: weightage_no_more_than - x[i]} for i in range(num_symbs))
+        )
+
+    ones = np.ones(num_symbs)
+
+    # Rows of the Jacobian that do not depend on the weights
+    sum_rows = np.vstack([ones, -ones])
+    cap_rows = -np.eye(num_symbs)
+
+    def constraint_function(x):
+        total = np.sum(x)
+        values = [total - 1 + sum_tolerance, 1 - total + sum_tolerance]
+        if portfolio_constraint is not None:
+            values.append(portfolio_constraint(x))
+        return np.concatenate([values, weightage_no_more_than - x])
+
+    def constraint_jacobian(x):
+        if portfolio_constraint is not None:
+            return np.vstack([sum_rows, portfolio_constraint_gradient(x), cap_rows])
+        return np.vstack([sum_rows, cap_rows])
+
+    return ({'type': 'ineq', 'fun': constraint_function, 'jac': constraint_jacobian},)
+
+##########################################################################
+##########################################################################
+
+# Function 6: Count the calls of a function
+
+def counted(function, stats, key):
+    """
+    The function wraps a function so that its calls are counted in stats[key]. Without stats the function is returned as it is.
+    """
+    if stats is None or function is None:
+        return function
+
+    stats.setdefault(key, 0)
+
+    def wrapper(*args, **kwargs):
+        stats[key] += 1
+        return function(*args, **kwargs)
+
+    return wrapper
+
+##########################################################################
+##########################################################################
+
+# Function 7: Run the optimization methods and keep the best result
+
+def run_optimization(objective_function, objective_gradient, initial_weights, bounds, constraints, methods, stats=None):
+    """
+    The function runs scipy.optimize.minimize with every method and returns the results of the methods that did not fail.
+    If stats is given, the calls of the objective, its gradient, the constraints and their Jacobians, the iterations and the wall time are added to it.
+
+    Args:
+
+        objective_function (function): function to minimize
+
+        objective_gradient (function): gradient of the objective, None to let the method estimate it
+
+        initial_weights (list): starting point
+
+        bounds (list of tuples): bounds of the weights
+
+        constraints (tuple of dictionaries): constraints in the format of scipy.optimize.minimize
+
+        methods (list): names of the methods to try
+
+        stats (dictionary): optional dictionary for the call counts and timings
+
+    Returns:
+
+        results (dictionary): result of every method that did not fail
+    """
+    objective_function = counted(objective_function, stats, 'objective_calls')
+    objective_gradient = counted(objective_gradient, stats, 'gradient_calls')
+    constraints = tuple(dict(constraint, fun=counted(constraint['fun'], stats, 'constraint_calls'),
+                             **({'jac': counted(constraint['jac'], stats, 'constraint_jacobian_calls')} if 'jac' in constraint else {}))
+                        for constraint in constraints)
+
+    start_time = time.perf_counter()
 
     # Dictionary to store the results
     results = {}
@@ -75,6 +236,7 @@ def maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_m
                 objective_function,
                 initial_weights,
                 method=method,
+                jac=objective_gradient,
                 bounds=bounds,
                 constraints=constraints
             )
@@ -83,9 +245,62 @@ def maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_m
         except:
             pass
 
+    if stats is not None:
+        stats['iterations'] = stats.get('iterations', 0) + sum(result.nit for result in results.values())
+        stats['seconds'] = stats.get('seconds', 0.0) + time.perf_counter() - start_time
+
+    return results
+
+##########################################################################
+##########################################################################
+
+# Function 8: Maximize Returns
+
+def maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, maximum_ann_stdev, weightage_no_more_than, use_gradients=True, stats=None, initial_weights=None, warm_start=None, race=None):
+
+    num_symbs = len(selected_stocks)
+
+    # The solution of the previous solve of the same problem, remapped to the selected stocks, is the start unless initial weights are given
+    if warm_start is not None:
+        stats = {} if stats is None else stats
+        iterations_before = stats.get('iterations', 0)
+        if initial_weights is None:
+            initial_weights = warm_start_weights(warm_start, selected_stocks, weightage_no_more_than, 0.01)
+        warm_started = initial_weights is not None
+
+    average_returns, covariance_matrix = window_moments(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date)
+
+    problem = ('maximize_returns', average_returns, covariance_matrix, maximum_ann_stdev, weightage_no_more_than, 0.01)
+
+    objective_function, objective_gradient, constraints = optimization_problem(*problem, use_gradients=use_gradients)
+
+    # Several methods and starting points raced in a process pool, SLSQP is only used if no attempt finished
+    if race is not None:
+        weights, best_method = race.run(problem, initial_weights, stats=stats)
+
+        if weights is not None:
+            if warm_start is not None:
+                save_warm_start(warm_start, selected_stocks, weights, stats['iterations'] - iterations_before, warm_started)
+            return [round(weight, 4) for weight in weights], best_method
+
+    # Initial Guess, the equal weights unless a warm start is given
+    if initial_weights is None:
+        initial_weights = [1/num_symbs]*num_symbs
+
+    bounds = [(0, 1)] * len(initial_weights)
+
+    # List of optimization methods to try
+    # methods = ['cobyla', 'slsqp', 'trust-constr']
+    methods = ['slsqp']
+
+    results = run_optimization(objective_function, objective_gradient if use_gradients else None, initial_weights, bounds, constraints, methods, stats)
+
     # Select the result with the best objective function value
     best_method = max(results, key=lambda x: -objective_function(results[x].x))
 
+    if warm_start is not None:
+        save_warm_start(warm_start, selected_stocks, results[best_method].x, stats['iterations'] - iterations_before, warm_started)
+
     # Rounding the optimized weights of the best result
     best_weights = [round(weight, 4) for weight in results[best_method].x]
 
@@ -94,56 +309,61 @@ def maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_m
 ##########################################################################
 ##########################################################################
 
-# Function 2: Maximize Sharpe Ratio
+# Function 9: Maximize Sharpe Ratio
 
-def maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than, govt_bond_df):
+def maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than, govt_bond_df, use_gradients=True, stats=None, backend='slsqp', initial_weights=None, warm_start=None, race=None):
 
     num_symbs = len(selected_stocks)
 
-    selected_stocks_df = all_stocks_df[selected_stocks]
+    # The solution of the previous solve of the same problem, remapped to the selected stocks, is the start unless initial weights are given.
+    # The working set changes with the intercept from round to round, so only the weights are kept
+    if warm_start is not None:
+        stats = {} if stats is None else stats
+        iterations_before = stats.get('iterations', 0)
+        if initial_weights is None:
+            initial_weights = warm_start_weights(warm_start, selected_stocks, weightage_no_more_than, 0.0001)
+        warm_started = initial_weights is not None
+
+    average_returns, covariance_matrix = window_moments(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date)
+
+    # Yield of the last date before the buying date, found by binary search on the parsed series
+    risk_free_rate = as_risk_free_rate(govt_bond_df).rate_asof(buying_date)
 
-    if returns_type == 'LR':
-        selected_stocks_returns_df = np.log(selected_stocks_df / selected_stocks_df.shift(1))
-        selected_stocks_returns_df = selected_stocks_returns_df.dropna()
-    elif returns_type == 'SR':
-        selected_stocks_returns_df = selected_stocks_df.pct_change().dropna()
+    problem = ('maximize_sharpe_ratio', average_returns, covariance_matrix, risk_free_rate, weightage_no_more_than, 0.0001)
 
-    returns_df_date_filter = selected_stocks_returns_df[(selected_stocks_returns_df.index >= buying_date_minus_1_year) & (selected_stocks_returns_df.index < buying_date)]
+    objective_function, objective_gradient, constraints = optimization_problem(*problem, use_gradients=use_gradients)
 
-    covariance_matrix = returns_df_date_filter.cov()
+    candidates = {}
 
-    average_returns = returns_df_date_filter.mean()
+    # SLSQP is the default backend, the homogenized quadratic programs are picked with backend='homogenized' (see compare_sharpe_ratio_backends).
+    # They sum the weights up to exactly 1 where SLSQP uses the tolerance of the sum, so the weights of existing backtests would move
+    if backend == 'homogenized':
+        # Tangency portfolios of the daily returns, moved to the optimum of the compounded ratio, SLSQP is only used if no portfolio beats the risk free rate
+        weights = maximize_sharpe_ratio_qp(average_returns, covariance_matrix, risk_free_rate, weightage_no_more_than, stats, initial_weights=initial_weights)
 
-    adjusted_buy_date = govt_bond_df[govt_bond_df.index < buying_date].index[-1]
-    risk_free_rate = govt_bond_df[govt_bond_df.index == adjusted_buy_date].values[0][0]/100
+        if weights is not None and race is None:
+            if warm_start is not None:
+                save_warm_start(warm_start, selected_stocks, weights, stats['iterations'] - iterations_before, warm_started)
+            return [round(weight, 4) for weight in weights], 'homogenized'
 
-    def daily_return(weights, average_returns):
-        return np.dot(weights, average_returns)
-    
-    def annual_return(weights, average_returns):
-        return ((daily_return(weights, average_returns)+1)**365)-1
+        if weights is not None:
+            candidates['homogenized'] = weights
 
-    def daily_variance(weights, covariance_matrix):
-        return np.dot(np.dot(weights, covariance_matrix), weights)
-    
-    def daily_standard_deviation(weights, covariance_matrix):
-        return math.sqrt(daily_variance(weights, covariance_matrix))
-    
-    def annual_standard_deviation(weights, covariance_matrix):
-        return daily_standard_deviation(weights, covariance_matrix) * math.sqrt(252)
+    elif backend != 'slsqp':
+        raise ValueError("Incorrect Argument for 'backend'. Has to be either 'homogenized' or 'slsqp'")
 
-    def objective_function(weights):
-        return -(annual_return(weights, average_returns)-risk_free_rate)/annual_standard_deviation(weights, covariance_matrix)
+    # Several methods and starting points raced in a process pool against the quadratic programs, SLSQP is only used if no attempt finished
+    if race is not None:
+        weights, best_method = race.run(problem, initial_weights, candidates, stats)
 
-    # Initial Guess
-    initial_weights = [1/num_symbs]*num_symbs
+        if weights is not None:
+            if warm_start is not None:
+                save_warm_start(warm_start, selected_stocks, weights, stats['iterations'] - iterations_before, warm_started)
+            return [round(weight, 4) for weight in weights], best_method
 
-    # Constraints and bounds remain the same as before
-    constraints = (
-        {'type': 'ineq', 'fun': lambda x: np.sum(x) - 1 + 0.0001},  # Sum of weights >= 1 - tolerance
-        {'type': 'ineq', 'fun': lambda x: 1 - np.sum(x) + 0.0001},  # Sum of weights <= 1 + tolerance
-        *({'type': 'ineq', 'fun': lambda x, i=i: weightage_no_more_than - x[i]} for i in range(num_symbs))
-    )
+    # Initial Guess, the equal weights unless a warm start is given
+    if initial_weights is None:
+        initial_weights = [1/num_symbs]*num_symbs
 
     bounds = [(0, 1)] * len(initial_weights)
 
@@ -151,27 +371,14 @@ def maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_d
     # methods = ['cobyla', 'slsqp', 'trust-constr']
     methods = ['slsqp']
 
-    # Dictionary to store the results
-    results = {}
-
-    # Run optimization using each method
-    for method in methods:
-        try:
-            result = minimize(
-                objective_function,
-                initial_weights,
-                method=method,
-                bounds=bounds,
-                constraints=constraints
-            )
-            results[method] = result
-
-        except:
-            pass
+    results = run_optimization(objective_function, objective_gradient if use_gradients else None, initial_weights, bounds, constraints, methods, stats)
 
     # Select the result with the best objective function value
     best_method = max(results, key=lambda x: -objective_function(results[x].x))
 
+    if warm_start is not None:
+        save_warm_start(warm_start, selected_stocks, results[best_method].x, stats['iterations'] - iterations_before, warm_started)
+
     # Rounding the optimized weights of the best result
     best_weights = [round(weight, 4) for weight in results[best_method].x]
 
@@ -180,54 +387,384 @@ def maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_d
 ##########################################################################
 ##########################################################################
 
-# Function 3: Minimize Variance
+# Function 10: Active set solver for small quadratic programs
 
-def minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, minimum_ann_ret, weightage_no_more_than):
+def solve_qp_active_set(hessian, linear_term, constraint_matrix, constraint_bounds, initial_x, equality_matrix=None, equality_bounds=None, working_set=None, max_iterations=None, tolerance=1e-12):
+    """
+    The function minimizes 1/2 x'Hx + c'x subject to Gx <= h (and Ax = b, if given) with the primal active set method, starting from a feasible point.
+    Every iteration solves the equality constrained problem of the working set with one dense KKT system, which is cheap for the 8 to 30 stocks of a portfolio.
 
-    num_symbs = len(selected_stocks)
+    Args:
+
+        hessian (numpy array): n x n positive definite matrix H
+
+        linear_term (numpy array): vector c
+
+        constraint_matrix (numpy array): m x n matrix G
+
+        constraint_bounds (numpy array): vector h
+
+        initial_x (numpy array): feasible starting point
+
+        equality_matrix (numpy array): e x n matrix A of the equality constraints, always in the working set
+
+        equality_bounds (numpy array): vector b
+
+        working_set (list): indices of inequality constraints to start with (for example the final working set of a similar problem), the ones not active at initial_x are left out
+
+        max_iterations (integer): maximum number of iterations, 10 * (n + m) by default
+
+        tolerance (float): tolerance of the step, the multipliers and the blocking constraints
+
+    Returns:
+
+        x (numpy array): solution
+
+        multipliers (numpy array): Lagrange multipliers of the inequality constraints (>= 0 at the solution) followed by those of the equality constraints
+
+        info (dictionary): 'converged', 'iterations', the final 'working_set' and 'kkt_residuals' (stationarity, primal and dual feasibility, complementarity)
+    """
+    n = len(initial_x)
+    m = len(constraint_bounds)
+
+    if equality_matrix is None:
+        equality_matrix = np.zeros((0, n))
+        equality_bounds = np.zeros(0)
+
+    e = len(equality_bounds)
+
+    if max_iterations is None:
+        max_iterations = 10 * (n + m)
+
+    x = np.array(initial_x, dtype='float64')
+
+    if working_set is None:
+        working_set = []
+    else:
+        working_set = [int(i) for i in dict.fromkeys(working_set) if abs(constraint_matrix[i] @ x - constraint_bounds[i]) <= tolerance]
+    working_multipliers = np.zeros(0)
+    converged = False
+
+    for iteration in range(1, max_iterations + 1):
+
+        gradient = hessian @ x + linear_term
+        active_matrix = np.vstack([equality_matrix, constraint_matrix[working_set]])
+        k = e + len(working_set)
+
+        kkt_matrix = np.zeros((n + k, n + k))
+        kkt_matrix[:n, :n] = hessian
+        kkt_matrix[:n, n:] = active_matrix.T
+        kkt_matrix[n:, :n] = active_matrix
+
+        right_hand_side = np.concatenate([-gradient, np.zeros(k)])
+
+        try:
+            solution = np.linalg.solve(kkt_matrix, right_hand_side)
+        except np.linalg.LinAlgError:
+            solution = np.linalg.lstsq(kkt_matrix, right_hand_side, rcond=None)[0]
+
+        step = solution[:n]
+        equality_multipliers = solution[n:n + e]
+        working_multipliers = solution[n + e:]
+
+        if np.max(np.abs(step), initial=0.0) <= tolerance * max(1.0, np.max(np.abs(x))):
+
+            if len(working_set) == 0 or working_multipliers.min() >= -tolerance:
+                converged = True
+                break
+
+            # Drop the constraint whose multiplier says the objective decreases by leaving it
+            dropped = int(np.argmin(working_multipliers))
+            working_set.pop(dropped)
+            working_multipliers = np.delete(working_multipliers, dropped)
+
+        else:
+            # Longest step along the direction that keeps every constraint satisfied
+            directional = constraint_matrix @ step
+            slack = constraint_bounds - constraint_matrix @ x
+
+            step_length = 1.0
+            blocking = None
+
+            for i in np.flatnonzero(directional > tolerance):
+                if i not in working_set:
+                    ratio = max(slack[i], 0.0) / directional[i]
+                    if ratio < step_length:
+                        step_length = ratio
+                        blocking = int(i)
+
+            x = x + step_length * step
+
+            if blocking is not None:
+                working_set.append(blocking)
+
+    multipliers = np.zeros(m)
+    multipliers[working_set] = working_multipliers
+
+    slack = constraint_bounds - constraint_matrix @ x
+
+    kkt_residuals = {'stationarity': float(np.max(np.abs(hessian @ x + linear_term + constraint_matrix.T @ multipliers + equality_matrix.T @ equality_multipliers))),
+                     'primal_feasibility': float(max(0.0, -slack.min(), np.max(np.abs(equality_matrix @ x - equality_bounds), initial=0.0))),
+                     'dual_feasibility': float(max(0.0, -multipliers.min(initial=0.0))),
+                     'complementarity': float(np.max(np.abs(multipliers * slack), initial=0.0))}
+
+    return x, np.concatenate([multipliers, equality_multipliers]), {'converged': converged, 'iterations': iteration, 'working_set': working_set, 'kkt_residuals': kkt_residuals}
+
+##########################################################################
+##########################################################################
+
+# Function 11: Highest return weights under a cap
+
+def max_return_weights(average_returns, weightage_no_more_than):
+    """
+    The function fills the cap of the stocks in the order of their returns until the weights sum up to 1, which gives the highest return portfolio
+    under the caps (the weights sum up to less than 1 if the caps do not allow more).
+    """
+    weights = np.zeros(len(average_returns))
+    remaining = 1.0
+
+    for i in np.argsort(-np.asarray(average_returns), kind='stable'):
+        weights[i] = min(min(1.0, weightage_no_more_than), remaining)
+        remaining -= weights[i]
+
+    return weights
+
+##########################################################################
+##########################################################################
+
+# Function 12: Minimum variance portfolio as a quadratic program
+
+def minimize_variance_qp(average_returns, covariance_matrix, minimum_ann_ret, weightage_no_more_than, sum_tolerance=0.0001, stats=None, initial_weights=None, working_set=None):
+    """
+    The function solves the minimize_variance problem with solve_qp_active_set. The annual return floor is monotone in the daily return of the portfolio,
+    so ((1 + w.mu)^365 - 1 >= minimum_ann_ret) is the linear constraint w.mu >= (1 + minimum_ann_ret)^(1/365) - 1.
+    The start is initial_weights if they meet the constraints, otherwise the equally weighted portfolio, or the portfolio with the highest return under the caps
+    when the equal weights miss the return floor.
+
+    Args:
+
+        average_returns (numpy array): mean daily return of every stock
+
+        covariance_matrix (numpy array): covariance matrix of the daily returns
+
+        minimum_ann_ret (float): minimum annual return of the portfolio
+
+        weightage_no_more_than (float): maximum weight of a stock
+
+        sum_tolerance (float): tolerance of the sum of the weights
+
+        stats (dictionary): if given, the iterations, the final working set, the KKT residuals and the wall time are added to it
+
+        initial_weights (numpy array): optional warm start, for example the weights of a previous solve
+
+        working_set (list): optional indices of the constraints active at the warm start, in the order w >= 0, w <= cap, the two sum constraints and the return floor
+
+    Returns:
+
+        weights (numpy array): minimum variance weights, None if the problem is infeasible or the solver did not converge
+    """
+    start_time = time.perf_counter()
+
+    num_symbs = len(average_returns)
+    upper_bound = min(1.0, weightage_no_more_than)
+    minimum_daily_return = (1 + minimum_ann_ret)**(1/365) - 1
+
+    identity = np.eye(num_symbs)
+    ones = np.ones((1, num_symbs))
+
+    # Constraints in the form G w <= h: w >= 0, w <= cap, sum(w) <= 1 + tol, sum(w) >= 1 - tol, w.mu >= minimum daily return
+    constraint_matrix = np.vstack([-identity, identity, ones, -ones, -average_returns[None, :]])
+    constraint_bounds = np.concatenate([np.zeros(num_symbs), np.full(num_symbs, upper_bound), [1 + sum_tolerance, -(1 - sum_tolerance), -minimum_daily_return]])
+
+    # Feasible start: the warm start, the equal weights, otherwise the highest return portfolio (the caps filled in the order of the returns)
+    if initial_weights is None or np.max(constraint_matrix @ np.asarray(initial_weights, dtype='float64') - constraint_bounds) > 1e-12:
+        initial_weights = np.full(num_symbs, 1/num_symbs)
+
+        if np.dot(initial_weights, average_returns) < minimum_daily_return or 1/num_symbs > upper_bound:
+            initial_weights = max_return_weights(average_returns, upper_bound)
+
+    initial_weights = np.asarray(initial_weights, dtype='float64')
+
+    if np.max(constraint_matrix @ initial_weights - constraint_bounds) > 1e-12:
+        if stats is not None:
+            stats['converged'] = False
+            stats['seconds'] = stats.get('seconds', 0.0) + time.perf_counter() - start_time
+        return None
+
+    weights, multipliers, info = solve_qp_active_set(2 * covariance_matrix, np.zeros(num_symbs), constraint_matrix, constraint_bounds, initial_weights, working_set=working_set)
+
+    if stats is not None:
+        stats['converged'] = info['converged']
+        stats['iterations'] = stats.get('iterations', 0) + info['iterations']
+        stats['working_set'] = info['working_set']
+        stats['kkt_residuals'] = info['kkt_residuals']
+        stats['seconds'] = stats.get('seconds', 0.0) + time.perf_counter() - start_time
+
+    return weights if info['converged'] else None
+
+##########################################################################
+##########################################################################
+
+# Function 13: Maximum Sharpe ratio portfolio as a sequence of quadratic programs
+
+def maximize_sharpe_ratio_qp(average_returns, covariance_matrix, risk_free_rate, weightage_no_more_than, stats=None, max_rounds=50, tolerance=1e-11, initial_weights=None):
+    """
+    The function maximizes the Sharpe ratio of maximize_sharpe_ratio, ((1 + w.mu)^365 - 1 - risk free rate) / annual standard deviation, under the caps without SLSQP.
+
+    For a daily intercept c, the tangency portfolio that maximizes (w.mu - c) / sqrt(w'Cw) is found with the Charnes-Cooper homogenization y = w / (w.(mu - c)):
+    min y'Cy subject to y.(mu - c) = 1, y >= 0 and y_i <= cap * sum(y), a convex quadratic program solved with solve_qp_active_set, and w = y / sum(y).
+    The first round uses the daily risk free rate as c. The compounded ratio has the same optimality conditions as the tangency problem whose intercept is where
+    the tangent of (1 + r)^365 - 1 at the return r of the optimum meets the risk free rate, so every round moves c to that point for the current portfolio
+    (the polish on the compounded objective) until c does not change.
+
+    Args:
+
+        average_returns (numpy array): mean daily return of every stock
+
+        covariance_matrix (numpy array): covariance matrix of the daily returns
+
+        risk_free_rate (float): annual risk free rate as a decimal
+
+        weightage_no_more_than (float): maximum weight of a stock
+
+        stats (dictionary): if given, the iterations, the rounds, the KKT residuals of the last round and the wall time are added to it
+
+        max_rounds (integer): maximum number of rounds
 
-    selected_stocks_df = all_stocks_df[selected_stocks]
+        tolerance (float): change of the intercept below which the rounds stop
 
-    if returns_type == 'LR':
-        selected_stocks_returns_df = np.log(selected_stocks_df / selected_stocks_df.shift(1))
-        selected_stocks_returns_df = selected_stocks_returns_df.dropna()
-    elif returns_type == 'SR':
-        selected_stocks_returns_df = selected_stocks_df.pct_change().dropna()
+        initial_weights (numpy array): optional warm start, used if the weights sum up to 1, respect the caps and beat the risk free rate
 
-    returns_df_date_filter = selected_stocks_returns_df[(selected_stocks_returns_df.index >= buying_date_minus_1_year) & (selected_stocks_returns_df.index < buying_date)]
+    Returns:
 
-    covariance_matrix = returns_df_date_filter.cov()
+        weights (numpy array): maximum Sharpe ratio weights, None if no portfolio under the caps beats the risk free rate, a round did not converge
+                               or the intercept still moved after max_rounds rounds
+    """
+    start_time = time.perf_counter()
 
-    average_returns = returns_df_date_filter.mean()
+    num_symbs = len(average_returns)
+    upper_bound = min(1.0, weightage_no_more_than)
+    intercept = (1 + risk_free_rate)**(1/365) - 1
 
-    def daily_return(weights, average_returns):
-        return np.dot(weights, average_returns)
-    
-    def annual_return(weights, average_returns):
-        return ((daily_return(weights, average_returns)+1)**365)-1
+    # Constraints in the form G y <= h: y >= 0 and y_i - cap * sum(y) <= 0
+    constraint_matrix = np.vstack([-np.eye(num_symbs), np.eye(num_symbs) - upper_bound])
+    constraint_bounds = np.zeros(2 * num_symbs)
 
-    def daily_variance(weights, covariance_matrix):
-        return np.dot(np.dot(weights, covariance_matrix), weights)
-    
-    def daily_standard_deviation(weights, covariance_matrix):
-        return math.sqrt(daily_variance(weights, covariance_matrix))
-    
-    def annual_standard_deviation(weights, covariance_matrix):
-        return daily_standard_deviation(weights, covariance_matrix) * math.sqrt(252)
+    # The highest return portfolio, scaled, is a feasible start unless no portfolio beats the risk free rate
+    weights = max_return_weights(average_returns, upper_bound)
 
-    def objective_function(weights):
-        return daily_variance(weights, covariance_matrix)
+    if initial_weights is not None:
+        initial_weights = np.asarray(initial_weights, dtype='float64')
+        if abs(initial_weights.sum() - 1) <= 1e-12 and initial_weights.min() >= 0 and initial_weights.max() <= upper_bound and np.dot(initial_weights, average_returns) > intercept:
+            weights = initial_weights
 
-    # Initial Guess
-    initial_weights = [1/num_symbs]*num_symbs
+            # The rounds start from the intercept of the warm start instead of the risk free rate, it is below its return as it beats the risk free rate
+            portfolio_return = np.dot(weights, average_returns)
+            intercept = portfolio_return - (((1 + portfolio_return)**365 - 1) - risk_free_rate) / (365 * (1 + portfolio_return)**364)
 
-    # Constraints and bounds remain the same as before
-    constraints = (
-        {'type': 'ineq', 'fun': lambda x: np.sum(x) - 1 + 0.0001},  # Sum of weights >= 1 - tolerance
-        {'type': 'ineq', 'fun': lambda x: 1 - np.sum(x) + 0.0001},  # Sum of weights <= 1 + tolerance
-        {'type': 'ineq', 'fun': lambda x: annual_return(x, average_returns) - minimum_ann_ret},
-        *({'type': 'ineq', 'fun': lambda x, i=i: weightage_no_more_than - x[i]} for i in range(num_symbs))
-    )
+    if num_symbs * upper_bound < 1 or np.dot(weights, average_returns) <= intercept:
+        if stats is not None:
+            stats['converged'] = False
+            stats['seconds'] = stats.get('seconds', 0.0) + time.perf_counter() - start_time
+        return None
+
+    iterations = 0
+    working_set = None
+    settled = False
+
+    for rounds in range(1, max_rounds + 1):
+
+        excess_returns = average_returns - intercept
+
+        # The scaled portfolio of the previous round keeps its active constraints, so the next round starts from its working set
+        scaled, multipliers, info = solve_qp_active_set(2 * covariance_matrix, np.zeros(num_symbs), constraint_matrix, constraint_bounds, weights / np.dot(weights, excess_returns),
+                                                        equality_matrix=excess_returns[None, :], equality_bounds=np.ones(1), working_set=working_set)
+        iterations += info['iterations']
+        working_set = info['working_set']
+
+        if not info['converged']:
+            break
+
+        scaled = np.maximum(scaled, 0.0)
+        weights = scaled / scaled.sum()
+
+        # Intercept of the tangent of the compounded return at the return of the portfolio, below that return as long as the portfolio beats the risk free rate
+        portfolio_return = np.dot(weights, average_returns)
+        previous_intercept = intercept
+        intercept = portfolio_return - (((1 + portfolio_return)**365 - 1) - risk_free_rate) / (365 * (1 + portfolio_return)**364)
+
+        if abs(intercept - previous_intercept) <= tolerance:
+            settled = True
+            break
+
+    # The weights are only the optimum once the intercept stops moving, not when the rounds run out
+    converged = info['converged'] and settled
+
+    if stats is not None:
+        stats['converged'] = converged
+        stats['iterations'] = stats.get('iterations', 0) + iterations
+        stats['rounds'] = stats.get('rounds', 0) + rounds
+        stats['kkt_residuals'] = info['kkt_residuals']
+        stats['seconds'] = stats.get('seconds', 0.0) + time.perf_counter() - start_time
+
+    return weights if converged else None
+
+##########################################################################
+##########################################################################
+
+# Function 14: Minimize Variance
+
+def minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, minimum_ann_ret, weightage_no_more_than, use_gradients=True, stats=None, backend='slsqp', initial_weights=None, warm_start=None, race=None):
+
+    num_symbs = len(selected_stocks)
+
+    # The solution of the previous solve of the same problem, remapped to the selected stocks, is the start unless initial weights are given
+    working_set = None
+    if warm_start is not None:
+        stats = {} if stats is None else stats
+        iterations_before = stats.get('iterations', 0)
+        if initial_weights is None:
+            initial_weights = warm_start_weights(warm_start, selected_stocks, weightage_no_more_than, 0.0001)
+        warm_started = initial_weights is not None
+        working_set = warm_start_working_set(warm_start, selected_stocks, MINIMUM_VARIANCE_CONSTRAINTS)
+
+    average_returns, covariance_matrix = window_moments(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date)
+
+    problem = ('minimize_variance', average_returns, covariance_matrix, minimum_ann_ret, weightage_no_more_than, 0.0001)
+
+    objective_function, objective_gradient, constraints = optimization_problem(*problem, use_gradients=use_gradients)
+
+    candidates = {}
+
+    # SLSQP is the default backend, the active set backend is picked with backend='active_set'. It reaches the optimum where SLSQP stops on the relative change
+    # of the small daily variance, so it can change which stocks the cardinality constrained strategies keep
+    if backend == 'active_set':
+        # The quadratic program is solved directly, SLSQP is only used if the return floor cannot be met
+        weights = minimize_variance_qp(average_returns, covariance_matrix, minimum_ann_ret, weightage_no_more_than, 0.0001, stats, initial_weights, working_set)
+        if weights is not None and race is None:
+            if warm_start is not None:
+                save_warm_start(warm_start, selected_stocks, weights, stats['iterations'] - iterations_before, warm_started,
+                                active_set_symbols(stats['working_set'], selected_stocks, MINIMUM_VARIANCE_CONSTRAINTS))
+            return [round(weight, 4) for weight in weights], 'active_set'
+        if weights is not None:
+            candidates['active_set'] = weights
+            active_set = active_set_symbols(stats['working_set'], selected_stocks, MINIMUM_VARIANCE_CONSTRAINTS) if stats is not None else None
+    elif backend != 'slsqp':
+        raise ValueError("Incorrect Argument for 'backend'. Has to be either 'active_set' or 'slsqp'")
+
+    # Several methods and starting points raced in a process pool against the quadratic program, SLSQP is only used if no attempt finished
+    if race is not None:
+        weights, best_method = race.run(problem, initial_weights, candidates, stats)
+
+        if weights is not None:
+            if warm_start is not None:
+                save_warm_start(warm_start, selected_stocks, weights, stats['iterations'] - iterations_before, warm_started,
+                                active_set if best_method == 'active_set' else None)
+            return [round(weight, 4) for weight in weights], best_method
+
+    # Initial Guess, the equal weights unless a warm start is given
+    if initial_weights is None:
+        initial_weights = [1/num_symbs]*num_symbs
 
     bounds = [(0, 1)] * len(initial_weights)
 
@@ -235,28 +772,387 @@ def minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_
     # methods = ['cobyla', 'slsqp', 'trust-constr']
     methods = ['slsqp']
 
-    # Dictionary to store the results
-    results = {}
-
-    # Run optimization using each method
-    for method in methods:
-        try:
-            result = minimize(
-                objective_function,
-                initial_weights,
-                method=method,
-                bounds=bounds,
-                constraints=constraints
-            )
-            results[method] = result
-
-        except:
-            pass
+    results = run_optimization(objective_function, objective_gradient if use_gradients else None, initial_weights, bounds, constraints, methods, stats)
 
     # Select the result with the best objective function value
     best_method = min(results, key=lambda x: objective_function(results[x].x))
 
+    if warm_start is not None:
+        save_warm_start(warm_start, selected_stocks, results[best_method].x, stats['iterations'] - iterations_before, warm_started)
+
     # Rounding the optimized weights of the best result
     best_weights = [round(weight, 4) for weight in results[best_method].x]
 
-    return best_weights, best_method
\ No newline at end of file
+    return best_weights, best_method
+
+##########################################################################
+##########################################################################
+
+# Function 15: Compare the analytic gradients with the finite differences
+
+def compare_gradient_paths(optimizer, *args, **kwargs):
+    """
+    The function runs an optimizer once with the analytic gradients and once with the finite difference gradients and prints the number of calls,
+    the iterations and the wall time of both, and the largest difference between the rounded weights.
+
+    Args:
+
+        optimizer (function): maximize_returns, maximize_sharpe_ratio or minimize_variance (with backend='slsqp', the active set backend does not use the gradients)
+
+        *args, **kwargs: arguments of the optimizer
+
+    Returns:
+
+        report (dictionary): 'analytic' and 'finite_differences' call counts and timings, and 'max_weight_difference'
+    """
+    report = {}
+    weights = {}
+
+    for path, use_gradients in [('analytic', True), ('finite_differences', False)]:
+        stats = {}
+        weights[path], best_method = optimizer(*args, use_gradients=use_gradients, stats=stats, **kwargs)
+        report[path] = stats
+
+    report['max_weight_difference'] = float(np.max(np.abs(np.subtract(weights['analytic'], weights['finite_differences']))))
+
+    print(f"{'':<28}{'analytic':>14}{'finite differences':>20}")
+    for key in ['objective_calls', 'gradient_calls', 'constraint_calls', 'constraint_jacobian_calls', 'iterations', 'seconds']:
+        print(f"{key:<28}{report['analytic'].get(key, 0):>14.4g}{report['finite_differences'].get(key, 0):>20.4g}")
+    print(f"Largest difference of the rounded weights: {report['max_weight_difference']}")
+
+    return report
+
+##########################################################################
+##########################################################################
+
+# Function 16: Compare the Sharpe ratio backends
+
+def compare_sharpe_ratio_backends(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than, govt_bond_df):
+    """
+    The function runs maximize_sharpe_ratio with the homogenized and the SLSQP backends and prints the Sharpe ratio of the rounded weights, the iterations
+    and the wall time of both, the gap between the Sharpe ratios (positive when the homogenized backend is better) and the largest difference between the weights.
+
+    Args:
+
+        selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than, govt_bond_df: arguments of maximize_sharpe_ratio
+
+    Returns:
+
+        report (dictionary): 'homogenized' and 'slsqp' statistics with their 'sharpe_ratio', the 'gap' and the 'max_weight_difference'
+    """
+    average_returns, covariance_matrix = window_moments(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date)
+    risk_free_rate = as_risk_free_rate(govt_bond_df).rate_asof(buying_date)
+
+    report = {}
+    weights = {}
+
+    for backend in ['homogenized', 'slsqp']:
+        stats = {}
+        weights[backend], best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, weightage_no_more_than, govt_bond_df, stats=stats, backend=backend)
+        stats['sharpe_ratio'] = (annual_return(weights[backend], average_returns) - risk_free_rate) / annual_standard_deviation(weights[backend], covariance_matrix)
+        report[backend] = stats
+
+    report['gap'] = report['homogenized']['sharpe_ratio'] - report['slsqp']['sharpe_ratio']
+    report['max_weight_difference'] = float(np.max(np.abs(np.subtract(weights['homogenized'], weights['slsqp']))))
+
+    print(f"{'':<16}{'homogenized':>14}{'slsqp':>14}")
+    for key in ['sharpe_ratio', 'iterations', 'seconds']:
+        print(f"{key:<16}{report['homogenized'].get(key, 0):>14.6g}{report['slsqp'].get(key, 0):>14.6g}")
+    print(f"Gap of the Sharpe ratio: {report['gap']:.3g}, largest difference of the rounded weights: {report['max_weight_difference']}")
+
+    return report
+
+##########################################################################
+##########################################################################
+
+# Function 17: Allocation with at most K stocks
+
+def cardinality_constrained_allocation(optimizer, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, *args, max_stocks=8, stats=None, solver_state=None, race=None):
+    """
+    The function allocates the weights of an optimizer to at most max_stocks of the selected stocks. The stocks with the max_stocks largest weights of the solve
+    on all the selected stocks are kept (ties in the order of the selected stocks). If that solve already gives a weight to no more than max_stocks stocks,
+    its weights are also the optimum on the kept stocks and are returned as they are. Otherwise the optimizer is run once more on the kept stocks,
+    warm started from their weights scaled to sum up to 1 instead of the equal weights.
+
+    Args:
+
+        optimizer (function): maximize_returns, maximize_sharpe_ratio or minimize_variance
+
+        selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, *args: arguments of the optimizer
+
+        max_stocks (integer): maximum number of stocks in the portfolio
+
+        stats (dictionary): if given, the statistics of the optimizer, the number of 'solves' and of 'skipped_resolves' are added to it
+
+        solver_state (dictionary): if given, the warm starts of the solve on all the selected stocks ('all_stocks') and on the kept stocks ('kept_stocks'),
+                                   kept from one call to the next, for example from one rebalance of a backtest to the next
+
+        race (OptimizerRace): if given, the optimizer races several methods and starting points in a process pool
+
+    Returns:
+
+        portfolio (dictionary): weight of every stock in the portfolio
+
+        best_method (string): method of the last solve
+    """
+    warm_start = None if solver_state is None else solver_state.setdefault('all_stocks', {})
+
+    weights, best_method = optimizer(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, *args, stats=stats, warm_start=warm_start, race=race)
+
+    if stats is not None:
+        stats['solves'] = stats.get('solves', 0) + 1
+
+    if len(selected_stocks) <= max_stocks:
+        return dict(zip(selected_stocks, weights)), best_method
+
+    # The max_stocks largest weights, in the order of sorted() with reverse=True on the (stock, weight) pairs
+    kept = sorted(range(len(selected_stocks)), key=lambda i: weights[i], reverse=True)[:max_stocks]
+
+    kept_stocks = [selected_stocks[i] for i in kept]
+    kept_weights = [weights[i] for i in kept]
+
+    if sum(weight > 0 for weight in weights) <= max_stocks:
+        if stats is not None:
+            stats['skipped_resolves'] = stats.get('skipped_resolves', 0) + 1
+        return dict(zip(kept_stocks, kept_weights)), best_method
+
+    total_weight = sum(kept_weights)
+    initial_weights = [weight / total_weight for weight in kept_weights] if total_weight > 0 else None
+
+    warm_start = None if solver_state is None else solver_state.setdefault('kept_stocks', {})
+
+    weights, best_method = optimizer(kept_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, *args, stats=stats, initial_weights=initial_weights, warm_start=warm_start, race=race)
+
+    if stats is not None:
+        stats['solves'] += 1
+
+    return dict(zip(kept_stocks, weights)), best_method
+
+##########################################################################
+##########################################################################
+
+# Function 18: Start of a solve from the solution of the previous one
+
+def warm_start_weights(warm_start, selected_stocks, weightage_no_more_than, sum_tolerance):
+    """
+    The function remaps the weights of the previous solve to the selected stocks by symbol. The stocks that left get no weight, the new stocks start at 0,
+    and the weights are scaled back to the sum of the previous solution.
+
+    Args:
+
+        warm_start (dictionary): state of the previous solve, see save_warm_start
+
+        selected_stocks (list): symbols of the stocks of this solve
+
+        weightage_no_more_than (float): maximum weight of a stock in this solve
+
+        sum_tolerance (float): tolerance of the sum of the weights in this solve
+
+    Returns:
+
+        initial_weights (numpy array): starting weights, None if there is no previous solve, no stock of it is selected,
+                                       or the caps cannot add up to 1 (the result of SLSQP then depends on its start, which stays the equal weights)
+    """
+    previous_weights = warm_start.get('weights')
+
+    if not previous_weights or len(selected_stocks) * weightage_no_more_than < 1 - sum_tolerance:
+        return None
+
+    initial_weights = np.array([previous_weights.get(stock, 0.0) for stock in selected_stocks])
+    total_weight = initial_weights.sum()
+
+    if total_weight <= 0:
+        return None
+
+    return initial_weights * (sum(previous_weights.values()) / total_weight)
+
+def warm_start_working_set(warm_start, selected_stocks, extra_constraints=()):
+    """
+    The function remaps the active set of the previous solve, stored by symbol, to the indices of the constraints of this solve: w >= 0 of the stocks first,
+    then w <= cap, then extra_constraints in their order. The constraints of the stocks that left are dropped.
+
+    Returns:
+
+        working_set (list): indices of the constraints, None if the previous solve has no active set
+    """
+    active_set = warm_start.get('active_set')
+
+    if active_set is None:
+        return None
+
+    num_symbs = len(selected_stocks)
+    positions = {stock: position for position, stock in enumerate(selected_stocks)}
+
+    working_set = []
+    for constraint in active_set:
+        if constraint[0] == 'lower' and constraint[1] in positions:
+            working_set.append(positions[constraint[1]])
+        elif constraint[0] == 'upper' and constraint[1] in positions:
+            working_set.append(num_symbs + positions[constraint[1]])
+        elif constraint[0] in extra_constraints:
+            working_set.append(2 * num_symbs + extra_constraints.index(constraint[0]))
+
+    return working_set
+
+##########################################################################
+##########################################################################
+
+# Function 19: Keep the solution of a solve for the next one
+
+def active_set_symbols(working_set, selected_stocks, extra_constraints=()):
+    """
+    The function turns the indices of a working set into constraints stored by symbol, ('lower', stock), ('upper', stock) or (name,) for extra_constraints,
+    so that they can be remapped to another set of stocks by warm_start_working_set.
+    """
+    selected_stocks = list(selected_stocks)
+    num_symbs = len(selected_stocks)
+
+    active_set = []
+    for index in working_set:
+        if index < num_symbs:
+            active_set.append(('lower', selected_stocks[index]))
+        elif index < 2 * num_symbs:
+            active_set.append(('upper', selected_stocks[index - num_symbs]))
+        else:
+            active_set.append((extra_constraints[index - 2 * num_symbs],))
+
+    return active_set
+
+def save_warm_start(warm_start, selected_stocks, weights, iterations, warm, active_set=None):
+    """
+    The function stores the unrounded weights of a solve by symbol and its active set (for the quadratic program backends) in warm_start,
+    and appends the number of stocks, the iterations and whether it was warm started to warm_start['solves'].
+
+    Args:
+
+        warm_start (dictionary): state of the solve, updated in place
+
+        selected_stocks (list): symbols of the stocks of the solve
+
+        weights (numpy array): solution of the solve
+
+        iterations (integer): iterations of the solve
+
+        warm (boolean): True if the solve started from the previous solution
+
+        active_set (list): active constraints by symbol, see active_set_symbols
+    """
+    warm_start['weights'] = dict(zip(selected_stocks, np.asarray(weights, dtype='float64')))
+    warm_start['active_set'] = active_set
+    warm_start.setdefault('solves', []).append({'stocks': len(selected_stocks), 'iterations': iterations, 'warm': warm})
+
+##########################################################################
+##########################################################################
+
+# Function 20: Iterations of the warm started solves
+
+def warm_start_report(solver_state, path=()):
+    """
+    The function collects the solves recorded in the warm starts of a solver state, a dictionary of warm starts that can be nested
+    (for example per strategy and per optimizer), and prints the iterations of the cold and of the warm started solves.
+
+    Args:
+
+        solver_state (dictionary): solver state passed to the strategies
+
+        path (tuple): keys of solver_state in the solver state of the backtest, used for the names of the solves
+
+    Returns:
+
+        report (dictionary): for every warm start, named by its keys joined with '/', the list of its solves
+    """
+    report = {}
+
+    for key, value in solver_state.items():
+        if key == 'solves' and isinstance(value, list):
+            report['/'.join(map(str, path))] = value
+        elif isinstance(value, dict):
+            report.update(warm_start_report(value, path + (key,)))
+
+    if len(path) == 0:
+        for name, solves in report.items():
+            for warm in (False, True):
+                iterations = [solve['iterations'] for solve in solves if solve['warm'] == warm]
+                if len(iterations) > 0:
+                    print(f"{name} ({'warm' if warm else 'cold'}): {len(iterations)} solves, {sum(iterations)} iterations, {sum(iterations)/len(iterations):.1f} per solve")
+
+    return report
+
+##########################################################################
+##########################################################################
+
+# Function 21: Objective and constraints of an optimizer
+
+def optimization_problem(objective, average_returns, covariance_matrix, bound, weightage_no_more_than, sum_tolerance, use_gradients=True):
+    """
+    The function builds the function to minimize, its gradient and the constraints of one of the optimizers from the moments of the stocks,
+    so that the same problem can be solved in this process or, described by its arguments, in a worker process (see OptimizerRace).
+
+    Args:
+
+        objective (string): 'maximize_returns', 'maximize_sharpe_ratio' or 'minimize_variance'
+
+        average_returns (numpy array): mean daily return of every stock
+
+        covariance_matrix (numpy array): covariance matrix of the daily returns
+
+        bound (float): the maximum annual standard deviation, the risk free rate or the minimum annual return, depending on the objective
+
+        weightage_no_more_than (float): maximum weight of a stock
+
+        sum_tolerance (float): tolerance of the sum of the weights
+
+        use_gradients (boolean): True to add the analytic Jacobian to the constraints
+
+    Returns:
+
+        objective_function (function): function of the weights to minimize
+
+        objective_gradient (function): its gradient
+
+        constraints (tuple of dictionaries): constraints in the format of scipy.optimize.minimize
+    """
+    num_symbs = len(average_returns)
+
+    if objective == 'maximize_returns':
+
+        def objective_function(weights):
+            return -annual_return(weights, average_returns)
+
+        def objective_gradient(weights):
+            return -annual_return_gradient(weights, average_returns)
+
+        constraints = weight_constraints(num_symbs, sum_tolerance, weightage_no_more_than,
+                                         lambda x: bound - annual_standard_deviation(x, covariance_matrix),
+                                         lambda x: -annual_standard_deviation_gradient(x, covariance_matrix),
+                                         use_gradients)
+
+    elif objective == 'maximize_sharpe_ratio':
+
+        def objective_function(weights):
+            return -(annual_return(weights, average_returns)-bound)/annual_standard_deviation(weights, covariance_matrix)
+
+        def objective_gradient(weights):
+            excess_return = annual_return(weights, average_returns)-bound
+            standard_deviation = annual_standard_deviation(weights, covariance_matrix)
+            return -(annual_return_gradient(weights, average_returns)*standard_deviation - excess_return*annual_standard_deviation_gradient(weights, covariance_matrix))/standard_deviation**2
+
+        constraints = weight_constraints(num_symbs, sum_tolerance, weightage_no_more_than, use_gradients=use_gradients)
+
+    elif objective == 'minimize_variance':
+
+        def objective_function(weights):
+            return daily_variance(weights, covariance_matrix)
+
+        def objective_gradient(weights):
+            return 2*np.dot(covariance_matrix, weights)
+
+        constraints = weight_constraints(num_symbs, sum_tolerance, weightage_no_more_than,
+                                         lambda x: annual_return(x, average_returns) - bound,
+                                         lambda x: annual_return_gradient(x, average_returns),
+                                         use_gradients)
+
+    else:
+        raise ValueError("Incorrect Argument for 'objective'. Has to be either 'maximize_returns', 'maximize_sharpe_ratio' or 'minimize_variance'")
+
+    return objective_function, objective_gradient, constraints
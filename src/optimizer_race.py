@@ -0,0 +1,309 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+from concurrent.futures import ProcessPoolExecutor, wait
+import math
+import os
+import time
+import numpy as np
+from scipy.optimize import minimize
+from optimization_functions import optimization_problem
+
+##########################################################################
+##########################################################################
+
+# Methods of scipy.optimize.minimize that do not use the gradient of the objective
+DERIVATIVE_FREE_METHODS = ('cobyla', 'cobyqa', 'nelder-mead', 'powell')
+
+##########################################################################
+##########################################################################
+
+# Function 1: Projection on the capped simplex
+
+def project_capped_simplex(weights, weightage_no_more_than, tolerance=1e-12):
+    """
+    The function returns the closest weights (in the Euclidean norm) that sum up to 1 and lie between 0 and the cap, min(max(w - t, 0), cap)
+    for the shift t found by bisection. If the caps cannot add up to 1 every weight is the cap.
+
+    Args:
+
+        weights (numpy array): weights to project
+
+        weightage_no_more_than (float): maximum weight of a stock
+
+        tolerance (float): tolerance of the sum of the projected weights
+
+    Returns:
+
+        weights (numpy array): projected weights
+    """
+    weights = np.asarray(weights, dtype='float64')
+    upper_bound = min(1.0, weightage_no_more_than)
+
+    if len(weights) * upper_bound <= 1:
+        return np.full(len(weights), upper_bound)
+
+    # The sum of the clipped weights falls from n * cap to 0 as the shift goes from min(w) - cap to max(w)
+    low, high = weights.min() - upper_bound, weights.max()
+
+    while high - low > tolerance:
+        shift = (low + high) / 2
+        if np.clip(weights - shift, 0, upper_bound).sum() > 1:
+            low = shift
+        else:
+            high = shift
+
+    return np.clip(weights - (low + high) / 2, 0, upper_bound)
+
+##########################################################################
+##########################################################################
+
+# Function 2: Constraint violation of a portfolio
+
+def constraint_violation(problem, weights):
+    """
+    The function returns the largest violation of the bounds and the constraints of the problem by the weights, 0 for feasible weights.
+
+    Args:
+
+        problem (tuple): arguments of optimization_problem
+
+        weights (numpy array): weights of the portfolio
+
+    Returns:
+
+        violation (float): largest violation
+    """
+    weights = np.asarray(weights, dtype='float64')
+
+    objective_function, objective_gradient, constraints = optimization_problem(*problem)
+
+    values = np.concatenate([np.atleast_1d(constraint['fun'](weights)) for constraint in constraints])
+
+    return max(0.0, -values.min(), -weights.min(), weights.max() - 1)
+
+##########################################################################
+##########################################################################
+
+# Function 3: One attempt of a race
+
+def race_attempt(problem, method, initial_weights, time_budget):
+    """
+    The function runs one method of scipy.optimize.minimize on the problem from one starting point. It runs in a worker process, so it only takes
+    picklable arguments and builds the objective and the constraints itself. The attempt stops at its first iteration after time_budget seconds
+    and returns its last iterate.
+
+    Args:
+
+        problem (tuple): arguments of optimization_problem
+
+        method (string): method of scipy.optimize.minimize
+
+        initial_weights (numpy array): starting point
+
+        time_budget (float): seconds of the attempt
+
+    Returns:
+
+        attempt (dictionary): 'weights' (None if the method failed), 'iterations', 'seconds', 'timed_out' and the 'message' of the method
+    """
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget
+
+    objective_function, objective_gradient, constraints = optimization_problem(*problem)
+
+    def callback(intermediate_result):
+        if time.perf_counter() > deadline:
+            raise StopIteration
+
+    try:
+        result = minimize(
+            objective_function,
+            initial_weights,
+            method=method,
+            jac=None if method in DERIVATIVE_FREE_METHODS else objective_gradient,
+            bounds=[(0, 1)] * len(initial_weights),
+            constraints=constraints,
+            callback=callback
+        )
+
+    except Exception as error:
+        return {'weights': None, 'iterations': 0, 'seconds': time.perf_counter() - start_time, 'timed_out': False, 'message': repr(error)}
+
+    return {'weights': result.x,
+            'iterations': int(getattr(result, 'nit', 0) or 0),
+            'seconds': time.perf_counter() - start_time,
+            'timed_out': time.perf_counter() > deadline,
+            'message': str(result.message)}
+
+##########################################################################
+##########################################################################
+
+# Class 1: Race of optimization methods and starting points
+
+class OptimizerRace:
+    """
+    Solves an optimizer problem with several methods of scipy.optimize.minimize from several starting points at the same time on a process pool,
+    and keeps the feasible result with the best objective. The starting points are the given one (the warm start or the equal weights)
+    and random portfolios that sum up to 1 under the caps. Every attempt stops after time_budget seconds with its last iterate, and the race
+    does not wait for the attempts that are still queued or running once every wave of attempts had its budget plus grace_seconds (the stragglers).
+    The stragglers that are still running when the next race starts take their workers, so the next race counts them in its waves.
+    Results of the optimizers' own backends (the quadratic programs) can be entered as candidates and are judged the same way.
+    A result only beats an earlier one (the candidates come first) with an objective better by more than a relative 1e-9. If no result is feasible
+    (for example when the caps cannot add up to 1) the one with the smallest violation wins.
+
+    The pool is created on the first race and is shut down by close(), or at the end of a with block.
+
+    Args:
+
+        methods (tuple): methods of scipy.optimize.minimize, by default the list the optimizers used to try
+
+        random_starts (integer): number of random starting points on top of the given one
+
+        time_budget (float): seconds of every attempt
+
+        max_workers (integer): number of worker processes, os.cpu_count() by default
+
+        grace_seconds (float): time given to the workers on top of the budgets before the race stops waiting
+
+        feasibility_tolerance (float): largest constraint violation of a feasible result
+
+        seed (integer): seed of the random starting points
+    """
+
+    def __init__(self, methods=('cobyla', 'slsqp', 'trust-constr'), random_starts=3, time_budget=1.0, max_workers=None, grace_seconds=0.5, feasibility_tolerance=1e-7, seed=0):
+
+        self.methods = tuple(methods)
+        self.random_starts = random_starts
+        self.time_budget = time_budget
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.grace_seconds = grace_seconds
+        self.feasibility_tolerance = feasibility_tolerance
+
+        self._random = np.random.default_rng(seed)
+        self._executor = None
+
+        # Attempts of earlier races that were still running when their race stopped waiting, they keep their workers busy until they stop
+        self._running = set()
+
+        # Number of races, attempts, attempts stopped by their budget and stragglers, for reporting
+        self.races = 0
+        self.attempts = 0
+        self.timeouts = 0
+        self.stragglers = 0
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+    def close(self):
+        """
+        Shuts the pool down without waiting for the attempts that are still running.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._running = set()
+
+    def starting_points(self, num_symbs, weightage_no_more_than, initial_weights=None):
+        """
+        Returns the given starting point (the equal weights if there is none) followed by random_starts random portfolios under the caps.
+        """
+        starts = [np.full(num_symbs, 1/num_symbs) if initial_weights is None else np.asarray(initial_weights, dtype='float64')]
+
+        for _ in range(self.random_starts):
+            starts.append(project_capped_simplex(self._random.dirichlet(np.ones(num_symbs)), weightage_no_more_than))
+
+        return starts
+
+    def run(self, problem, initial_weights=None, candidates=None, stats=None):
+        """
+        Races every method from every starting point on the problem (the arguments of optimization_problem).
+
+        Args:
+
+            problem (tuple): arguments of optimization_problem
+
+            initial_weights (numpy array): given starting point, the equal weights if None
+
+            candidates (dictionary): weights found by other means in this process by name, for example {'active_set': weights}
+
+            stats (dictionary): if given, the iterations and the wall time are added to it and 'race' is set to the report of every attempt
+
+        Returns:
+
+            weights (numpy array): weights of the winner, None if no attempt finished and there is no candidate
+
+            best_method (string): method (or candidate name) of the winner
+        """
+        start_time = time.perf_counter()
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        starts = self.starting_points(len(problem[1]), problem[4], initial_weights)
+
+        futures = {self._executor.submit(race_attempt, problem, method, start, self.time_budget): (method, start_number)
+                   for start_number, start in enumerate(starts) for method in self.methods}
+
+        # Every wave of max_workers attempts has its budget, the attempts that are not done by then are left behind.
+        # The attempts of earlier races that still run hold their workers, so they count as attempts queued before this race
+        self._running = {future for future in self._running if not future.done()}
+        waves = math.ceil((len(self._running) + len(futures)) / self.max_workers)
+        done, not_done = wait(futures, timeout=waves * self.time_budget + self.grace_seconds)
+
+        # A queued attempt is cancelled, a running one cannot be and is counted by the next race
+        for future in not_done:
+            if not future.cancel():
+                self._running.add(future)
+
+        entries = [{'method': name, 'start': None, 'weights': np.asarray(weights, dtype='float64'), 'iterations': 0, 'seconds': 0.0, 'timed_out': False, 'message': 'candidate'}
+                   for name, weights in (candidates or {}).items()]
+
+        for future, (method, start_number) in futures.items():
+            if future in done and future.exception() is None:
+                entries.append(dict(future.result(), method=method, start=start_number))
+            else:
+                entries.append({'method': method, 'start': start_number, 'weights': None, 'iterations': 0, 'seconds': None, 'timed_out': True,
+                                'message': 'straggler' if future in not_done else repr(future.exception())})
+
+        objective_function, objective_gradient, constraints = optimization_problem(*problem)
+
+        best = None
+        for entry in entries:
+            if entry['weights'] is None:
+                continue
+
+            entry['objective'] = float(objective_function(entry['weights']))
+            entry['violation'] = constraint_violation(problem, entry['weights'])
+            entry['feasible'] = entry['violation'] <= self.feasibility_tolerance
+
+            if best is None:
+                best = entry
+            elif entry['feasible'] and not best['feasible']:
+                best = entry
+            elif entry['feasible'] and entry['objective'] < best['objective'] - 1e-9 * abs(best['objective']):
+                best = entry
+            elif not entry['feasible'] and not best['feasible'] and entry['violation'] < best['violation']:
+                best = entry
+
+        self.races += 1
+        self.attempts += len(futures)
+        self.timeouts += sum(entry['timed_out'] and entry['weights'] is not None for entry in entries)
+        self.stragglers += len(not_done)
+
+        if stats is not None:
+            stats['iterations'] = stats.get('iterations', 0) + sum(entry['iterations'] for entry in entries)
+            stats['race'] = [{key: value for key, value in entry.items() if key != 'weights'} for entry in entries]
+            stats['seconds'] = stats.get('seconds', 0.0) + time.perf_counter() - start_time
+
+        if best is None:
+            return None, None
+
+        return best['weights'], best['method']
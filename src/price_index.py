@@ -0,0 +1,278 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+##########################################################################
+##########################################################################
+
+# Number of price matrices whose index is kept in memory by get_price_index
+PRICE_INDEX_CACHE_SIZE = 4
+
+_price_index_cache = OrderedDict()
+
+##########################################################################
+##########################################################################
+
+# Months of every lookback length in years used by the strategies
+LOOKBACK_MONTHS = {2: 24, 1: 12, 0.5: 6, 0.25: 3}
+
+##########################################################################
+##########################################################################
+
+# Function 1: Start dates of a lookback
+
+def lookback_start_dates(buying_dates, last_x_years):
+    """
+    The function moves every buying date back by last_x_years with numpy month arithmetic. A day that does not exist in the target month
+    becomes the last day of that month, for example 2023-08-31 minus 0.5 years is 2023-02-28.
+
+    Args:
+
+        buying_dates (array like): buying dates as strings in the format 'yyyy-mm-dd' or datetime64 values
+
+        last_x_years (float): it can be 2, 1, 0.5 or 0.25
+
+    Returns:
+
+        start_dates (numpy array): datetime64[D] start date of the lookback of every buying date
+    """
+    if last_x_years not in LOOKBACK_MONTHS:
+        raise ValueError("Incorrect Argument for 'last_x_years'. Has to be either 2, 1, 0.5 or 0.25")
+
+    buying_dates = np.asarray(buying_dates, dtype='datetime64[D]')
+
+    buying_months = buying_dates.astype('datetime64[M]')
+    day_offsets = buying_dates - buying_months.astype('datetime64[D]')
+
+    start_months = buying_months - LOOKBACK_MONTHS[last_x_years]
+    month_lengths = (start_months + 1).astype('datetime64[D]') - start_months.astype('datetime64[D]')
+
+    return start_months.astype('datetime64[D]') + np.minimum(day_offsets, month_lengths - 1)
+
+##########################################################################
+##########################################################################
+
+# Function 2: Start date of a lookback as a string
+
+def lookback_start_date(buying_date, last_x_years):
+    """
+    The function returns the start of the last x years before the buying date in the format 'yyyy-mm-dd', see lookback_start_dates.
+
+    Args:
+
+        buying_date (string): it is a string of the buying date in the format 'yyyy-mm-dd'
+
+        last_x_years (float): it can be 2, 1, 0.5 or 0.25
+
+    Returns:
+
+        start_date (string): start date in the format 'yyyy-mm-dd'
+    """
+    return str(lookback_start_dates([buying_date], last_x_years)[0])
+
+##########################################################################
+##########################################################################
+
+# Class 1: Lookback windows as rows of the price matrix
+
+class LookbackCalendar:
+    """
+    Maps a buying date and a lookback length to the rows [first, last) of the price matrix that hold the dates on or after the start of the lookback
+    and strictly before the buying date, so that the windows are sliced by position. The rows of every (buying_date, last_x_years) are cached.
+
+    Args:
+
+        dates (numpy array): sorted datetime64 dates of the price matrix
+    """
+
+    def __init__(self, dates):
+
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+
+        self._rows = {}
+
+    def rows_many(self, buying_dates, last_x_years):
+        """
+        Returns the first and the last rows of the lookbacks of many buying dates as two integer arrays.
+        """
+        buying_dates = np.asarray(buying_dates, dtype='datetime64[D]')
+
+        first = np.searchsorted(self.dates, lookback_start_dates(buying_dates, last_x_years).astype('datetime64[ns]'), side='left')
+        last = np.maximum(first, np.searchsorted(self.dates, buying_dates.astype('datetime64[ns]'), side='left'))
+
+        return first, last
+
+    def rows(self, buying_date, last_x_years):
+        """
+        Returns the first and the last rows of the lookback of the buying date.
+        """
+        key = (buying_date, last_x_years)
+
+        if key not in self._rows:
+            first, last = self.rows_many([buying_date], last_x_years)
+            self._rows[key] = (int(first[0]), int(last[0]))
+
+        return self._rows[key]
+
+##########################################################################
+##########################################################################
+
+# Class 2: Prefix sum index over the price matrix
+
+class PriceIndex:
+    """
+    Prefix sums over the price matrix, built once per price matrix, so that the statistics of every stock over any date window are read in constant time per stock
+    instead of slicing the dataframe and calling pct_change on it.
+
+    The daily simple returns are p[i] / p[i-1] - 1 like pct_change, a return is missing (NaN) when either price is missing, and the missing returns are skipped
+    by the counts, so the window means are the same as pct_change(fill_method=None).iloc[1:].mean() on the sliced dataframe (up to floating point rounding).
+    A gap filled with the previous price has zero returns in both, a gap left missing has no returns in either (the fill_method='pad' of older pandas
+    would fill it instead).
+
+    Args:
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+    """
+
+    def __init__(self, all_stocks_df):
+
+        prices = all_stocks_df.to_numpy(dtype='float64')
+
+        self.dates = all_stocks_df.index.to_numpy(dtype='datetime64[ns]')
+        self.symbols = all_stocks_df.columns
+
+        self.lookback_calendar = LookbackCalendar(self.dates)
+
+        # Cumulative log prices: the log return of a period is the difference of two rows
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.log_prices = np.log(prices)
+
+        # Daily simple returns, row i is the return from date i-1 to date i and row 0 has no return
+        daily_returns = np.full(prices.shape, np.nan)
+        daily_returns[1:] = prices[1:] / prices[:-1] - 1
+
+        valid = ~np.isnan(daily_returns)
+        daily_returns[~valid] = 0.0
+
+        # Row k of every prefix sum covers the daily returns of rows 0 to k-1
+        shape = (prices.shape[0] + 1, prices.shape[1])
+
+        self.cum_counts = np.zeros(shape, dtype='int64')
+        self.cum_returns = np.zeros(shape)
+        self.cum_squared_returns = np.zeros(shape)
+
+        np.cumsum(valid, axis=0, out=self.cum_counts[1:])
+        np.cumsum(daily_returns, axis=0, out=self.cum_returns[1:])
+        np.cumsum(daily_returns ** 2, axis=0, out=self.cum_squared_returns[1:])
+
+    def window_rows(self, start_date=None, end_date=None):
+        """
+        Returns the rows [first, last) of the dates on or after the start date and strictly before the end date. A missing bound means the start or the end of the data.
+        """
+        first = 0 if start_date is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left'))
+        last = len(self.dates) if end_date is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='left'))
+
+        return first, max(first, last)
+
+    def _window_sums(self, first, last):
+
+        # The first date of the window has no return inside the window, like pct_change().iloc[1:] on the slice
+        first = np.minimum(first + 1, last)
+
+        counts = self.cum_counts[last] - self.cum_counts[first]
+        sums = self.cum_returns[last] - self.cum_returns[first]
+        squared_sums = self.cum_squared_returns[last] - self.cum_squared_returns[first]
+
+        return counts, sums, squared_sums
+
+    def mean_daily_returns_rows(self, first, last):
+        """
+        Returns the mean daily simple return of every stock over the rows [first, last) as a numpy array, NaN for stocks without a return in the window.
+        first and last can also be arrays of rows, then the result is a windows x stocks array.
+        """
+        counts, sums, squared_sums = self._window_sums(np.asarray(first), np.asarray(last))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def mean_daily_returns(self, start_date=None, end_date=None):
+        """
+        Returns the mean daily simple return of every stock over the window as a series indexed by the symbols, NaN for stocks without a return in the window.
+        """
+        return pd.Series(self.mean_daily_returns_rows(*self.window_rows(start_date, end_date)), index=self.symbols)
+
+##########################################################################
+##########################################################################
+
+# Function 3: Cache key of a price matrix
+
+def price_matrix_key(all_stocks_df):
+    """
+    The function returns the key under which the caches keep what they compute from a price matrix, made of the version of the prices, the shape,
+    the date range and every symbol. Only a dataframe whose prices are still the read only memory map of the price store has a version that can be trusted,
+    the attrs are carried over to copies and arithmetic results that may hold other prices and any other dataframe can be changed in place.
+    Such a dataframe has no key (None) and the caches compute from it without keeping the result.
+
+    Args:
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+
+    Returns:
+
+        key (tuple): hashable key of the price matrix, None if it cannot be cached
+    """
+    data_version = all_stocks_df.attrs.get('data_version')
+
+    if data_version is None:
+        return None
+
+    # The prices of the store are a read only np.memmap, a slice of them is a view whose base leads to the map
+    base = all_stocks_df.to_numpy()
+    while isinstance(base, np.ndarray) and not isinstance(base, np.memmap):
+        base = base.base
+
+    if not isinstance(base, np.memmap):
+        return None
+
+    return (data_version, all_stocks_df.shape, all_stocks_df.index.min(), all_stocks_df.index.max(), tuple(all_stocks_df.columns))
+
+##########################################################################
+##########################################################################
+
+# Function 4: Shared price index of a price matrix
+
+def get_price_index(all_stocks_df):
+    """
+    The function returns the price index of the price matrix, built on the first call and shared by every later call on the same data,
+    so all the rebalance dates and strategies of a backtest use one index. The price matrix is recognised by price_matrix_key,
+    a price matrix without a key gets an index of its own.
+
+    Args:
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+
+    Returns:
+
+        price_index (PriceIndex): the index of the price matrix
+    """
+    key = price_matrix_key(all_stocks_df)
+
+    if key is None:
+        return PriceIndex(all_stocks_df)
+
+    if key in _price_index_cache:
+        _price_index_cache.move_to_end(key)
+        return _price_index_cache[key]
+
+    price_index = PriceIndex(all_stocks_df)
+
+    _price_index_cache[key] = price_index
+    if len(_price_index_cache) > PRICE_INDEX_CACHE_SIZE:
+        _price_index_cache.popitem(last=False)
+
+    return price_index
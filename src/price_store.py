@@ -0,0 +1,489 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+import io
+import os
+import json
+import numpy as np
+import pandas as pd
+from data_download import yahoo_fetch_backend, download_in_batches, print_download_report
+from trading_calendar import get_nse_calendar
+
+##########################################################################
+##########################################################################
+
+# Layout of the price store directory:
+#   prices_<v>.npy  float matrix of adjusted close prices, one row per date and one column per symbol (C order)
+#   dates_<v>.npy   datetime64[ns] array with the date of every row
+#   manifest.json   file names, symbols, number of rows, dtype, version, appended row blocks and the date the store was last checked up to
+#
+# A full save writes a new pair of files and publishes them by atomically replacing the manifest,
+# readers that loaded the previous pair keep using it. New dates are appended to the end of the
+# current pair and the manifest is replaced last, so the number of rows in the manifest is what readers trust.
+
+MANIFEST_FILE = 'manifest.json'
+
+DEFAULT_STORE_PATH = '../data/price_store'
+
+##########################################################################
+##########################################################################
+
+# Function 1: Read the manifest of a price store
+
+def read_manifest(store_path=DEFAULT_STORE_PATH):
+    """
+    The function reads the manifest of a price store.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+    Returns:
+
+        manifest (dictionary): 'prices_file', 'dates_file', 'symbols', 'rows', 'dtype', 'version' and 'blocks' of the store
+    """
+    with open(os.path.join(store_path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+##########################################################################
+##########################################################################
+
+# Function 2: Write the manifest of a price store
+
+def write_manifest(store_path, manifest):
+    """
+    The function writes the manifest to a temporary file first and then renames it, so a reader never sees a half written manifest.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+        manifest (dictionary): manifest to be written
+
+    Returns:
+
+        The function has no return values
+    """
+    manifest_path = os.path.join(store_path, MANIFEST_FILE)
+    temp_path = manifest_path + '.tmp'
+
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, manifest_path)
+
+##########################################################################
+##########################################################################
+
+# Function 3: Check if a price store exists
+
+def price_store_exists(store_path=DEFAULT_STORE_PATH):
+    """
+    The function checks if a complete price store exists at the given path.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+    Returns:
+
+        exists (boolean): True if the manifest, the prices and the dates are all present
+    """
+    if not os.path.exists(os.path.join(store_path, MANIFEST_FILE)):
+        return False
+
+    manifest = read_manifest(store_path)
+
+    return all(os.path.exists(os.path.join(store_path, manifest[key])) for key in ['prices_file', 'dates_file'])
+
+##########################################################################
+##########################################################################
+
+# Function 4: Save a dataframe of prices as a price store
+
+def save_price_store(all_stocks_df, store_path=DEFAULT_STORE_PATH, dtype='float64'):
+    """
+    The function saves a dataframe of stock prices as a binary price store: a contiguous price matrix, a date axis and a symbol axis.
+
+    Args:
+
+        all_stocks_df (pandas dataframe): historical stock prices with the dates as the index and the symbols as the columns
+
+        store_path (string): path of the price store directory, it is created if it does not exist
+
+        dtype (string): 'float64' or 'float32', the type in which the prices are stored
+
+    Returns:
+
+        manifest (dictionary): manifest of the saved store
+    """
+    os.makedirs(store_path, exist_ok=True)
+
+    all_stocks_df = all_stocks_df.sort_index()
+
+    prices = np.ascontiguousarray(all_stocks_df.to_numpy(dtype=dtype))
+    dates = pd.to_datetime(all_stocks_df.index).to_numpy(dtype='datetime64[ns]')
+
+    # Both files are written under temporary names and only then published as a new snapshot
+    prices_path = os.path.join(store_path, 'prices.npy.tmp')
+    dates_path = os.path.join(store_path, 'dates.npy.tmp')
+
+    with open(prices_path, 'wb') as f:
+        np.save(f, prices)
+    with open(dates_path, 'wb') as f:
+        np.save(f, dates)
+
+    manifest = publish_price_store(prices_path, dates_path, all_stocks_df.columns, store_path)
+
+    return manifest
+
+##########################################################################
+##########################################################################
+
+# Function 5: Load a price store as a dataframe
+
+def load_price_store(store_path=DEFAULT_STORE_PATH):
+    """
+    The function memory maps the price matrix of a price store and returns it as a read only dataframe without copying the prices.
+    Only the rows listed in the manifest are used, so rows that are still being written are never visible.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+    Returns:
+
+        all_stocks_df (pandas dataframe): historical stock prices with the dates as the index and the symbols as the columns,
+                                          its attrs['data_version'] identifies the version of the store it was loaded from
+    """
+    manifest = read_manifest(store_path)
+    rows = manifest['rows']
+
+    prices = np.load(os.path.join(store_path, manifest['prices_file']), mmap_mode='r')[:rows]
+    dates = np.load(os.path.join(store_path, manifest['dates_file']), mmap_mode='r')[:rows]
+
+    all_stocks_df = pd.DataFrame(prices, index=pd.DatetimeIndex(dates), columns=manifest['symbols'], copy=False)
+    all_stocks_df.attrs['data_version'] = (os.path.abspath(store_path), manifest['version'], rows)
+
+    return all_stocks_df
+
+##########################################################################
+##########################################################################
+
+# Function 6: Convert the csv of all stock prices into a price store
+
+def convert_csv_to_price_store(csv_path='../data/all_stock_data.csv', store_path=DEFAULT_STORE_PATH, dtype='float64'):
+    """
+    The function parses the csv saved by generate_and_save_data once and saves it as a price store.
+
+    Args:
+
+        csv_path (string): path of the csv of all stock prices
+
+        store_path (string): path of the price store directory
+
+        dtype (string): 'float64' or 'float32', the type in which the prices are stored
+
+    Returns:
+
+        manifest (dictionary): manifest of the saved store
+    """
+    all_stocks_df = pd.read_csv(csv_path, index_col=0)
+    all_stocks_df.index = pd.to_datetime(all_stocks_df.index)
+    all_stocks_df = all_stocks_df[~all_stocks_df.index.duplicated(keep='first')]
+
+    manifest = save_price_store(all_stocks_df, store_path, dtype)
+
+    print(f"'{csv_path}' is converted into a price store with {manifest['rows']} dates and {len(manifest['symbols'])} symbols at '{store_path}'.")
+
+    return manifest
+
+##########################################################################
+##########################################################################
+
+# Function 7: Append rows to a .npy file in place
+
+def append_rows_to_npy(npy_path, rows, valid_rows):
+    """
+    The function appends rows to the end of a .npy file and updates the shape in its header without rewriting the existing data.
+    Any bytes after the first valid_rows rows (left behind by an interrupted append) are discarded first.
+
+    Args:
+
+        npy_path (string): path of the .npy file, its first axis is the one that grows
+
+        rows (numpy array): rows to be appended, with the same dtype and the same trailing shape as the file
+
+        valid_rows (integer): number of rows of the file that are already committed in the manifest
+
+    Returns:
+
+        total_rows (integer): number of rows in the file after the append
+    """
+    with open(npy_path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+
+        rows = np.ascontiguousarray(rows, dtype=dtype)
+        row_nbytes = int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize
+        total_rows = valid_rows + rows.shape[0]
+
+        header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran_order, 'shape': (total_rows,) + tuple(shape[1:])}
+        header_bytes = io.BytesIO()
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header_bytes, header)
+        else:
+            np.lib.format.write_array_header_2_0(header_bytes, header)
+        header_bytes = header_bytes.getvalue()
+
+        if len(header_bytes) == data_offset:
+            f.truncate(data_offset + valid_rows * row_nbytes)
+            f.seek(0, os.SEEK_END)
+            f.write(rows.tobytes())
+            f.seek(0)
+            f.write(header_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+            return total_rows
+
+    # The header outgrew its padding, so the file has to be written again once
+    existing = np.load(npy_path, mmap_mode='r')[:valid_rows]
+    temp_path = npy_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        np.save(f, np.concatenate([existing, rows]))
+    os.replace(temp_path, npy_path)
+
+    return total_rows
+
+##########################################################################
+##########################################################################
+
+# Function 8: Append new dates to a price store
+
+def append_to_price_store(new_stocks_df, store_path=DEFAULT_STORE_PATH):
+    """
+    The function appends the prices of dates after the last stored date as a new row block of the price store.
+    The work done is proportional to the number of new rows, the existing prices are neither read nor rewritten.
+
+    Args:
+
+        new_stocks_df (pandas dataframe): prices with the dates as the index, the columns are aligned to the symbols of the store
+                                          (symbols missing from it are stored as NaN and extra symbols are ignored)
+
+        store_path (string): path of the price store directory
+
+    Returns:
+
+        appended_rows (integer): number of rows that were appended
+    """
+    manifest = read_manifest(store_path)
+    rows = manifest['rows']
+
+    last_date = last_stored_date(store_path, manifest)
+
+    new_stocks_df = new_stocks_df.sort_index()
+    new_stocks_df.index = pd.to_datetime(new_stocks_df.index)
+    new_stocks_df = new_stocks_df[~new_stocks_df.index.duplicated(keep='first')]
+    new_stocks_df = new_stocks_df[new_stocks_df.index > last_date]
+
+    if len(new_stocks_df) == 0:
+        return 0
+
+    new_prices = new_stocks_df.reindex(columns=manifest['symbols']).to_numpy(dtype=manifest['dtype'])
+    new_dates = new_stocks_df.index.to_numpy(dtype='datetime64[ns]')
+
+    append_rows_to_npy(os.path.join(store_path, manifest['prices_file']), new_prices, rows)
+    append_rows_to_npy(os.path.join(store_path, manifest['dates_file']), new_dates, rows)
+
+    # The manifest is the commit point, readers only see the new rows after it is replaced
+    manifest['blocks'] = manifest.get('blocks', [{'start_row': 0, 'rows': rows}]) + [{'start_row': rows, 'rows': len(new_dates)}]
+    manifest['rows'] = rows + len(new_dates)
+    manifest['version'] += 1
+    write_manifest(store_path, manifest)
+
+    return len(new_dates)
+
+##########################################################################
+##########################################################################
+
+# Function 9: Download and append only the missing dates
+
+def update_price_store(end_date, store_path=DEFAULT_STORE_PATH, fetch_backend=yahoo_fetch_backend, batch_size=50, max_workers=8, max_retries=3, backoff_seconds=1.0):
+    """
+    The function downloads the prices of the stored symbols from the day after the last stored date up to the end date and appends them to the price store.
+    If any batch fails nothing is appended: the store has one last date for all the symbols, so rows with the failed symbols left as NaN
+    would never be downloaded again. The next update then downloads the same dates for every symbol.
+
+    Args:
+
+        end_date (string): it is the end date in the format 'yyyy-mm-dd' (not included in the download)
+
+        store_path (string): path of the price store directory
+
+        fetch_backend, batch_size, max_workers, max_retries, backoff_seconds: passed on to download_in_batches
+
+    Returns:
+
+        appended_rows (integer): number of rows that were appended
+    """
+    manifest = read_manifest(store_path)
+
+    last_date = last_stored_date(store_path, manifest)
+    start_date = last_date + pd.Timedelta(days=1)
+
+    if start_date >= pd.Timestamp(end_date):
+        return 0
+
+    start_date = start_date.strftime('%Y-%m-%d')
+
+    new_stocks_df, download_report = download_in_batches(manifest['symbols'], start_date, end_date, fetch_backend=fetch_backend, batch_size=batch_size,
+                                                         max_workers=max_workers, max_retries=max_retries, backoff_seconds=backoff_seconds)
+
+    print_download_report(download_report)
+
+    if len(download_report['failed_symbols']) > 0:
+        print(f"Nothing is appended to the price store at '{store_path}' because {len(download_report['failed_symbols'])} symbols failed, "
+              f"the dates from {start_date} to {end_date} are downloaded again by the next update.")
+        return 0
+
+    appended_rows = 0
+
+    if len(new_stocks_df) > 0:
+        new_stocks_df.index = pd.to_datetime(new_stocks_df.index)
+        new_stocks_df = new_stocks_df.sort_index().bfill()
+
+        appended_rows = append_to_price_store(new_stocks_df, store_path)
+
+        print(f"{appended_rows} new dates from {start_date} to {end_date} are appended to the price store at '{store_path}'.")
+
+    # Remember that the provider had nothing more up to the end date (for example holidays missing from the calendar)
+    manifest = read_manifest(store_path)
+    manifest['checked_until'] = max(pd.Timestamp(manifest.get('checked_until', end_date)), pd.Timestamp(end_date)).strftime('%Y-%m-%d')
+    write_manifest(store_path, manifest)
+
+    return appended_rows
+
+##########################################################################
+##########################################################################
+
+# Function 10: Last stored date
+
+def last_stored_date(store_path=DEFAULT_STORE_PATH, manifest=None):
+    """
+    The function returns the last date committed in the price store.
+
+    Args:
+
+        store_path (string): path of the price store directory
+
+        manifest (dictionary): manifest of the store if it has already been read
+
+    Returns:
+
+        last_date (pandas Timestamp): date of the last row of the store
+    """
+    if manifest is None:
+        manifest = read_manifest(store_path)
+
+    return pd.Timestamp(np.load(os.path.join(store_path, manifest['dates_file']), mmap_mode='r')[manifest['rows'] - 1])
+
+##########################################################################
+##########################################################################
+
+# Function 11: Check if the price store is up to date
+
+def price_store_is_current(end_date, store_path=DEFAULT_STORE_PATH, calendar=None):
+    """
+    The function checks if the price store already has every closing price that can exist before the end date, in which case a download would bring nothing new.
+    The store is current when its last date is on or after the last trading session before the end date,
+    or when an earlier download already found nothing more up to the end date.
+
+    Args:
+
+        end_date (string): it is the end date in the format 'yyyy-mm-dd'
+
+        store_path (string): path of the price store directory
+
+        calendar (TradingCalendar): trading calendar used to find the last session, the NSE calendar by default
+
+    Returns:
+
+        is_current (boolean): True if no download is needed
+    """
+    if calendar is None:
+        calendar = get_nse_calendar()
+
+    manifest = read_manifest(store_path)
+
+    if 'checked_until' in manifest and pd.Timestamp(manifest['checked_until']) >= pd.Timestamp(end_date):
+        return True
+
+    return last_stored_date(store_path, manifest) >= calendar.last_session_before(end_date)
+
+##########################################################################
+##########################################################################
+
+# Function 12: Publish written price and date files as a new snapshot
+
+def publish_price_store(prices_path, dates_path, symbols, store_path=DEFAULT_STORE_PATH):
+    """
+    The function moves a price matrix and a date axis that were already written as .npy files into the store and publishes them by replacing the manifest.
+    The new snapshot gets its own file names, so the files of the snapshot that readers currently have open are never overwritten.
+
+    Args:
+
+        prices_path (string): path of the .npy price matrix, it must be on the same file system as the store
+
+        dates_path (string): path of the .npy date axis
+
+        symbols (list): symbol of every column of the price matrix
+
+        store_path (string): path of the price store directory, it is created if it does not exist
+
+    Returns:
+
+        manifest (dictionary): manifest of the published store
+    """
+    os.makedirs(store_path, exist_ok=True)
+
+    previous_manifest = read_manifest(store_path) if os.path.exists(os.path.join(store_path, MANIFEST_FILE)) else None
+    version = previous_manifest['version'] + 1 if previous_manifest is not None else 1
+
+    prices_file = f'prices_{version}.npy'
+    dates_file = f'dates_{version}.npy'
+
+    os.replace(prices_path, os.path.join(store_path, prices_file))
+    os.replace(dates_path, os.path.join(store_path, dates_file))
+
+    prices = np.load(os.path.join(store_path, prices_file), mmap_mode='r')
+
+    manifest = {
+        'prices_file': prices_file,
+        'dates_file': dates_file,
+        'symbols': [str(symbol) for symbol in symbols],
+        'rows': int(prices.shape[0]),
+        'dtype': str(prices.dtype),
+        'version': version,
+        'blocks': [{'start_row': 0, 'rows': int(prices.shape[0])}],
+    }
+
+    write_manifest(store_path, manifest)
+
+    # Only the new and the previous snapshot are kept, older ones can no longer be loaded by anyone
+    keep_files = {prices_file, dates_file}
+    if previous_manifest is not None:
+        keep_files |= {previous_manifest['prices_file'], previous_manifest['dates_file']}
+
+    for file_name in os.listdir(store_path):
+        if file_name.endswith('.npy') and file_name.startswith(('prices_', 'dates_')) and file_name not in keep_files:
+            os.remove(os.path.join(store_path, file_name))
+
+    return manifest
@@ -0,0 +1,112 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+##########################################################################
+##########################################################################
+
+DEFAULT_BOND_DATA_PATH = '../data/India 10-Year Bond Yield Historical Data.csv'
+
+##########################################################################
+##########################################################################
+
+# Class 1: Risk free rate series
+
+class RiskFreeRate:
+    """
+    Government bond yields held as sorted numpy arrays, so that the rate known before any date is found by binary search.
+
+    Args:
+
+        dates (array like): dates of the yields, in any order
+
+        yields (array like): yields in percent (as quoted in the bond data csv)
+    """
+
+    def __init__(self, dates, yields):
+
+        dates = pd.to_datetime(pd.Index(dates)).to_numpy(dtype='datetime64[ns]')
+        rates = np.asarray(yields, dtype='float64') / 100
+
+        order = np.argsort(dates, kind='stable')
+
+        self.dates = dates[order]
+        self.rates = rates[order]
+
+    @classmethod
+    def from_govt_bond_df(cls, govt_bond_df):
+        """
+        Builds the series from the dataframe returned by get_govt_bond_data (dates as the index and the yield in the 'Price' column).
+        """
+        return cls(govt_bond_df.index, govt_bond_df['Price'].to_numpy())
+
+    def rates_asof(self, dates):
+        """
+        Returns the rates (as decimals) of the last yield dated strictly before each of the dates, as a numpy array.
+        Dates before the first yield get NaN.
+        """
+        dates = pd.to_datetime(pd.Index(np.atleast_1d(dates))).to_numpy(dtype='datetime64[ns]')
+
+        positions = np.searchsorted(self.dates, dates, side='left') - 1
+
+        return np.where(positions >= 0, self.rates[np.maximum(positions, 0)], np.nan)
+
+    def rate_asof(self, date):
+        """
+        Returns the rate (as a decimal) of the last yield dated strictly before the date, which is the rate known on the morning of the date.
+        """
+        position = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date), 'ns'), side='left') - 1
+
+        if position < 0:
+            raise ValueError(f"There is no government bond yield before {date}")
+
+        return float(self.rates[position])
+
+##########################################################################
+##########################################################################
+
+# Function 1: Load the risk free rate series
+
+@lru_cache(maxsize=None)
+def load_risk_free_rate(file_path=DEFAULT_BOND_DATA_PATH):
+    """
+    The function parses the government bond yield csv once and returns the risk free rate series. Later calls reuse the parsed series.
+
+    Args:
+
+        file_path (string): path of the bond yield csv with 'Date' and 'Price' columns
+
+    Returns:
+
+        risk_free_rate (RiskFreeRate): the parsed series
+    """
+    govt_bond_df = pd.read_csv(file_path, usecols=['Date', 'Price'])
+
+    return RiskFreeRate(pd.to_datetime(govt_bond_df['Date']), govt_bond_df['Price'].to_numpy())
+
+##########################################################################
+##########################################################################
+
+# Function 2: Risk free rate series from either input type
+
+def as_risk_free_rate(govt_bond):
+    """
+    The function lets the optimizers accept either a parsed RiskFreeRate or the government bond dataframe used so far.
+
+    Args:
+
+        govt_bond (RiskFreeRate or pandas dataframe): risk free rate series or government bond dataframe
+
+    Returns:
+
+        risk_free_rate (RiskFreeRate): the risk free rate series
+    """
+    if isinstance(govt_bond, RiskFreeRate):
+        return govt_bond
+
+    return RiskFreeRate.from_govt_bond_df(govt_bond)
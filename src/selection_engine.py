@@ -0,0 +1,467 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+import numpy as np
+import pandas as pd
+
+##########################################################################
+##########################################################################
+
+# Class 1: Calendar of the analysis periods of a holding period strategy
+
+class PeriodCalendar:
+    """
+    Everything in which the 3 month and the 1 month stock selections differ: the generator of the analysis periods, which periods make up the last x years,
+    and the number of periods that max_non_positive_returns_count is scaled to.
+    The periods of every (buying_date, holding_period) are generated once and kept as datetime64 arrays.
+
+    Args:
+
+        period_generator (function): returns (list of (start date, end date) tuples, selling date) for a buying date and a holding period
+
+        recent_periods (dictionary of float:integer type): number of the most recent periods for each value of last_x_years
+
+        newest_first (boolean): True if the generator lists the most recent period first
+
+        max_count_periods (integer): number of periods that a max_non_positive_returns_count given for 34 periods is scaled to, None for no scaling
+    """
+
+    def __init__(self, period_generator, recent_periods, newest_first, max_count_periods=None):
+
+        self.period_generator = period_generator
+        self.recent_periods = recent_periods
+        self.newest_first = newest_first
+        self.max_count_periods = max_count_periods
+
+        self._periods = {}
+
+    def periods(self, buying_date, holding_period):
+        """
+        Returns the start dates and the end dates of the periods as datetime64 arrays, and the selling date as a string.
+        """
+        key = (buying_date, holding_period)
+
+        if key not in self._periods:
+            periods, selling_date = self.period_generator(buying_date, holding_period)
+
+            start_dates = np.array([start_date for start_date, end_date in periods], dtype='datetime64[D]')
+            end_dates = np.array([end_date for start_date, end_date in periods], dtype='datetime64[D]')
+
+            self._periods[key] = (start_dates, end_dates, selling_date)
+
+        return self._periods[key]
+
+    def last_x_years_rows(self, last_x_years):
+        """
+        Returns the slice of the period rows that fall in the last x years.
+        """
+        count = self.recent_periods[last_x_years]
+
+        return slice(0, count) if self.newest_first else slice(-count, None)
+
+    def scale_max_count(self, max_non_positive_returns_count):
+        """
+        Scales a max_non_positive_returns_count given for 34 periods to the number of periods of the calendar.
+        """
+        if self.max_count_periods is None or max_non_positive_returns_count is None:
+            return max_non_positive_returns_count
+
+        return round((max_non_positive_returns_count/34)*self.max_count_periods)
+
+##########################################################################
+##########################################################################
+
+# Function 1: Rows of the price matrix for a list of dates
+
+def asof_rows(date_index, dates):
+    """
+    The function finds, for every date, the row of the last index date on or before it. It gives the same rows as calling date_index.asof on every date,
+    but resolves all the dates with a single binary search.
+
+    Args:
+
+        date_index (pandas DatetimeIndex): sorted dates of the price matrix
+
+        dates (list): dates to be resolved (strings in the format 'yyyy-mm-dd' or datetime objects)
+
+    Returns:
+
+        rows (numpy array): integer row positions into the price matrix
+    """
+    index_values = date_index.to_numpy(dtype='datetime64[ns]')
+    date_values = pd.to_datetime(pd.Index(dates)).to_numpy(dtype='datetime64[ns]')
+
+    rows = np.searchsorted(index_values, date_values, side='right') - 1
+
+    if len(rows) > 0 and rows.min() < 0:
+        raise KeyError(f"There are no prices on or before {pd.Timestamp(date_values[np.argmin(rows)]).date()}")
+
+    return rows
+
+##########################################################################
+##########################################################################
+
+# Function 2: Returns of every stock between pairs of rows
+
+def returns_between_rows(prices, start_rows, end_rows, returns_type, columns=None):
+    """
+    The function calculates the return percentage of every stock from each start row to the matching end row of the price matrix.
+
+    Args:
+
+        prices (numpy array): dates x stocks price matrix
+
+        start_rows (numpy array): row of the start of every period
+
+        end_rows (numpy array): row of the end of every period
+
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
+
+        columns (numpy array): positions of the stocks to calculate the returns for, None for all the stocks
+
+    Returns:
+
+        returns_matrix (numpy array): periods x stocks matrix of return percentages
+    """
+    if columns is None:
+        initial_prices = prices[start_rows]
+        final_prices = prices[end_rows]
+    else:
+        initial_prices = prices[np.ix_(start_rows, columns)]
+        final_prices = prices[np.ix_(end_rows, columns)]
+
+    if returns_type == 'SR':
+        return ((final_prices - initial_prices) / initial_prices) * 100
+    elif returns_type == 'LR':
+        return np.log(final_prices / initial_prices) * 100
+    else:
+        raise ValueError("Incorrect Argument for 'returns_type'. Has to be either 'SR' or 'LR'")
+
+##########################################################################
+##########################################################################
+
+# Function 3: Stock analysis statistics of every stock
+
+def stock_analysis_table(returns_periods_df, last_x_periods_df, daily_average_returns, daily_average_returns_last_x_years):
+    """
+    The function builds the stock analysis table that the filters of the stock selection functions work on, one column at a time over all the stocks.
+    The daily average returns are passed in as series over all the stocks (read from the price index) instead of being computed once per stock.
+
+    Args:
+
+        returns_periods_df (pandas dataframe): return percentage of every stock over every period (an optional 'Date Range' column is ignored)
+
+        last_x_periods_df (pandas dataframe): the rows of returns_periods_df that fall in the last x years
+
+        daily_average_returns (pandas series): mean daily return of every stock over all the data, indexed by the symbols
+
+        daily_average_returns_last_x_years (pandas series): mean daily return of every stock over the last x years before the buying date, indexed by the symbols
+
+    Returns:
+
+        stock_analysis_df (pandas dataframe): one row per stock with its counts, standard deviations and averages of the period returns and its daily average returns
+    """
+    returns = returns_periods_df.drop(columns='Date Range', errors='ignore')
+    last_x_returns = last_x_periods_df.drop(columns='Date Range', errors='ignore')
+
+    stock_analysis_df = pd.DataFrame({
+        'Stock Symbol': returns.columns,
+        'Daily Average Returns All Time': daily_average_returns[returns.columns].to_numpy(),
+        'Positive Returns Count': (returns > 0).sum().to_numpy(),
+        'Non-Positive Returns Count': (returns <= 0).sum().to_numpy(),
+        'Std Dev Returns': returns.std().to_numpy(),
+        'Average Returns All 3MP': returns.mean().to_numpy(),
+        'Daily Average Returns Last X Year': daily_average_returns_last_x_years[returns.columns].to_numpy(),
+        'Positive Last X Years Count': (last_x_returns > 0).sum().to_numpy(),
+        'Non-Positive Last X Years Count': (last_x_returns <= 0).sum().to_numpy(),
+        'Std Dev Last X Years': last_x_returns.std().to_numpy(),
+        'Average Last X Years 3MP': last_x_returns.mean().to_numpy(),
+    })
+
+    return stock_analysis_df
+
+##########################################################################
+##########################################################################
+
+# Function 4: Sort order of a column
+
+def sort_order(values, ascending=True):
+    """
+    The function returns the positions that sort the values, with NaNs last. Ties are ordered exactly as pandas sort_values orders them,
+    so taking the first rows gives the same stocks as sort_values(...).iloc[:n] did.
+
+    Args:
+
+        values (numpy array): values to be sorted
+
+        ascending (boolean): sort order
+
+    Returns:
+
+        order (numpy array): positions into values in sorted order
+    """
+    mask = np.isnan(values) if values.dtype.kind == 'f' else np.zeros(len(values), dtype=bool)
+
+    positions = np.arange(len(values))
+    non_nans = values[~mask]
+    non_nan_positions = positions[~mask]
+
+    if not ascending:
+        non_nans = non_nans[::-1]
+        non_nan_positions = non_nan_positions[::-1]
+
+    order = non_nan_positions[non_nans.argsort(kind='quicksort')]
+
+    if not ascending:
+        order = order[::-1]
+
+    return np.concatenate([order, np.flatnonzero(mask)])
+
+##########################################################################
+##########################################################################
+
+# Function 5: Ranked filter
+
+def ranked_filter(values, rows, k, ascending=True):
+    """
+    The function takes the k rows with the smallest (or largest) values, the operator behind every "sort and take the first 30" of the stock selection,
+    and returns the same rows in the same order as rows[sort_order(values[rows], ascending)[:k]]. When the k values are distinct and no other value ties
+    with the k-th one the result does not depend on the order of the ties, so the k rows are found with np.argpartition in linear time and only those k are sorted.
+    Otherwise (the counts of the fallbacks tie all the time) the ties are taken in the order of sort_order from the full sort.
+
+    Args:
+
+        values (numpy array): value of every stock
+
+        rows (numpy array): candidate rows into values
+
+        k (integer): number of rows to take
+
+        ascending (boolean): True to take the smallest values, False to take the largest
+
+    Returns:
+
+        ranked_rows (numpy array): at most k rows in sorted order
+    """
+    rows = np.asarray(rows)
+    candidate_values = values[rows]
+
+    if candidate_values.dtype.kind == 'f':
+        non_nan_positions = np.flatnonzero(~np.isnan(candidate_values))
+    else:
+        non_nan_positions = np.arange(len(rows))
+
+    if len(non_nan_positions) > k:
+        keys = candidate_values[non_nan_positions] if ascending else -candidate_values[non_nan_positions]
+
+        kth_key = keys[np.argpartition(keys, k - 1)[k - 1]]
+        positions = np.flatnonzero(keys <= kth_key)
+
+        if len(positions) == k:
+            positions = positions[np.argsort(keys[positions])]
+
+            if np.all(np.diff(keys[positions]) > 0):
+                return rows[non_nan_positions[positions]]
+
+    return rows[sort_order(candidate_values, ascending)[:k]]
+
+##########################################################################
+##########################################################################
+
+# Function 6: Smallest count that lets enough stocks through
+
+def count_threshold(counts, minimum):
+    """
+    The function finds the smallest i such that at least minimum stocks have a count of at most i, with one counting pass (np.bincount and a cumulative sum)
+    instead of trying i = 0, 1, 2, ... one at a time. If there are fewer stocks than minimum, the largest count is returned so that all of them pass.
+
+    Args:
+
+        counts (numpy array): non-negative integer count of every stock
+
+        minimum (integer): number of stocks that have to pass
+
+    Returns:
+
+        threshold (integer): the smallest count that lets at least minimum stocks through
+    """
+    if len(counts) == 0:
+        return 0
+
+    passing = np.cumsum(np.bincount(counts))
+
+    return int(min(np.searchsorted(passing, minimum), len(passing) - 1))
+
+##########################################################################
+##########################################################################
+
+# Function 7: Filter cascade of the stock selection
+
+def filter_cascade(stock_analysis_df, filters, max_non_positive_returns_count, survivor_counts=None):
+    """
+    The function applies the filters of the stock selection strategies to the stock analysis table with numpy masks over all the stocks.
+
+    filters = 4 (strategy 1 to 8): positive daily averages, no non-positive period in the last x years and at most max_non_positive_returns_count non-positive periods,
+    falling back to the 30 stocks with the fewest non-positive periods when fewer than 5 or more than 30 stocks pass.
+    filters = 3 (strategy 9 to 12): positive daily averages and no non-positive period in the last x years, with the same fallback on the last x years.
+    filters = 2 (strategy 13 to 16): the smallest count of non-positive periods in the last x years that lets at least 50 stocks through, then the 30 of them
+    with the highest daily average returns in the last x years.
+
+    Args:
+
+        stock_analysis_df (pandas dataframe): the table built by stock_analysis_table, or a dictionary with numpy arrays for the columns used by the filters
+
+        filters (integer): it can be 2, 3 or 4
+
+        max_non_positive_returns_count (integer): maximum number of non-positive periods for filters = 4
+
+        survivor_counts (dictionary): if given, the number of stocks left after every stage of the cascade is added to it
+
+    Returns:
+
+        selected_rows (numpy array): rows of the selected stocks in stock_analysis_df, in the order of the selection
+    """
+    daily_average_returns = np.asarray(stock_analysis_df['Daily Average Returns All Time'])
+    daily_average_returns_last_x_years = np.asarray(stock_analysis_df['Daily Average Returns Last X Year'])
+    non_positive_count = np.asarray(stock_analysis_df['Non-Positive Returns Count'])
+    non_positive_last_x_years_count = np.asarray(stock_analysis_df['Non-Positive Last X Years Count'])
+
+    positive_rows = np.flatnonzero((daily_average_returns > 0) & (daily_average_returns_last_x_years > 0))
+
+    stages = {}
+
+    if filters == 4:
+
+        no_loss_rows = positive_rows[non_positive_last_x_years_count[positive_rows] == 0]
+
+        selected_rows = no_loss_rows[non_positive_count[no_loss_rows] <= max_non_positive_returns_count]
+
+        stages = {'Positive Daily Averages': len(positive_rows), 'No Non-Positive Last X Years': len(no_loss_rows), 'Max Non-Positive Count': len(selected_rows)}
+
+        if len(selected_rows) < 5 or len(selected_rows) > 30:
+
+            selected_rows = ranked_filter(non_positive_count, no_loss_rows, 30)
+
+            if len(selected_rows) < 5:
+
+                selected_rows = ranked_filter(non_positive_last_x_years_count, positive_rows, 30)
+
+    elif filters == 3:
+
+        selected_rows = positive_rows[non_positive_last_x_years_count[positive_rows] == 0]
+
+        stages = {'Positive Daily Averages': len(positive_rows), 'No Non-Positive Last X Years': len(selected_rows)}
+
+        if len(selected_rows) < 5 or len(selected_rows) > 30:
+
+            selected_rows = ranked_filter(non_positive_last_x_years_count, positive_rows, 30)
+
+    elif filters == 2:
+
+        # The smallest count that lets at least 50 stocks through (or all of them if there are fewer than 50)
+        threshold = count_threshold(non_positive_last_x_years_count, 50)
+
+        candidate_rows = np.flatnonzero(non_positive_last_x_years_count <= threshold)
+
+        stages = {'Non-Positive Last X Years Threshold': len(candidate_rows)}
+
+        selected_rows = ranked_filter(daily_average_returns_last_x_years, candidate_rows, 30, ascending=False)
+
+    else:
+        raise ValueError("Incorrect Argument for 'filters'. Has to be either 2, 3 or 4")
+
+    if survivor_counts is not None:
+        survivor_counts.update(stages)
+        survivor_counts['Selected'] = len(selected_rows)
+
+    return selected_rows
+
+##########################################################################
+##########################################################################
+
+# Function 8: Returns of every stock over the periods of many buying dates
+
+def period_return_tensor(all_stocks_df, start_dates, end_dates, returns_type, columns=None):
+    """
+    The function calculates the return percentage of every stock over the periods of many buying dates at once. Consecutive buying dates share most of their periods,
+    so every distinct period of the grid is computed once and gathered into a buying dates x periods x stocks tensor.
+    Buying dates with fewer periods are padded with NaN at the end, which the counts, sums and means with NaN skipping ignore.
+
+    Args:
+
+        all_stocks_df (pandas dataframe): historical stock prices with a sorted date index and the symbols as the columns
+
+        start_dates (list of numpy arrays): start dates of the periods of every buying date
+
+        end_dates (list of numpy arrays): end dates of the periods of every buying date
+
+        returns_type (string): it can be either 'LR' (log returns) or 'SR' (simple returns)
+
+        columns (numpy array): positions of the stocks to calculate the returns for, None for all the stocks
+
+    Returns:
+
+        returns_tensor (numpy array): buying dates x periods x stocks tensor of return percentages
+
+        period_counts (numpy array): number of periods of every buying date
+    """
+    period_counts = np.array([len(dates) for dates in start_dates], dtype='int64')
+    max_periods = int(period_counts.max()) if len(period_counts) > 0 else 0
+
+    # Resolve every date of the grid to its row once
+    all_dates = np.concatenate(list(start_dates) + list(end_dates)).astype('datetime64[ns]')
+    unique_dates, date_positions = np.unique(all_dates, return_inverse=True)
+    unique_rows = asof_rows(all_stocks_df.index, unique_dates)
+
+    start_rows = unique_rows[date_positions[:period_counts.sum()]]
+    end_rows = unique_rows[date_positions[period_counts.sum():]]
+
+    # Compute every distinct (start row, end row) period once
+    n_rows = len(all_stocks_df.index)
+    unique_periods, period_positions = np.unique(start_rows * n_rows + end_rows, return_inverse=True)
+
+    unique_returns = returns_between_rows(all_stocks_df.to_numpy(), unique_periods // n_rows, unique_periods % n_rows, returns_type, columns)
+
+    # The last row stays NaN and is used for the padding
+    grid_returns = np.full((len(unique_periods) + 1, unique_returns.shape[1]), np.nan)
+    grid_returns[:-1] = unique_returns
+
+    grid_positions = np.full((len(period_counts), max_periods), len(unique_periods), dtype='int64')
+    grid_positions[np.arange(max_periods) < period_counts[:, None]] = period_positions
+
+    return grid_returns[grid_positions], period_counts
+
+##########################################################################
+##########################################################################
+
+# Function 9: Stocks that need the period statistics
+
+def pushdown_columns(daily_average_returns, daily_average_returns_last_x_years, filters):
+    """
+    The function returns the stocks that can still be selected after the cheap filters on the daily average returns, which are read in constant time per stock
+    from the price index. The filters 3 and 4 drop every stock whose daily average returns are not positive, so the period returns and their statistics
+    only have to be computed for the stocks returned here. The filters 2 use the period counts of all the stocks, so all of them are returned.
+
+    Args:
+
+        daily_average_returns (numpy array): mean daily return of every stock over all the data
+
+        daily_average_returns_last_x_years (numpy array): mean daily return of every stock over the last x years, or a buying dates x stocks array for many buying dates
+
+        filters (integer): it can be 2, 3 or 4
+
+    Returns:
+
+        columns (numpy array): positions of the stocks that need the period statistics, in their original order
+    """
+    if filters not in (3, 4):
+        return np.arange(len(daily_average_returns))
+
+    positive = (daily_average_returns > 0) & (daily_average_returns_last_x_years > 0)
+
+    if positive.ndim > 1:
+        positive = positive.any(axis=0)
+
+    return np.flatnonzero(positive)
@@ -0,0 +1,122 @@
+##########################################################################
+##########################################################################
+
+# Importing required libraries, modules, etc.
+
+import os
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+##########################################################################
+##########################################################################
+
+DEFAULT_HOLIDAYS_PATH = '../data/nse_holidays.csv'
+
+##########################################################################
+##########################################################################
+
+# Class 1: Trading calendar
+
+class TradingCalendar:
+    """
+    Trading sessions of an exchange: weekdays that are not listed as holidays.
+    For every calendar day between first_date and last_date the last session on or before it is precomputed,
+    so that looking it up is a single array index. Dates outside the range fall back to numpy's business day functions.
+
+    Args:
+
+        holidays (list): holiday dates (strings in the format 'yyyy-mm-dd', datetime objects or numpy datetime64)
+
+        first_date (string): first day of the precomputed range in the format 'yyyy-mm-dd'
+
+        last_date (string): last day of the precomputed range in the format 'yyyy-mm-dd'
+    """
+
+    def __init__(self, holidays=(), first_date='2000-01-01', last_date='2035-12-31'):
+
+        self.holidays = np.unique(pd.to_datetime(list(holidays)).values.astype('datetime64[D]'))
+
+        self.first_date = np.datetime64(first_date, 'D')
+        self.last_date = np.datetime64(last_date, 'D')
+
+        days = np.arange(self.first_date, self.last_date + 1, dtype='datetime64[D]')
+
+        self.session_mask = np.is_busday(days, holidays=self.holidays)
+
+        # Position of the last session on or before every day of the range (-1 before the first session)
+        positions = np.where(self.session_mask, np.arange(len(days)), -1)
+        self.last_session_position = np.maximum.accumulate(positions)
+
+    def _day_position(self, date):
+        return int((np.datetime64(pd.Timestamp(date).date(), 'D') - self.first_date).astype(np.int64))
+
+    def is_session(self, date):
+        """
+        Returns True if the exchange is open on the date.
+        """
+        position = self._day_position(date)
+        if 0 <= position < len(self.session_mask):
+            return bool(self.session_mask[position])
+        return bool(np.is_busday(np.datetime64(pd.Timestamp(date).date(), 'D'), holidays=self.holidays))
+
+    def last_session_on_or_before(self, date):
+        """
+        Returns the last session on or before the date as a pandas Timestamp.
+        """
+        position = self._day_position(date)
+        if 0 <= position < len(self.last_session_position) and self.last_session_position[position] >= 0:
+            return pd.Timestamp(self.first_date + self.last_session_position[position])
+        return pd.Timestamp(np.busday_offset(np.datetime64(pd.Timestamp(date).date(), 'D'), 0, roll='backward', holidays=self.holidays))
+
+    def last_session_before(self, date):
+        """
+        Returns the last session strictly before the date as a pandas Timestamp.
+        This is the last date whose closing price can be known on the morning of the date.
+        """
+        return self.last_session_on_or_before(pd.Timestamp(date) - pd.Timedelta(days=1))
+
+##########################################################################
+##########################################################################
+
+# Function 1: Load a holiday list
+
+def load_holidays(file_path=DEFAULT_HOLIDAYS_PATH):
+    """
+    The function loads exchange holidays from a csv with a 'Date' column (any format that pandas can parse).
+    A missing file means that no holidays are known and only weekends are treated as closed.
+
+    Args:
+
+        file_path (string): path of the holiday csv
+
+    Returns:
+
+        holidays (list): list of pandas Timestamps
+    """
+    if not os.path.exists(file_path):
+        return []
+
+    holidays_df = pd.read_csv(file_path)
+
+    return list(pd.to_datetime(holidays_df['Date']))
+
+##########################################################################
+##########################################################################
+
+# Function 2: NSE trading calendar
+
+@lru_cache(maxsize=None)
+def get_nse_calendar(holidays_path=DEFAULT_HOLIDAYS_PATH):
+    """
+    The function builds the NSE trading calendar (Monday to Friday minus the holidays in the holiday csv) once and reuses it.
+
+    Args:
+
+        holidays_path (string): path of the NSE holiday csv
+
+    Returns:
+
+        calendar (TradingCalendar): the NSE trading calendar
+    """
+    return TradingCalendar(load_holidays(holidays_path))
@@ -3,7 +3,8 @@
 
 # Importing required libraries, modules, etc.
 
-from optimization_functions import maximize_returns, maximize_sharpe_ratio, minimize_variance
+from optimization_functions import maximize_returns, maximize_sharpe_ratio, minimize_variance, cardinality_constrained_allocation
+from efficient_frontier import get_efficient_frontier
 
 ##########################################################################
 ##########################################################################
@@ -28,57 +29,22 @@ def weight_allocation_1(selected_stocks):
 
 # Weight Allocation Strategy 2
 
-def weight_allocation_2(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
+def weight_allocation_2(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, max_stocks=8, solver_state=None, race=None):
 
-    num_stocks = len(selected_stocks)
-
-    if num_stocks > 8:
-        best_weights, best_method = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.25)
-
-        stock_weights = list(zip(selected_stocks, best_weights))
-
-        # Sort the pairs based on weights, in descending order
-        sorted_stock_weights = sorted(stock_weights, key=lambda x: x[1], reverse=True)
-
-        # Select the top 8 stocks
-        selected_stocks = [stock for stock, weight in sorted_stock_weights[:8]]
-
-        best_weights, best_method = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.25)
-
-    else:
-        best_weights, best_method = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.25)
-
-    portfolio = dict(zip(selected_stocks, best_weights))
+    # At most max_stocks stocks, the largest weights of the solve on all the selected stocks
+    portfolio, best_method = cardinality_constrained_allocation(maximize_returns, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.25, max_stocks=max_stocks, solver_state=solver_state, race=race)
 
     return portfolio, best_method
 
-
 ##########################################################################
 ##########################################################################
 
 # Weight Allocation Strategy 3
 
-def weight_allocation_3(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
-
-    num_stocks = len(selected_stocks)
-
-    if num_stocks > 8:
-        best_weights, best_method = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.4)
-
-        stock_weights = list(zip(selected_stocks, best_weights))
-
-        # Sort the pairs based on weights, in descending order
-        sorted_stock_weights = sorted(stock_weights, key=lambda x: x[1], reverse=True)
-
-        # Select the top 8 stocks
-        selected_stocks = [stock for stock, weight in sorted_stock_weights[:8]]
+def weight_allocation_3(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, max_stocks=8, solver_state=None, race=None):
 
-        best_weights, best_method = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.4)
-
-    else:
-        best_weights, best_method = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.4)
-
-    portfolio = dict(zip(selected_stocks, best_weights))
+    # At most max_stocks stocks, the largest weights of the solve on all the selected stocks
+    portfolio, best_method = cardinality_constrained_allocation(maximize_returns, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, 0.4, max_stocks=max_stocks, solver_state=solver_state, race=race)
 
     return portfolio, best_method
 
@@ -87,27 +53,10 @@ def weight_allocation_3(selected_stocks, all_stocks_df, returns_type, buying_dat
 
 # Weight Allocation Strategy 4
 
-def weight_allocation_4(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df):
-    
-    num_stocks = len(selected_stocks)
-
-    if num_stocks > 8:
-        best_weights, best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25, govt_bond_df)
-
-        stock_weights = list(zip(selected_stocks, best_weights))
-
-        # Sort the pairs based on weights, in descending order
-        sorted_stock_weights = sorted(stock_weights, key=lambda x: x[1], reverse=True)
+def weight_allocation_4(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df, max_stocks=8, solver_state=None, race=None):
 
-        # Select the top 8 stocks
-        selected_stocks = [stock for stock, weight in sorted_stock_weights[:8]]
-
-        best_weights, best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25, govt_bond_df)
-
-    else:
-        best_weights, best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25, govt_bond_df)
-
-    portfolio = dict(zip(selected_stocks, best_weights))
+    # At most max_stocks stocks, the largest weights of the solve on all the selected stocks
+    portfolio, best_method = cardinality_constrained_allocation(maximize_sharpe_ratio, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25, govt_bond_df, max_stocks=max_stocks, solver_state=solver_state, race=race)
 
     return portfolio, best_method
 
@@ -116,57 +65,22 @@ def weight_allocation_4(selected_stocks, all_stocks_df, returns_type, buying_dat
 
 # Weight Allocation Strategy 5
 
-def weight_allocation_5(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df):
-    
-    num_stocks = len(selected_stocks)
-
-    if num_stocks > 8:
-        best_weights, best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, govt_bond_df)
-
-        stock_weights = list(zip(selected_stocks, best_weights))
+def weight_allocation_5(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df, max_stocks=8, solver_state=None, race=None):
 
-        # Sort the pairs based on weights, in descending order
-        sorted_stock_weights = sorted(stock_weights, key=lambda x: x[1], reverse=True)
-
-        # Select the top 8 stocks
-        selected_stocks = [stock for stock, weight in sorted_stock_weights[:8]]
-
-        best_weights, best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, govt_bond_df)
-
-    else:
-        best_weights, best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, govt_bond_df)
-
-    portfolio = dict(zip(selected_stocks, best_weights))
+    # At most max_stocks stocks, the largest weights of the solve on all the selected stocks
+    portfolio, best_method = cardinality_constrained_allocation(maximize_sharpe_ratio, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, govt_bond_df, max_stocks=max_stocks, solver_state=solver_state, race=race)
 
     return portfolio, best_method
-    
 
 ##########################################################################
 ##########################################################################
 
 # Weight Allocation Strategy 6
 
-def weight_allocation_6(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
-    
-    num_stocks = len(selected_stocks)
-
-    if num_stocks > 8:
-        best_weights, best_method = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.25)
-
-        stock_weights = list(zip(selected_stocks, best_weights))
-
-        # Sort the pairs based on weights, in descending order
-        sorted_stock_weights = sorted(stock_weights, key=lambda x: x[1], reverse=True)
-
-        # Select the top 8 stocks
-        selected_stocks = [stock for stock, weight in sorted_stock_weights[:8]]
+def weight_allocation_6(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, max_stocks=8, solver_state=None, race=None):
 
-        best_weights, best_method = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.25)
-
-    else:
-        best_weights, best_method = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.25)
-
-    portfolio = dict(zip(selected_stocks, best_weights))
+    # At most max_stocks stocks, the largest weights of the solve on all the selected stocks
+    portfolio, best_method = cardinality_constrained_allocation(minimize_variance, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.25, max_stocks=max_stocks, solver_state=solver_state, race=race)
 
     return portfolio, best_method
 
@@ -175,27 +89,10 @@ def weight_allocation_6(selected_stocks, all_stocks_df, returns_type, buying_dat
 
 # Weight Allocation Strategy 7
 
-def weight_allocation_7(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date):
-    
-    num_stocks = len(selected_stocks)
-
-    if num_stocks > 8:
-        best_weights, best_method = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.4)
-
-        stock_weights = list(zip(selected_stocks, best_weights))
-
-        # Sort the pairs based on weights, in descending order
-        sorted_stock_weights = sorted(stock_weights, key=lambda x: x[1], reverse=True)
+def weight_allocation_7(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, max_stocks=8, solver_state=None, race=None):
 
-        # Select the top 8 stocks
-        selected_stocks = [stock for stock, weight in sorted_stock_weights[:8]]
-
-        best_weights, best_method = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.4)
-
-    else:
-        best_weights, best_method = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.4)
-
-    portfolio = dict(zip(selected_stocks, best_weights))
+    # At most max_stocks stocks, the largest weights of the solve on all the selected stocks
+    portfolio, best_method = cardinality_constrained_allocation(minimize_variance, selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.4, max_stocks=max_stocks, solver_state=solver_state, race=race)
 
     return portfolio, best_method
 
@@ -204,13 +101,16 @@ def weight_allocation_7(selected_stocks, all_stocks_df, returns_type, buying_dat
 
 # Weight Allocation Strategy 8
 
-def weight_allocation_8(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df):
+def weight_allocation_8(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df, solver_state=None, race=None):
 
-    min_var_weights, best_method_1 = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.2, 0.25)
+    # Both portfolios are read from the same efficient frontier of the selected stocks, and raced against the methods of the race if one is given
+    efficient_frontier = get_efficient_frontier(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25)
+
+    min_var_weights, best_method_1 = efficient_frontier.minimize_variance(0.2, race=race)
 
     min_var_portfolio = dict(zip(selected_stocks, min_var_weights))
 
-    max_ret_weights, best_method_2 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.2, 0.25)
+    max_ret_weights, best_method_2 = efficient_frontier.maximize_returns(0.2, race=race)
 
     max_ret_portfolio = dict(zip(selected_stocks, max_ret_weights))
 
@@ -238,7 +138,10 @@ def weight_allocation_8(selected_stocks, all_stocks_df, returns_type, buying_dat
         # Increase the number of stocks to pick
         num_to_pick += 1
     
-    best_weights, best_method_3 = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25, govt_bond_df)
+    # The solve on the union starts from its solution on the previous buying date
+    warm_start = None if solver_state is None else solver_state.setdefault('maximize_sharpe_ratio', {})
+
+    best_weights, best_method_3 = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25, govt_bond_df, warm_start=warm_start, race=race)
 
     portfolio = dict(zip(selected_stocks, best_weights))
 
@@ -249,13 +152,16 @@ def weight_allocation_8(selected_stocks, all_stocks_df, returns_type, buying_dat
 
 # Weight Allocation Strategy 9
 
-def weight_allocation_9(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df):
+def weight_allocation_9(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df, solver_state=None, race=None):
 
-    min_var_weights, best_method_1 = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.2, 0.4)
+    # Both portfolios are read from the same efficient frontier of the selected stocks, and raced against the methods of the race if one is given
+    efficient_frontier = get_efficient_frontier(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4)
+
+    min_var_weights, best_method_1 = efficient_frontier.minimize_variance(0.2, race=race)
 
     min_var_portfolio = dict(zip(selected_stocks, min_var_weights))
 
-    max_ret_weights, best_method_2 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.2, 0.4)
+    max_ret_weights, best_method_2 = efficient_frontier.maximize_returns(0.2, race=race)
 
     max_ret_portfolio = dict(zip(selected_stocks, max_ret_weights))
 
@@ -283,7 +189,10 @@ def weight_allocation_9(selected_stocks, all_stocks_df, returns_type, buying_dat
         # Increase the number of stocks to pick
         num_to_pick += 1
     
-    best_weights, best_method_3 = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, govt_bond_df)
+    # The solve on the union starts from its solution on the previous buying date
+    warm_start = None if solver_state is None else solver_state.setdefault('maximize_sharpe_ratio', {})
+
+    best_weights, best_method_3 = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, govt_bond_df, warm_start=warm_start, race=race)
 
     portfolio = dict(zip(selected_stocks, best_weights))
 
@@ -294,17 +203,20 @@ def weight_allocation_9(selected_stocks, all_stocks_df, returns_type, buying_dat
 
 # Weight Allocation Strategy 10
 
-def weight_allocation_10(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df):
+def weight_allocation_10(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df, solver_state=None, race=None):
 
-    max_shr_weights, best_method_1 = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4, govt_bond_df)
+    # The three portfolios are read from the same efficient frontier of the selected stocks, and raced against the methods of the race if one is given
+    efficient_frontier = get_efficient_frontier(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.4)
+
+    max_shr_weights, best_method_1 = efficient_frontier.maximize_sharpe_ratio(govt_bond_df, race=race)
 
     max_shr_portfolio = dict(zip(selected_stocks, max_shr_weights))
 
-    min_var_weights, best_method_2 = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.4)
+    min_var_weights, best_method_2 = efficient_frontier.minimize_variance(0.3, race=race)
 
     min_var_portfolio = dict(zip(selected_stocks, min_var_weights))
 
-    max_ret_weights, best_method_3 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.4)
+    max_ret_weights, best_method_3 = efficient_frontier.maximize_returns(0.3, race=race)
 
     max_ret_portfolio = dict(zip(selected_stocks, max_ret_weights))
 
@@ -324,7 +236,10 @@ def weight_allocation_10(selected_stocks, all_stocks_df, returns_type, buying_da
 
     selected_stocks = list(high_weight_stocks)
 
-    best_weights, best_method_4 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.2)
+    # The solve on the high weight stocks starts from its solution on the previous buying date
+    warm_start = None if solver_state is None else solver_state.setdefault('maximize_returns', {})
+
+    best_weights, best_method_4 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.2, warm_start=warm_start, race=race)
 
     portfolio = dict(zip(selected_stocks, best_weights))
 
@@ -335,17 +250,20 @@ def weight_allocation_10(selected_stocks, all_stocks_df, returns_type, buying_da
 
 # Weight Allocation Strategy 11
 
-def weight_allocation_11(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df):
+def weight_allocation_11(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, govt_bond_df, solver_state=None, race=None):
 
-    max_shr_weights, best_method_1 = maximize_sharpe_ratio(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25, govt_bond_df)
+    # The three portfolios are read from the same efficient frontier of the selected stocks, and raced against the methods of the race if one is given
+    efficient_frontier = get_efficient_frontier(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.25)
+
+    max_shr_weights, best_method_1 = efficient_frontier.maximize_sharpe_ratio(govt_bond_df, race=race)
 
     max_shr_portfolio = dict(zip(selected_stocks, max_shr_weights))
 
-    min_var_weights, best_method_2 = minimize_variance(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.25)
+    min_var_weights, best_method_2 = efficient_frontier.minimize_variance(0.3, race=race)
 
     min_var_portfolio = dict(zip(selected_stocks, min_var_weights))
 
-    max_ret_weights, best_method_3 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.25)
+    max_ret_weights, best_method_3 = efficient_frontier.maximize_returns(0.3, race=race)
 
     max_ret_portfolio = dict(zip(selected_stocks, max_ret_weights))
 
@@ -365,7 +283,10 @@ def weight_allocation_11(selected_stocks, all_stocks_df, returns_type, buying_da
 
     selected_stocks = list(high_weight_stocks)
 
-    best_weights, best_method_4 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.2)
+    # The solve on the high weight stocks starts from its solution on the previous buying date
+    warm_start = None if solver_state is None else solver_state.setdefault('maximize_returns', {})
+
+    best_weights, best_method_4 = maximize_returns(selected_stocks, all_stocks_df, returns_type, buying_date_minus_1_year, buying_date, 0.3, 0.2, warm_start=warm_start, race=race)
 
     portfolio = dict(zip(selected_stocks, best_weights))
 
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from batch_solver import max_return_batch, solve_problems_batch, stack_moments
+from optimization_functions import max_return_weights, maximize_sharpe_ratio_qp, minimize_variance_qp, optimization_problem
+from optimizer_race import constraint_violation
+
+
+def random_moments(num_stocks, seed):
+    rng = np.random.default_rng(seed)
+    daily_returns = rng.normal(rng.normal(0.0008, 0.0005, num_stocks), 0.015, size=(250, num_stocks))
+    return daily_returns.mean(axis=0), np.cov(daily_returns, rowvar=False)
+
+
+def random_problems(objective, seed, num_problems=20):
+    rng = np.random.default_rng(seed)
+    problems = []
+
+    for problem_seed in range(num_problems):
+        num_stocks = int(rng.integers(5, 25))
+        weightage_no_more_than = max(float(rng.choice([0.25, 0.3, 0.4])), 1 / num_stocks)
+        average_returns, covariance_matrix = random_moments(num_stocks, seed * 100 + problem_seed)
+
+        if objective == 'minimize_variance':
+            # A return floor between the one of the equal weights and the highest one under the caps
+            highest_return = max_return_weights(average_returns, weightage_no_more_than) @ average_returns
+            bound = (1 + average_returns.mean() + rng.uniform(0, 0.8) * (highest_return - average_returns.mean())) ** 365 - 1
+        else:
+            bound = float(rng.uniform(0.04, 0.08))
+
+        problems.append((objective, average_returns, covariance_matrix, bound, weightage_no_more_than, 0.0001))
+
+    return problems
+
+
+def test_max_return_batch_matches_max_return_weights():
+    problems = random_problems('minimize_variance', 0)
+    average_returns, covariance_matrices, mask = stack_moments([problem[1:3] for problem in problems])
+    caps = np.array([problem[4] for problem in problems])
+
+    highest_returns = max_return_batch(average_returns, caps, mask)
+
+    for b, problem in enumerate(problems):
+        assert highest_returns[b] == pytest.approx(max_return_weights(problem[1], problem[4]) @ problem[1], rel=1e-12)
+
+
+def test_minimize_variance_batch_matches_minimize_variance_qp():
+    problems = random_problems('minimize_variance', 1)
+
+    # A return floor above the highest return under the caps cannot be met
+    average_returns, covariance_matrix = random_moments(8, 7)
+    problems.insert(3, ('minimize_variance', average_returns, covariance_matrix, 5.0, 0.3, 0.0001))
+
+    weights, infos = solve_problems_batch(problems)
+
+    assert not infos[3]['feasible'] and not infos[3]['converged']
+    assert np.isnan(weights[3]).all() and len(weights[3]) == 8
+
+    for problem, problem_weights, info in zip(problems[:3] + problems[4:], weights[:3] + weights[4:], infos[:3] + infos[4:]):
+        objective_function = optimization_problem(*problem)[0]
+        reference_weights = minimize_variance_qp(*problem[1:])
+
+        assert info['feasible'] and info['converged']
+        assert len(problem_weights) == len(problem[1])
+        assert constraint_violation(problem, problem_weights) <= 1e-5
+        assert objective_function(problem_weights) == pytest.approx(objective_function(reference_weights), rel=1e-5)
+
+
+def test_maximize_sharpe_ratio_batch_matches_maximize_sharpe_ratio_qp():
+    problems = random_problems('maximize_sharpe_ratio', 2)
+
+    # No portfolio beats a risk free rate above the return of every stock
+    average_returns, covariance_matrix = random_moments(8, 7)
+    problems.insert(5, ('maximize_sharpe_ratio', average_returns, covariance_matrix, 10.0, 0.3, 0.0001))
+
+    weights, infos = solve_problems_batch(problems)
+
+    for problem, problem_weights, info in zip(problems, weights, infos):
+        reference_weights = maximize_sharpe_ratio_qp(*problem[1:5])
+
+        assert len(problem_weights) == len(problem[1])
+
+        if reference_weights is None:
+            assert not info['feasible'] and np.isnan(problem_weights).all()
+            continue
+
+        objective_function = optimization_problem(*problem)[0]
+
+        assert info['feasible'] and info['converged']
+        assert constraint_violation(problem, problem_weights) <= 1e-6
+        assert objective_function(problem_weights) == pytest.approx(objective_function(reference_weights), rel=1e-6)
+
+    assert not infos[5]['feasible']
+
+
+def test_maximize_returns_problems_are_not_batched():
+    average_returns, covariance_matrix = random_moments(5, 0)
+
+    with pytest.raises(ValueError):
+        solve_problems_batch([('maximize_returns', average_returns, covariance_matrix, 0.25, 0.3, 0.01)])
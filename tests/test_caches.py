@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from efficient_frontier import get_efficient_frontier
+from moment_cache import get_window_moments
+from price_index import get_price_index, price_matrix_key
+from price_store import load_price_store, save_price_store
+
+
+def random_prices(seed, columns=('A', 'B', 'C', 'D')):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.001 * (1 + np.arange(len(columns))), 0.01, size=(300, len(columns)))
+    return pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=pd.date_range('2021-01-01', periods=300), columns=list(columns))
+
+
+def test_frame_with_same_shape_dates_and_end_symbols_misses_the_caches():
+    first_df = random_prices(0)
+    second_df = random_prices(1)
+
+    first_moments = get_window_moments(first_df, 'SR', '2021-03-01', '2021-10-01')
+    second_moments = get_window_moments(second_df, 'SR', '2021-03-01', '2021-10-01')
+
+    assert second_moments is not first_moments
+    np.testing.assert_allclose(second_moments.average_returns, second_df.loc['2021-02-28':'2021-09-30'].pct_change().iloc[1:].mean().to_numpy())
+
+    first_frontier = get_efficient_frontier(['A', 'B', 'C'], first_df, 'SR', '2021-03-01', '2021-10-01', 0.5)
+    second_frontier = get_efficient_frontier(['A', 'B', 'C'], second_df, 'SR', '2021-03-01', '2021-10-01', 0.5)
+
+    assert second_frontier is not first_frontier
+
+
+def test_frame_freed_and_rebuilt_gets_its_own_statistics():
+    for seed in range(20):
+        prices_df = random_prices(seed)
+        np.testing.assert_allclose(get_price_index(prices_df).mean_daily_returns().to_numpy(), prices_df.pct_change().mean().to_numpy())
+
+
+def test_column_selections_and_in_place_changes_miss_the_caches():
+    prices_df = random_prices(2, columns=('A', 'B', 'C', 'X'))
+    prices_df['X'] = 100.0
+    prices_df.attrs['data_version'] = 'v1'
+
+    with_b = get_window_moments(prices_df[['A', 'B', 'C']], 'SR', '2021-03-01', '2021-10-01')
+    with_x = get_window_moments(prices_df[['A', 'X', 'C']], 'SR', '2021-03-01', '2021-10-01')
+
+    assert with_x.average_returns[with_x.positions['X']] == 0.0
+    assert with_b.average_returns[with_b.positions['B']] != 0.0
+
+    before = get_price_index(prices_df).mean_daily_returns()['A']
+    prices_df.iloc[100:, 0] *= 2
+    after = get_price_index(prices_df).mean_daily_returns()['A']
+
+    assert after != before
+
+
+def test_store_frames_share_the_caches_and_other_frames_are_not_keyed(tmp_path):
+    save_price_store(random_prices(3), str(tmp_path))
+    store_df = load_price_store(str(tmp_path))
+
+    assert get_price_index(store_df) is get_price_index(load_price_store(str(tmp_path)))
+    assert get_window_moments(store_df, 'SR', '2021-03-01', '2021-10-01') is get_window_moments(store_df, 'SR', '2021-03-01', '2021-10-01')
+    assert get_efficient_frontier(['A', 'B'], store_df, 'SR', '2021-03-01', '2021-10-01', 0.6) is get_efficient_frontier(['A', 'B'], store_df, 'SR', '2021-03-01', '2021-10-01', 0.6)
+
+    # A copy keeps the attrs of the store frame but not its memory map
+    doubled_df = store_df * 2
+    assert doubled_df.attrs.get('data_version') == store_df.attrs['data_version']
+    assert price_matrix_key(doubled_df) is None
+    assert price_matrix_key(random_prices(3)) is None
+    assert get_price_index(doubled_df) is not get_price_index(doubled_df)
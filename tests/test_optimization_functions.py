@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+from optimization_functions import optimization_problem, minimize_variance, minimize_variance_qp, maximize_sharpe_ratio, maximize_sharpe_ratio_qp
+from optimizer_race import constraint_violation
+from risk_free_rate import RiskFreeRate
+
+
+def random_moments(num_stocks, seed):
+    rng = np.random.default_rng(seed)
+    daily_returns = rng.normal(rng.normal(0.0008, 0.0005, num_stocks), 0.015, size=(250, num_stocks))
+    return daily_returns.mean(axis=0), np.cov(daily_returns, rowvar=False)
+
+
+def slsqp_reference(problem):
+    objective_function, objective_gradient, constraints = optimization_problem(*problem)
+    num_stocks = len(problem[1])
+    result = minimize(objective_function, np.full(num_stocks, 1 / num_stocks), method='SLSQP', jac=objective_gradient, bounds=[(0, 1)] * num_stocks,
+                      constraints=constraints, options={'ftol': 1e-15, 'maxiter': 1000})
+    return result.x
+
+
+def test_minimize_variance_qp_matches_slsqp():
+    rng = np.random.default_rng(0)
+
+    for seed in range(20):
+        num_stocks = int(rng.integers(5, 30))
+        weightage_no_more_than = float(rng.choice([0.25, 0.3, 0.4]))
+        average_returns, covariance_matrix = random_moments(num_stocks, seed)
+
+        # A return floor between the one of the equal weights and the highest one under the caps
+        highest_return = np.sort(average_returns)[::-1][:int(1 / weightage_no_more_than)].sum() * weightage_no_more_than
+        daily_floor = average_returns.mean() + rng.uniform(0, 0.8) * (highest_return - average_returns.mean())
+        minimum_ann_ret = (1 + daily_floor) ** 365 - 1
+
+        problem = ('minimize_variance', average_returns, covariance_matrix, minimum_ann_ret, weightage_no_more_than, 0.0001)
+        objective_function, objective_gradient, constraints = optimization_problem(*problem)
+
+        weights = minimize_variance_qp(average_returns, covariance_matrix, minimum_ann_ret, weightage_no_more_than, 0.0001)
+        reference_weights = slsqp_reference(problem)
+
+        assert constraint_violation(problem, weights) <= 1e-9
+        np.testing.assert_allclose(objective_function(weights), objective_function(reference_weights), rtol=1e-6)
+
+
+def random_stock_prices(num_stocks=12, seed=1):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2022-01-01', '2023-12-31')
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0008, 0.015, size=(len(dates), num_stocks)), axis=0))
+    return pd.DataFrame(prices, index=dates, columns=[f'S{i}.NS' for i in range(num_stocks)])
+
+
+def test_minimize_variance_uses_slsqp_unless_the_active_set_backend_is_picked():
+    all_stocks_df = random_stock_prices()
+    selected_stocks = list(all_stocks_df.columns)
+
+    weights, best_method = minimize_variance(selected_stocks, all_stocks_df, 'SR', '2023-01-01', '2024-01-01', 0.0, 0.25)
+    active_set_weights, active_set_method = minimize_variance(selected_stocks, all_stocks_df, 'SR', '2023-01-01', '2024-01-01', 0.0, 0.25, backend='active_set')
+
+    assert best_method == 'slsqp'
+    assert active_set_method == 'active_set'
+    assert abs(sum(weights) - 1) < 1e-3 and abs(sum(active_set_weights) - 1) < 1e-3
+
+
+def test_maximize_sharpe_ratio_qp_matches_slsqp():
+    rng = np.random.default_rng(2)
+
+    for seed in range(20):
+        num_stocks = int(rng.integers(5, 30))
+        weightage_no_more_than = max(float(rng.choice([0.1, 0.25, 0.3, 0.4])), 1 / num_stocks)
+        average_returns, covariance_matrix = random_moments(num_stocks, seed)
+        risk_free_rate = float(rng.uniform(0.04, 0.08))
+
+        problem = ('maximize_sharpe_ratio', average_returns, covariance_matrix, risk_free_rate, weightage_no_more_than, 0.0001)
+        objective_function, objective_gradient, constraints = optimization_problem(*problem)
+
+        weights = maximize_sharpe_ratio_qp(average_returns, covariance_matrix, risk_free_rate, weightage_no_more_than)
+
+        # The quadratic programs sum the weights up to exactly 1, so the reference has no tolerance on the sum
+        reference_weights = slsqp_reference(problem[:5] + (0.0,))
+
+        assert constraint_violation(problem, weights) <= 1e-9
+        np.testing.assert_allclose(objective_function(weights), objective_function(reference_weights), rtol=1e-8)
+
+
+def test_maximize_sharpe_ratio_uses_slsqp_unless_the_homogenized_backend_is_picked():
+    all_stocks_df = random_stock_prices()
+    selected_stocks = list(all_stocks_df.columns)
+    govt_bond = RiskFreeRate(pd.bdate_range('2022-01-01', '2023-12-31'), np.full(520, 7.0))
+
+    weights, best_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, 'SR', '2023-01-01', '2024-01-01', 0.25, govt_bond)
+    homogenized_weights, homogenized_method = maximize_sharpe_ratio(selected_stocks, all_stocks_df, 'SR', '2023-01-01', '2024-01-01', 0.25, govt_bond, backend='homogenized')
+
+    assert best_method == 'slsqp'
+    assert homogenized_method == 'homogenized'
+    assert abs(sum(weights) - 1) < 1e-3 and abs(sum(homogenized_weights) - 1) < 1e-3
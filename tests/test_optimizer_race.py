@@ -0,0 +1,55 @@
+import numpy as np
+
+from optimization_functions import optimization_problem
+from optimizer_race import OptimizerRace, constraint_violation
+
+
+def sharpe_ratio_problem(num_stocks=10, seed=0):
+    rng = np.random.default_rng(seed)
+    daily_returns = rng.normal(0.0005, 0.01, size=(500, num_stocks))
+    return ('maximize_sharpe_ratio', daily_returns.mean(axis=0), np.cov(daily_returns, rowvar=False), 0.05, 0.3, 0.0001)
+
+
+def test_race_winner_is_the_best_feasible_attempt():
+    problem = sharpe_ratio_problem()
+
+    with OptimizerRace(random_starts=1, max_workers=2) as race:
+        stats = {}
+        weights, best_method = race.run(problem, stats=stats)
+
+    assert best_method in race.methods
+    assert constraint_violation(problem, weights) <= race.feasibility_tolerance
+
+    objective_function, objective_gradient, constraints = optimization_problem(*problem)
+    best_objective = min(entry['objective'] for entry in stats['race'] if entry.get('feasible'))
+    assert objective_function(weights) <= best_objective + 1e-9 * abs(best_objective)
+
+
+def test_stragglers_are_counted_and_a_candidate_is_returned():
+    problem = sharpe_ratio_problem()
+    equal_weights = np.full(10, 0.1)
+
+    # No attempt can be done when the race stops waiting at once
+    with OptimizerRace(random_starts=1, time_budget=0.0, grace_seconds=0.0, max_workers=1) as race:
+        stats = {}
+        weights, best_method = race.run(problem, candidates={'equal': equal_weights}, stats=stats)
+
+    assert race.attempts == 6
+    assert race.stragglers == 6
+    assert sum(entry['message'] == 'straggler' for entry in stats['race']) == 6
+    assert best_method == 'equal'
+    np.testing.assert_array_equal(weights, equal_weights)
+
+
+def test_candidate_wins_ties():
+    # Without any covariance every portfolio has the same variance, so every attempt ties with the candidate
+    problem = ('minimize_variance', np.full(5, 0.001), np.zeros((5, 5)), -1.0, 0.4, 0.0001)
+    equal_weights = np.full(5, 0.2)
+
+    with OptimizerRace(random_starts=1, max_workers=2) as race:
+        stats = {}
+        weights, best_method = race.run(problem, candidates={'equal': equal_weights}, stats=stats)
+
+    assert any(entry['method'] in race.methods and entry.get('feasible') for entry in stats['race'])
+    assert best_method == 'equal'
+    np.testing.assert_array_equal(weights, equal_weights)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_index import LookbackCalendar, PriceIndex, lookback_start_date
+
+
+def prices_with_gaps(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2020-01-01', '2022-12-31')
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.015, size=(len(dates), 6)), axis=0))
+
+    # A stock listed later, a gap filled with the previous price, a gap left missing and a stock delisted early
+    prices[:300, 0] = np.nan
+    prices[200:230, 1] = prices[199, 1]
+    prices[400:420, 2] = np.nan
+    prices[600:, 3] = np.nan
+
+    return pd.DataFrame(prices, index=dates, columns=[f'S{i}.NS' for i in range(6)])
+
+
+@pytest.mark.parametrize('start_date, end_date', [(None, None), ('2020-06-01', '2021-01-01'), ('2020-09-15', '2021-03-31'), ('2021-05-01', '2022-06-30'), ('2022-12-31', None)])
+def test_window_means_match_pct_change(start_date, end_date):
+    all_stocks_df = prices_with_gaps()
+    price_index = PriceIndex(all_stocks_df)
+
+    window_df = all_stocks_df.loc[start_date:end_date]
+    if end_date is not None:
+        window_df = window_df[window_df.index < end_date]
+
+    expected = window_df.pct_change(fill_method=None).iloc[1:].mean()
+
+    pd.testing.assert_series_equal(price_index.mean_daily_returns(start_date, end_date), expected, check_names=False, rtol=1e-9, atol=1e-15)
+
+
+def test_window_means_of_many_windows_match_the_single_windows():
+    all_stocks_df = prices_with_gaps(1)
+    price_index = PriceIndex(all_stocks_df)
+
+    buying_dates = [date.strftime('%Y-%m-%d') for date in pd.date_range('2020-02-01', '2022-12-01', freq='MS')]
+    first, last = price_index.lookback_calendar.rows_many(buying_dates, 0.5)
+
+    means = price_index.mean_daily_returns_rows(first, last)
+
+    for i, buying_date in enumerate(buying_dates):
+        expected = price_index.mean_daily_returns(lookback_start_date(buying_date, 0.5), buying_date).to_numpy()
+        np.testing.assert_array_equal(means[i], expected)
+
+
+def test_lookback_rows_match_date_comparisons():
+    dates = pd.bdate_range('2019-01-01', '2022-12-31')
+    lookback_calendar = LookbackCalendar(dates.to_numpy())
+
+    for buying_date in ['2020-03-31', '2021-02-28', '2021-08-31', '2022-01-01', '2019-03-15']:
+        for last_x_years in [2, 1, 0.5, 0.25]:
+            start_date = pd.Timestamp(buying_date) - pd.DateOffset(months=int(last_x_years * 12))
+
+            first, last = lookback_calendar.rows(buying_date, last_x_years)
+            expected_rows = np.flatnonzero((dates >= start_date) & (dates < buying_date))
+
+            assert lookback_start_date(buying_date, last_x_years) == start_date.strftime('%Y-%m-%d')
+            np.testing.assert_array_equal(np.arange(first, last), expected_rows)
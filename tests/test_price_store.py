@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from data_download import make_synthetic_fetch_backend
+from data_refresher import DataRefresher
+from price_store import save_price_store, load_price_store, append_to_price_store, update_price_store
+
+
+def failing_fetch_backend(fetch_backend, failing_symbols):
+
+    def fetch(symbols, start_date, end_date):
+        if set(symbols) & set(failing_symbols):
+            raise ConnectionError(f"Failure while fetching {symbols}")
+        return fetch_backend(symbols, start_date, end_date)
+
+    return fetch
+
+
+def test_save_load_and_append_round_trip(tmp_path):
+    fetch_backend = make_synthetic_fetch_backend()
+    symbols = ['A.NS', 'B.NS', 'C.NS']
+
+    stocks_df = fetch_backend(symbols, '2024-01-01', '2024-03-01')
+    stocks_df.iloc[:5, 1] = np.nan
+
+    save_price_store(stocks_df.iloc[::-1], tmp_path)
+    stored_df = load_price_store(tmp_path)
+
+    assert list(stored_df.columns) == symbols
+    assert stored_df.index.equals(stocks_df.index)
+    np.testing.assert_array_equal(stored_df.to_numpy(), stocks_df.to_numpy())
+    assert not stored_df.to_numpy().flags.writeable
+
+    # The rows up to the last stored date are skipped, a missing symbol is stored as NaN and an extra one is ignored
+    new_df = fetch_backend(['C.NS', 'A.NS', 'D.NS'], '2024-02-20', '2024-03-15')
+    appended_rows = append_to_price_store(new_df, tmp_path)
+
+    expected_df = pd.concat([stocks_df, new_df.loc['2024-03-01':].reindex(columns=symbols)])
+    updated_df = load_price_store(tmp_path)
+
+    assert appended_rows == len(new_df.loc['2024-03-01':])
+    assert updated_df.index.equals(expected_df.index)
+    np.testing.assert_array_equal(updated_df.to_numpy(), expected_df.to_numpy())
+    assert updated_df.attrs['data_version'] != stored_df.attrs['data_version']
+
+    # A snapshot loaded before the append keeps its own rows
+    assert len(stored_df) == len(stocks_df)
+    np.testing.assert_array_equal(stored_df.to_numpy(), stocks_df.to_numpy())
+
+
+def test_data_refresher_converts_the_csv_and_appends_the_missing_dates(tmp_path):
+    fetch_backend = make_synthetic_fetch_backend()
+    symbols = ['A.NS', 'B.NS']
+
+    stocks_df = fetch_backend(symbols, '2024-01-01', '2024-03-01')
+    pd.concat([stocks_df, stocks_df.iloc[[-1]] * 2]).to_csv(tmp_path / 'all_stock_data.csv')
+
+    store_path = str(tmp_path / 'price_store')
+    data_refresher = DataRefresher(store_path, fetch_backend=fetch_backend)
+    data_refresher.ensure_store(str(tmp_path / 'all_stock_data.csv'))
+
+    stored_df = load_price_store(store_path)
+
+    # The duplicated last date keeps its first row
+    assert stored_df.index.equals(stocks_df.index)
+    np.testing.assert_allclose(stored_df.to_numpy(), stocks_df.to_numpy())
+
+    appended_rows = data_refresher.refresh('2024-04-01', timeout=60)
+
+    new_df = fetch_backend(symbols, '2024-03-01', '2024-04-01')
+    expected_df = pd.concat([stocks_df, new_df])
+    updated_df = load_price_store(store_path)
+
+    assert appended_rows == len(new_df)
+    assert updated_df.index.equals(expected_df.index)
+    np.testing.assert_allclose(updated_df.to_numpy(), expected_df.to_numpy())
+
+    assert data_refresher.refresh('2024-04-01', timeout=60) == 0
+
+
+def test_update_after_a_failed_symbol_fills_the_gap(tmp_path):
+    fetch_backend = make_synthetic_fetch_backend()
+    symbols = ['A.NS', 'B.NS', 'C.NS']
+
+    save_price_store(fetch_backend(symbols, '2024-01-01', '2024-03-01'), tmp_path)
+    stored_df = load_price_store(tmp_path)
+
+    appended_rows = update_price_store('2024-04-01', tmp_path, fetch_backend=failing_fetch_backend(fetch_backend, ['B.NS']), batch_size=1, max_retries=0)
+
+    assert appended_rows == 0
+    pd.testing.assert_frame_equal(load_price_store(tmp_path), stored_df)
+
+    appended_rows = update_price_store('2024-04-01', tmp_path, fetch_backend=fetch_backend, batch_size=1, max_retries=0)
+
+    updated_df = load_price_store(tmp_path)
+    new_df = updated_df.loc['2024-03-01':]
+
+    assert appended_rows == len(new_df) > 0
+    assert not np.isnan(new_df.to_numpy()).any()
+
+    expected_df = fetch_backend(symbols, '2024-03-01', '2024-04-01')
+    assert new_df.index.equals(expected_df.index)
+    np.testing.assert_array_equal(new_df.to_numpy(), expected_df.to_numpy())
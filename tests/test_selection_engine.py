@@ -0,0 +1,20 @@
+import numpy as np
+
+from selection_engine import ranked_filter, sort_order
+
+
+def test_ranked_filter_keeps_the_sort_order_of_ties():
+    rng = np.random.default_rng(0)
+
+    for _ in range(500):
+        num_stocks = int(rng.integers(1, 300))
+        counts = rng.integers(0, int(rng.integers(1, 10)), num_stocks)
+        averages = np.round(rng.normal(0.0005, 0.001, num_stocks), int(rng.integers(3, 8)))
+        averages[rng.random(num_stocks) < 0.1] = np.nan
+
+        rows = rng.permutation(num_stocks)[:int(rng.integers(0, num_stocks + 1))]
+        k = int(rng.integers(1, 60))
+
+        for values in (counts, averages):
+            for ascending in (True, False):
+                np.testing.assert_array_equal(ranked_filter(values, rows, k, ascending), rows[sort_order(values[rows], ascending)[:k]])
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions import THREE_MONTH_PERIOD_CALENDAR, ONE_MONTH_PERIOD_CALENDAR, select_stocks, select_stocks_batch
+
+
+def random_stock_prices(num_stocks=60, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2014-01-01', '2021-12-31')
+    daily_returns = rng.normal(rng.normal(0.0004, 0.0004, num_stocks), 0.015, size=(len(dates), num_stocks))
+    prices = 100 * np.exp(np.cumsum(daily_returns, axis=0))
+
+    # Stocks listed later and a gap filled with the previous price, like the stored data
+    prices[:rng.integers(200, 1500), :5] = np.nan
+    prices[1000:1010, 10] = prices[999, 10]
+
+    return pd.DataFrame(prices, index=dates, columns=[f'S{i}.NS' for i in range(num_stocks)])
+
+
+@pytest.mark.parametrize('period_calendar', [THREE_MONTH_PERIOD_CALENDAR, ONE_MONTH_PERIOD_CALENDAR])
+@pytest.mark.parametrize('filters, max_non_positive_returns_count', [(4, 15), (3, None), (2, None)])
+def test_weekly_batch_selections_match_select_stocks(period_calendar, filters, max_non_positive_returns_count):
+    all_stocks_df = random_stock_prices()
+    buying_dates = [date.strftime('%Y-%m-%d') for date in pd.date_range('2019-01-07', periods=20, freq='W-MON')]
+
+    selections = select_stocks_batch(period_calendar, buying_dates, '1m', 'SR', max_non_positive_returns_count, all_stocks_df, filters, 1)
+
+    for buying_date, selection in zip(buying_dates, selections):
+        assert selection == select_stocks(period_calendar, buying_date, '1m', 'SR', max_non_positive_returns_count, all_stocks_df, filters, 1)
+
+
+@pytest.mark.parametrize('period_calendar, holding_period, frequency', [(THREE_MONTH_PERIOD_CALENDAR, '1q', 'QS'), (ONE_MONTH_PERIOD_CALENDAR, '1m', 'MS')])
+@pytest.mark.parametrize('returns_type, last_x_years', [('SR', 0.5), ('LR', 0.25), ('LR', 2)])
+def test_rebalance_batch_selections_match_select_stocks(period_calendar, holding_period, frequency, returns_type, last_x_years):
+    all_stocks_df = random_stock_prices(seed=1)
+    buying_dates = [date.strftime('%Y-%m-%d') for date in pd.date_range('2018-01-01', '2021-06-30', freq=frequency)]
+
+    for filters, max_non_positive_returns_count in [(4, 10), (3, None), (2, None)]:
+        selections = select_stocks_batch(period_calendar, buying_dates, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years)
+
+        assert len(selections) == len(buying_dates)
+
+        for buying_date, selection in zip(buying_dates, selections):
+            assert selection == select_stocks(period_calendar, buying_date, holding_period, returns_type, max_non_positive_returns_count, all_stocks_df, filters, last_x_years)